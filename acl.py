@@ -0,0 +1,421 @@
+import argparse
+from array import array
+from bisect import bisect_right
+import ipaddress
+
+from confparse import load_config
+
+MAX_ADDRESS = 0xFFFFFFFF
+ANY_ADDRESS = (0, MAX_ADDRESS)
+ANY_PORT = (0, 65535)
+
+PROTOCOLS = {"ip": None, "tcp": 6, "udp": 17, "icmp": 1, "gre": 47, "esp": 50, "ahp": 51,
+             "ah": 51, "eigrp": 88, "ospf": 89, "pim": 103, "sctp": 132}
+
+PORTS = {"ftp-data": 20, "ftp": 21, "ssh": 22, "telnet": 23, "smtp": 25, "domain": 53,
+         "bootps": 67, "bootpc": 68, "tftp": 69, "www": 80, "http": 80, "pop3": 110,
+         "ntp": 123, "snmp": 161, "snmptrap": 162, "bgp": 179, "ldap": 389, "https": 443,
+         "isakmp": 500, "syslog": 514, "rdp": 3389}
+
+ICMP_TYPES = {"echo-reply": 0, "unreachable": 3, "redirect": 5, "echo": 8, "time-exceeded": 11,
+              "traceroute": 30}
+
+# Column order of a compiled rule row and of a flow.
+FIELDS = ("protocol", "source", "source_port", "destination", "destination_port")
+
+IMPLICIT_DENY = -1
+
+
+class Unsupported(ValueError):
+    """An ACL line uses syntax the compiler does not model."""
+
+
+def _addr(text):
+    try:
+        return int(ipaddress.IPv4Address(text))
+    except ValueError:
+        raise Unsupported(f"not an address: {text}") from None
+
+
+def _is_address(text):
+    try:
+        ipaddress.IPv4Address(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _mask_range(address, mask, wildcard):
+    bits = _addr(mask)
+    if not wildcard:
+        bits = ~bits & MAX_ADDRESS
+    if bits & (bits + 1):
+        raise Unsupported(f"non-contiguous mask {mask}")
+    start = _addr(address) & ~bits & MAX_ADDRESS
+    return start, start | bits
+
+
+class Acl:
+    """
+    One access list compiled to a range table: every rule becomes one or
+    more rows of [lo, hi] ranges over FIELDS, kept column-wise in arrays.
+    Flows are evaluated by equivalence class: each field value is bisected
+    into the elementary intervals of that column's bounds, and every flow
+    landing in the same cell of that grid hits the same first rule, so the
+    rule table is scanned once per cell rather than once per flow.
+    """
+
+    def __init__(self, name, device=None):
+        self.name = name
+        self.device = device
+        self.rules = []  # (line, action)
+        self.skipped = []  # (line, reason)
+        self.row_rule = array('l')
+        self.lows = {field: array('L') for field in FIELDS}
+        self.highs = {field: array('L') for field in FIELDS}
+        self._bounds = None
+        self._classes = {}
+
+    def add_rule(self, line, action, boxes):
+        """Adds a rule matching the union of boxes ({field: (lo, hi)}, missing fields match all)."""
+        index = len(self.rules)
+        self.rules.append((line, action))
+        for box in boxes:
+            self.row_rule.append(index)
+            for field in FIELDS:
+                lo, hi = box.get(field, ANY_PORT if field.endswith("port") else
+                                 (0, 255) if field == "protocol" else ANY_ADDRESS)
+                self.lows[field].append(lo)
+                self.highs[field].append(hi)
+        self._bounds = None
+        self._classes = {}
+        return index
+
+    def _rows(self):
+        return range(len(self.row_rule))
+
+    def bounds(self):
+        if self._bounds is None:
+            self._bounds = {}
+            for field in FIELDS:
+                points = {0}
+                points.update(self.lows[field])
+                points.update(hi + 1 for hi in self.highs[field])
+                self._bounds[field] = sorted(points)
+        return self._bounds
+
+    def first_match(self, flow):
+        """Index of the first rule matching flow (protocol, src, sport, dst, dport), or IMPLICIT_DENY."""
+        lows, highs = self.lows, self.highs
+        for row in self._rows():
+            for field, value in zip(FIELDS, flow):
+                if not lows[field][row] <= value <= highs[field][row]:
+                    break
+            else:
+                return self.row_rule[row]
+        return IMPLICIT_DENY
+
+    def evaluate(self, flows):
+        """First-match rule index for every flow; see flow() for building flows from text."""
+        bounds = [self.bounds()[field] for field in FIELDS]
+        classes = self._classes
+        results = []
+        for flow in flows:
+            key = tuple(bisect_right(b, value) for b, value in zip(bounds, flow))
+            rule = classes.get(key)
+            if rule is None:
+                rule = classes[key] = self.first_match(flow)
+            results.append(rule)
+        return results
+
+    def action(self, rule):
+        return "deny" if rule == IMPLICIT_DENY else self.rules[rule][1]
+
+    def hit_counts(self, flows):
+        """{rule index: flows it decided}, IMPLICIT_DENY counting the flows no rule matched."""
+        counts = {}
+        for rule in self.evaluate(flows):
+            counts[rule] = counts.get(rule, 0) + 1
+        return counts
+
+    def shadowed(self):
+        """
+        Rules no flow can ever reach, as (rule, earlier rule, kind): every row
+        of the rule lies inside one row of the earlier rule. kind is
+        'redundant' when both have the same action, 'shadowed' when the
+        earlier rule does the opposite.
+        """
+        found = []
+        by_rule = {}
+        for row in self._rows():
+            by_rule.setdefault(self.row_rule[row], []).append(row)
+        for rule, rows in sorted(by_rule.items()):
+            cover = None
+            for row in rows:
+                covering = self._covering_rule(row, rule)
+                if covering is None:
+                    cover = None
+                    break
+                cover = covering if cover is None else max(cover, covering)
+            if cover is not None:
+                kind = "redundant" if self.rules[cover][1] == self.rules[rule][1] else "shadowed"
+                found.append((rule, cover, kind))
+        return found
+
+    def _covering_rule(self, row, rule):
+        lows, highs = self.lows, self.highs
+        for earlier in self._rows():
+            if self.row_rule[earlier] >= rule:
+                break
+            if all(lows[f][earlier] <= lows[f][row] and highs[f][row] <= highs[f][earlier] for f in FIELDS):
+                return self.row_rule[earlier]
+        return None
+
+
+def flow(protocol, source, source_port, destination, destination_port):
+    """A flow tuple for evaluate() from names/addresses as written in a config."""
+    if isinstance(protocol, str):
+        protocol = (PROTOCOLS[protocol] or 0) if protocol in PROTOCOLS else int(protocol)
+    return (protocol, _addr(source) if isinstance(source, str) else source, int(source_port),
+            _addr(destination) if isinstance(destination, str) else destination, int(destination_port))
+
+
+class _Parser:
+    """Turns ACL entries into boxes; holds the device's network objects and groups."""
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def address(self, tokens, i, wildcard, bare_host=False):
+        word = tokens[i]
+        if word in ("any", "any4"):
+            return [ANY_ADDRESS], i + 1
+        if word == "host":
+            address = _addr(tokens[i + 1])
+            return [(address, address)], i + 2
+        if word in ("object", "object-group"):
+            if tokens[i + 1] not in self.objects:
+                raise Unsupported(f"unknown {word} {tokens[i + 1]}")
+            return self.objects[tokens[i + 1]], i + 2
+        if word == "interface":
+            raise Unsupported("interface addresses are not modelled")
+        if i + 1 < len(tokens) and _is_address(tokens[i + 1]):
+            return [_mask_range(word, tokens[i + 1], wildcard)], i + 2
+        if bare_host:
+            address = _addr(word)
+            return [(address, address)], i + 1
+        raise Unsupported(f"cannot read address at {word}")
+
+    def ports(self, tokens, i):
+        if i >= len(tokens):
+            return [ANY_PORT], i
+        op = tokens[i]
+
+        def port(text):
+            if text.isdigit():
+                return int(text)
+            if text not in PORTS:
+                raise Unsupported(f"unknown port {text}")
+            return PORTS[text]
+
+        if op == "eq":
+            value = port(tokens[i + 1])
+            return [(value, value)], i + 2
+        if op == "neq":
+            value = port(tokens[i + 1])
+            return [r for r in ((0, value - 1), (value + 1, 65535)) if r[0] <= r[1]], i + 2
+        if op == "lt":
+            return [(0, port(tokens[i + 1]) - 1)], i + 2
+        if op == "gt":
+            return [(port(tokens[i + 1]) + 1, 65535)], i + 2
+        if op == "range":
+            return [(port(tokens[i + 1]), port(tokens[i + 2]))], i + 3
+        if op == "object-group" and tokens[i + 1] not in self.objects:
+            # A network group here is the next address, not a service group.
+            raise Unsupported("service object-groups are not modelled")
+        return [ANY_PORT], i
+
+    def standard(self, tokens, wildcard, field="source"):
+        """tokens after the action of a standard entry."""
+        ranges, _ = self.address(tokens, 0, wildcard, bare_host=True)
+        return [{field: r} for r in ranges]
+
+    def extended(self, tokens, wildcard):
+        """tokens after the action of an extended entry."""
+        name = tokens[0]
+        if name in ("object", "object-group"):
+            raise Unsupported("service objects are not modelled")
+        if name in PROTOCOLS:
+            protocol = PROTOCOLS[name]
+        elif name.isdigit():
+            protocol = int(name)
+        else:
+            raise Unsupported(f"unknown protocol {name}")
+        proto_range = (0, 255) if protocol is None else (protocol, protocol)
+        sources, i = self.address(tokens, 1, wildcard)
+        source_ports, destination_ports = [ANY_PORT], [ANY_PORT]
+        if protocol in (6, 17):
+            source_ports, i = self.ports(tokens, i)
+        destinations, i = self.address(tokens, i, wildcard)
+        if protocol in (6, 17):
+            destination_ports, i = self.ports(tokens, i)
+        elif protocol == 1 and i < len(tokens):
+            if tokens[i] in ICMP_TYPES:
+                kind = ICMP_TYPES[tokens[i]]
+                destination_ports = [(kind, kind)]
+            elif tokens[i].isdigit():
+                destination_ports = [(int(tokens[i]), int(tokens[i]))]
+        return [{"protocol": proto_range, "source": s, "source_port": sp,
+                 "destination": d, "destination_port": dp}
+                for s in sources for sp in source_ports for d in destinations for dp in destination_ports]
+
+
+def _objects(parsed):
+    """{name: [(lo, hi)]} for the device's 'object network' and 'object-group network' definitions."""
+    objects = {}
+    for name, node in parsed.sections_of("object network").items():
+        ranges = []
+        for child in node.children:
+            words = child.text.split()
+            if words[0] == "host":
+                ranges.append((_addr(words[1]), _addr(words[1])))
+            elif words[0] == "subnet":
+                ranges.append(_mask_range(words[1], words[2], wildcard=False))
+            elif words[0] == "range":
+                ranges.append((_addr(words[1]), _addr(words[2])))
+        objects[name] = ranges
+    for header, node in parsed.sections_of("object-group").items():
+        words = header.split()
+        if words[0] != "network" or len(words) < 2:
+            continue
+        ranges = []
+        for child in node.children:
+            entry = child.text.split()
+            if entry[0] != "network-object":
+                continue
+            if entry[1] == "host":
+                ranges.append((_addr(entry[2]), _addr(entry[2])))
+            elif entry[1] == "object":
+                ranges.extend(objects.get(entry[2], []))
+            else:
+                ranges.append(_mask_range(entry[1], entry[2], wildcard=False))
+        objects[words[1]] = ranges
+    return objects
+
+
+def _add_entry(acl, line, tokens, parse):
+    if tokens and tokens[0].isdigit():
+        tokens = tokens[1:]  # sequence number
+    if not tokens or tokens[0] not in ("permit", "deny"):
+        return
+    try:
+        acl.add_rule(line, tokens[0], parse(tokens[1:]))
+    except (Unsupported, IndexError) as e:
+        acl.skipped.append((line, str(e) or "truncated entry"))
+
+
+def compile_acls(config, device=None):
+    """
+    Compiles every ACL in an IOS or ASA running-config (text or
+    confparse.ParsedConfig) into {name: Acl}. IOS numbered and named
+    standard/extended lists use wildcard masks; ASA 'access-list NAME
+    extended|standard' entries use netmasks and may reference network
+    objects and object-groups. Entries the compiler cannot model are listed
+    in Acl.skipped instead of being guessed.
+    """
+    parsed = load_config(config) if isinstance(config, str) else config
+    parser = _Parser(_objects(parsed))
+    acls = {}
+
+    def get(name):
+        if name not in acls:
+            acls[name] = Acl(name, device)
+        return acls[name]
+
+    for name, node in parsed.sections_of("ip access-list").items():
+        words = name.split()
+        if len(words) < 2 or words[0] not in ("standard", "extended"):
+            continue
+        standard = words[0] == "standard"
+        acl = get(words[1])
+        for child in node.children:
+            tokens = child.text.split()
+            _add_entry(acl, child.text, tokens,
+                       lambda t: parser.standard(t, True) if standard else parser.extended(t, True))
+
+    for node in parsed.root.children:
+        tokens = node.text.split()
+        if tokens[:1] != ["access-list"] or len(tokens) < 3:
+            continue
+        name, rest = tokens[1], tokens[2:]
+        if rest[:1] == ["line"]:
+            rest = rest[2:]
+        if rest[:1] == ["extended"]:
+            _add_entry(get(name), node.text, rest[1:], lambda t: parser.extended(t, False))
+        elif rest[:1] == ["standard"]:
+            _add_entry(get(name), node.text, rest[1:], lambda t: parser.standard(t, False, "destination"))
+        elif name.isdigit():
+            number = int(name)
+            standard = number < 100 or 1300 <= number < 2000
+            _add_entry(get(name), node.text, rest,
+                       lambda t: parser.standard(t, True) if standard else parser.extended(t, True))
+    return acls
+
+
+def fleet_report(configs):
+    """
+    Compiles the ACLs of {hostname: config} and returns (unreachable,
+    skipped): [(hostname, acl, rule, earlier rule, kind)] for every
+    shadowed or redundant rule and [(hostname, acl, line, reason)] for the
+    entries that could not be compiled.
+    """
+    unreachable, skipped = [], []
+    for hostname in sorted(configs):
+        for name, acl in sorted(compile_acls(configs[hostname], hostname).items()):
+            for rule, cover, kind in acl.shadowed():
+                unreachable.append((hostname, acl, rule, cover, kind))
+            for line, reason in acl.skipped:
+                skipped.append((hostname, acl, line, reason))
+    return unreachable, skipped
+
+
+def print_fleet_report(configs):
+    """Prints shadowed/redundant rules and skipped entries; returns the number of unreachable rules."""
+    unreachable, skipped = fleet_report(configs)
+    for hostname, acl, rule, cover, kind in unreachable:
+        print(f"{hostname} {acl.name}: '{acl.rules[rule][0]}' is {kind} by '{acl.rules[cover][0]}'")
+    for hostname, acl, line, reason in skipped:
+        print(f"{hostname} {acl.name}: skipped '{line}' ({reason})")
+    if not unreachable:
+        print(f"No shadowed ACL rules on {len(configs)} devices.")
+    return len(unreachable)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the ACLs of the backed up configs.")
+    parser.add_argument("--store", default="backups", help="BackupStore to read the configs from")
+    parser.add_argument("--device", help="only this device")
+    parser.add_argument("--acl", help="ACL to evaluate --flow against")
+    parser.add_argument("--flow", action="append", default=[],
+                        help="'PROTO SRC SPORT DST DPORT', e.g. 'tcp 10.1.1.1 40000 8.8.8.8 443'")
+    args = parser.parse_args()
+
+    from store import BackupStore
+    store = BackupStore(args.store)
+    devices = [args.device] if args.device else list(store.index)
+    configs = {device: store.get(device) for device in devices}
+    if not args.flow:
+        print_fleet_report(configs)
+        return
+    flows = [flow(*text.split()) for text in args.flow]
+    for device, config in configs.items():
+        acl = compile_acls(config, device).get(args.acl)
+        if acl is None:
+            continue
+        for text, rule in zip(args.flow, acl.evaluate(flows)):
+            decided_by = acl.rules[rule][0] if rule != IMPLICIT_DENY else "implicit deny"
+            print(f"{device} {args.acl}: {text} -> {acl.action(rule)} ({decided_by})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import re
+import time
+
+from capture import send_batch, stream_to_file
+from fleet import remaining
+from inventory import INVENTORY_FIELDS
+from journal import CONNECTED, SAVED
+from sessions import connect
+from showcache import cache_host
+from timing import phase
+
+
+# Commands whose answer changes whenever the configuration does, tried in
+# order until the device understands one. IOS-XE prints its configuration
+# id without building anything. Classic IOS has no such counter: filtering
+# the running-config down to its "Last configuration change" line still has
+# the device build the whole config, it only saves transferring it.
+CHANGE_MARKER_COMMANDS = {
+    "cisco_ios": ("show configuration id", "show running-config | include Last configuration change"),
+    "cisco_xe": ("show configuration id",),
+    "cisco_asa": ("show version | include Configuration last modified",),
+}
+
+# How IOS and ASA answer a command they do not know; the caret line pointing
+# at the bad word comes first, so the error is not at the start of the output.
+CLI_ERRORS = ("% Invalid", "% Ambiguous", "% Incomplete", "% Unknown", "ERROR:")
+
+
+def output_filename(hostname, command):
+    """{hostname}_{command}.txt with the command made filesystem-safe."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", command).strip("_")
+    return f"{hostname}_{slug}.txt"
+
+
+def backup_device(device, deadline=None, store=None, profile=None, show_commands=(), index=None,
+                  journal=None, conditional=False, cache=None):
+    """
+    Connects to one device, streams its running-config to disk and records
+    it as a new version in store (a store.BackupStore), or writes it to
+    {hostname}_running_config.txt when no store is given. Netmiko's timeouts
+    are sized from the per-device deadline so a slow host cannot hold its
+    worker forever, and from the host's history when a latency.LatencyProfile
+    is given.
+
+    show_commands are collected in the same session, pipelined behind
+    'show running-config' by capture.send_batch, which still streams the
+    running-config to disk. Each other output is written as soon as it is
+    split off: to store.show_outputs() under "{hostname}:{command}", or to
+    {hostname}_{command}.txt.
+
+    With a configindex.ConfigIndex, a running-config stored as a new
+    version is indexed right away. A journal.Journal gets the connected
+    and saved states.
+
+    With conditional and a store, the device is first asked for its
+    last-change marker (the first of CHANGE_MARKER_COMMANDS it understands;
+    on classic IOS the check still costs the device a config build, see
+    there). When it matches the marker stored with the latest version, the
+    running-config is not fetched and the store only records the
+    confirmation; otherwise the full config is pulled and saved with the
+    new marker.
+
+    With a showcache.ShowCache, the device is not contacted at all while
+    the cache holds fresh output for 'show running-config' and every show
+    command; whatever is fetched from the device is put in the cache.
+    """
+    device = dict(device)
+    hostname = device.pop('hostname', device.get('host'))
+    for field in INVENTORY_FIELDS:
+        device.pop(field, None)
+    device['conn_timeout'] = remaining(deadline, cap=10)
+    device['auth_timeout'] = remaining(deadline, cap=10)
+    device['banner_timeout'] = remaining(deadline, cap=15)
+    read_timeout = 20
+    if profile is not None:
+        device.update(profile.delay_settings(device['host'], device.get('device_type')))
+        read_timeout = profile.read_timeout(device['host'], device.get('device_type'))
+
+    filename = f"{hostname}_running_config.txt"
+    if store is not None:
+        filename = os.path.join(store.root, f".{hostname}.capture")
+
+    def save_output(index, command, text):
+        if index == 0:
+            with open(filename, 'w') as f:
+                f.write(text + "\n")
+        elif store is not None:
+            store.show_outputs().save(f"{hostname}:{command}", text + "\n")
+        else:
+            with open(output_filename(hostname, command), 'w') as f:
+                f.write(text + "\n")
+
+    started = time.time()
+
+    def fetched(index, command, text):
+        if index == 0:
+            return  # already streamed to filename, cached once the session is done
+        if cache is not None:
+            cache.put(cache_host(device), command, text, fetched=started)
+        save_output(index, command, text)
+
+    def finish(marker=None, note=""):
+        if store is not None:
+            with open(filename, 'r') as f:
+                text = f.read()
+            # Cached text carries no marker; if it is the stored config the stored marker still holds.
+            version, sha, changed = store.save(hostname, text, marker=marker, keep_marker=bool(note))
+            os.remove(filename)
+            if journal is not None:
+                journal.record(hostname, SAVED, f"v{version}")
+            if index is not None:
+                index.update(hostname, text, sha)
+            state = "new version" if changed else "unchanged"
+            return f"{store.root} as v{version} ({state}{note}, {sha[:12]})"
+        if journal is not None:
+            journal.record(hostname, SAVED, filename)
+        return filename
+
+    commands = ['show running-config', *show_commands]
+    if cache is not None:
+        cached = cache.get_many(cache_host(device), commands)
+        if len(cached) == len(commands):
+            for i, command in enumerate(commands):
+                save_output(i, command, cached[command])
+            return finish(note=", from show cache")
+
+    marker = None
+    with connect(device) as net_connect:
+        if journal is not None:
+            journal.record(hostname, CONNECTED)
+        marker_commands = CHANGE_MARKER_COMMANDS.get(device.get('device_type'), ())
+        if conditional and store is not None and marker_commands:
+            with phase(device['host'], device.get('device_type'), "check_marker"):
+                for marker_command in marker_commands:
+                    marker = net_connect.send_command(marker_command,
+                                                      read_timeout=remaining(deadline, cap=read_timeout)).strip()
+                    if marker and not any(error in marker for error in CLI_ERRORS):
+                        break
+                    marker = None  # not on this platform or release
+            latest = store.latest(hostname)
+            if marker and latest is not None and latest.get("marker") == marker:
+                if show_commands:
+                    with phase(device['host'], device.get('device_type'), "send_command"):
+                        send_batch(net_connect, list(show_commands),
+                                   on_result=lambda i, command, text: fetched(i + 1, command, text),
+                                   read_timeout=remaining(deadline, cap=read_timeout * len(show_commands)))
+                version, sha = store.confirm(hostname, marker)
+                if journal is not None:
+                    journal.record(hostname, SAVED, f"v{version} (marker unchanged)")
+                return f"{store.root} as v{version} (marker unchanged, {sha[:12]})"
+        with phase(device['host'], device.get('device_type'), "send_command"):
+            if show_commands:
+                with open(f"{filename}.part", 'w', buffering=1 << 16) as f:
+                    send_batch(net_connect, commands, on_result=fetched, sink=f,
+                               read_timeout=remaining(deadline, cap=read_timeout * (1 + len(show_commands))))
+                os.replace(f"{filename}.part", filename)
+            else:
+                stream_to_file(net_connect, 'show running-config', filename,
+                               read_timeout=remaining(deadline, cap=read_timeout))
+    if cache is not None:
+        with open(filename, 'r') as f:
+            cache.put(cache_host(device), 'show running-config', f.read().rstrip("\n"), fetched=started)
+
+    return finish(marker)
@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+from functools import partial
+
+from backup import backup_device
+from fleet import run_fleet
+from push import push_device
+from store import BackupStore
+from timing import recorder
+
+BENCH_COMMANDS = [
+    "interface Ethernet0/1",
+    "description Link to R1",
+    "ip address 10.1.8.1 255.255.255.252",
+    "duplex auto",
+    "no shutdown",
+    "router ospf 1",
+    "network 10.1.8.0 0.0.0.3 area 0",
+]
+
+
+def _serve_fleet(options, ready):
+    # Imported here so the parent process never loads the server side.
+    from fakedevice import start_fleet
+
+    inventory, _, _ = start_fleet(**options)
+    ready.put(inventory)
+    while True:
+        time.sleep(3600)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def _timed(job, device, deadline):
+    start = time.monotonic()
+    result = job(device, deadline)
+    return result, time.monotonic() - start
+
+
+def run_phase(name, inventory, job, workers, deadline):
+    """Runs job over inventory through the real fleet engine and returns its stats."""
+    timings, failures = [], {}
+    start = time.monotonic()
+    for device, result, error in run_fleet(inventory, partial(_timed, job), workers=workers, deadline=deadline):
+        if error is None:
+            timings.append(result[1])
+        else:
+            kind = type(error).__name__
+            failures[kind] = failures.get(kind, 0) + 1
+    elapsed = time.monotonic() - start
+    return {
+        "phase": name,
+        "devices": len(inventory),
+        "ok": len(timings),
+        "failed": failures,
+        "seconds": round(elapsed, 3),
+        "devices_per_sec": round(len(inventory) / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(timings, 50), 3),
+        "p99": round(percentile(timings, 99), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backup/push against emulated devices.")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--deadline", type=float, default=60)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every device response")
+    parser.add_argument("--config-lines", type=int, default=2000)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--asa-ratio", type=float, default=0.0)
+    parser.add_argument("--phase", choices=("backup", "push", "both"), default="both")
+    parser.add_argument("--json", help="append results as JSON lines to this file")
+    args = parser.parse_args()
+
+    ready = multiprocessing.Queue()
+    options = {"count": args.devices, "config_lines": args.config_lines, "latency": args.latency,
+               "fail_rate": args.fail_rate, "asa_ratio": args.asa_ratio, "seed": 1}
+    server = multiprocessing.Process(target=_serve_fleet, args=(options, ready), daemon=True)
+    server.start()
+    inventory = ready.get(timeout=120)
+    print(f"Started {len(inventory)} fake devices (pid {server.pid})")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            if args.phase in ("backup", "both"):
+                job = partial(backup_device, store=BackupStore(root))
+                results.append(run_phase("backup", inventory, job, args.workers, args.deadline))
+            if args.phase in ("push", "both"):
+                configs = [dict(ip=d["host"], port=d["port"], hostname=d["hostname"],
+                                device_type=d["device_type"], username=d["username"],
+                                password=d["password"], secret=d["secret"], commands=BENCH_COMMANDS)
+                           for d in inventory]
+                results.append(run_phase("push", configs, push_device, args.workers, args.deadline))
+    finally:
+        server.terminate()
+
+    for r in results:
+        print(f"{r['phase']:<7} {r['ok']}/{r['devices']} ok in {r['seconds']}s  "
+              f"{r['devices_per_sec']} dev/s  p50 {r['p50']}s  p99 {r['p99']}s  "
+              f"peak RSS {r['peak_rss_mb']} MB  failed {r['failed'] or '-'}")
+    recorder.print_summary()
+    if args.json:
+        with open(args.json, 'a') as f:
+            for r in results:
+                f.write(json.dumps(dict(r, workers=args.workers, latency=args.latency,
+                                        config_lines=args.config_lines, timestamp=time.time())) + "\n")
+
+
+if __name__ == "__main__":
+    main()
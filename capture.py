@@ -0,0 +1,152 @@
+import os
+import time
+
+
+def stream_command(net_connect, command, sink, read_timeout=20, poll=0.05):
+    """
+    Sends command and writes its output to sink (a text file object) as it
+    comes off the channel instead of collecting it into one string. Only a
+    prompt-sized tail is held back so the trailing prompt can be stripped;
+    the echoed command line is dropped. Returns the number of characters
+    written.
+    """
+    prompt = net_connect.find_prompt().strip()
+    channel = getattr(net_connect, "remote_conn", None)
+    net_connect.write_channel(command + "\n")
+
+    written = 0
+    pending = ""
+    echo_seen = False
+    deadline = time.monotonic() + read_timeout
+    while True:
+        data = net_connect.read_channel()
+        if not data:
+            if getattr(channel, "closed", False):
+                raise EOFError(f"channel closed by {prompt!r} during {command!r}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"prompt {prompt!r} not seen within {read_timeout}s of {command!r}")
+            time.sleep(poll)
+            continue
+        pending += data.replace("\r", "")
+
+        if not echo_seen:
+            if "\n" not in pending:
+                continue
+            first, pending = pending.split("\n", 1)
+            if command not in first:
+                pending = first + "\n" + pending
+            echo_seen = True
+
+        if pending.rstrip().endswith(prompt):
+            body = pending.rstrip()[:-len(prompt)].rstrip("\n")
+            body = body + "\n" if body else body
+            sink.write(body)
+            return written + len(body)
+
+        keep = len(prompt) + 2
+        if len(pending) > keep:
+            sink.write(pending[:-keep])
+            written += len(pending) - keep
+            pending = pending[-keep:]
+
+
+def stream_to_file(net_connect, command, path, read_timeout=20):
+    """
+    Streams command output into path. The data goes to a temporary file
+    first so an interrupted capture never replaces a good one.
+    """
+    tmp = f"{path}.part"
+    with open(tmp, 'w', buffering=1 << 16) as f:
+        size = stream_command(net_connect, command, f, read_timeout=read_timeout)
+    os.replace(tmp, path)
+    return size
+
+
+def preview(path, limit=2000):
+    """The first limit characters of a captured file, for debug printing."""
+    with open(path, 'r') as f:
+        head = f.read(limit)
+    size = os.path.getsize(path)
+    if size > len(head):
+        return f"{head}\n... ({size - len(head)} more bytes, see {path})"
+    return head
+
+
+def send_batch(net_connect, commands, on_result=None, read_timeout=60, poll=0.05, sink=None):
+    """
+    Pipelines commands over one session: all of them are written at once
+    and the combined output is split back into one result per command at
+    each prompt. Every result is handed to on_result(index, command, text)
+    as soon as its prompt arrives; the list of results is returned when
+    on_result is not given.
+
+    With sink (a text file object), the first command's output is written
+    there as it comes off the channel, as stream_command does, and its
+    result is the number of characters written instead of the text.
+    """
+    prompt = net_connect.find_prompt().strip()
+    channel = getattr(net_connect, "remote_conn", None)
+    net_connect.write_channel("".join(command + "\n" for command in commands))
+
+    results = []
+    pending = ""
+    scanned = 0  # pending[:scanned] holds no prompt, so only the tail after it is searched
+    written = 0
+    echo_seen = False
+    index = 0
+    deadline = time.monotonic() + read_timeout
+
+    def finished(text):
+        nonlocal index
+        if on_result is None:
+            results.append(text)
+        else:
+            on_result(index, commands[index], text)
+        index += 1
+
+    while index < len(commands):
+        data = net_connect.read_channel()
+        if not data:
+            if getattr(channel, "closed", False):
+                raise EOFError(f"channel closed by {prompt!r} after {index} of {len(commands)} commands")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"only {index} of {len(commands)} commands finished within {read_timeout}s")
+            time.sleep(poll)
+            continue
+        pending += data.replace("\r", "")
+        while index < len(commands):
+            at = pending.find(prompt, max(0, scanned - len(prompt) + 1))
+            if at < 0:
+                scanned = len(pending)
+                break
+            segment, pending, scanned = pending[:at], pending[at + len(prompt):], 0
+            if not segment.strip() and not echo_seen:
+                # A prompt left over from find_prompt(), not a command's output.
+                continue
+            if index == 0 and sink is not None:
+                if not echo_seen:
+                    first, _, rest = segment.lstrip("\n").partition("\n")
+                    segment = rest if commands[0] in first else segment
+                body = segment.rstrip("\n")
+                body = body + "\n" if body else body
+                sink.write(body)
+                finished(written + len(body))
+                continue
+            first, _, rest = segment.lstrip("\n").partition("\n")
+            text = rest if commands[index] in first else segment
+            finished(text.rstrip("\n"))
+
+        if index == 0 and sink is not None:
+            if not echo_seen:
+                if "\n" not in pending.lstrip("\n"):
+                    continue
+                first, _, rest = pending.lstrip("\n").partition("\n")
+                pending = rest if commands[0] in first else pending
+                echo_seen = True
+            keep = len(prompt) + 2
+            if len(pending) > keep:
+                sink.write(pending[:-keep])
+                written += len(pending) - keep
+                pending = pending[-keep:]
+                scanned = len(pending)
+    return results
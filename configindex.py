@@ -0,0 +1,146 @@
+import argparse
+import sqlite3
+import threading
+
+from confparse import load_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    line TEXT NOT NULL,
+    section TEXT NOT NULL,
+    device TEXT NOT NULL,
+    PRIMARY KEY (line, section, device)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lines_by_section ON lines (section, line);
+CREATE INDEX IF NOT EXISTS lines_by_device ON lines (device);
+CREATE TABLE IF NOT EXISTS devices (
+    device TEXT PRIMARY KEY,
+    sha TEXT NOT NULL
+);
+"""
+
+# Sorts after any character a config line can contain, closing prefix ranges.
+_PREFIX_END = "\U0010ffff"
+
+
+def normalize(line):
+    return " ".join(line.split())
+
+
+def config_rows(text):
+    """
+    (line, section) pairs for a config: global lines and section headers
+    with section '', every line nested under a section with that section's
+    header.
+    """
+    rows = set()
+    for node in load_config(text).root.children:
+        header = normalize(node.text)
+        rows.add((header, ""))
+        for child in node.walk():
+            rows.add((normalize(child.text), header))
+    return rows
+
+
+class ConfigIndex:
+    """
+    Inverted index from normalized config lines to the devices and sections
+    holding them, in one SQLite file. The table is clustered on the line, so
+    exact and prefix lookups are index range scans whatever the fleet size.
+    update() replaces one device's rows and is skipped when the config's sha
+    is the one already indexed.
+    """
+
+    def __init__(self, path="backups/config_index.sqlite"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def indexed_sha(self, device):
+        with self.lock:
+            row = self.db.execute("SELECT sha FROM devices WHERE device = ?", (device,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, device, text, sha):
+        """Indexes text as device's current config. Returns False if sha was already indexed."""
+        if self.indexed_sha(device) == sha:
+            return False
+        rows = [(line, section, device) for line, section in config_rows(text)]
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM lines WHERE device = ?", (device,))
+            self.db.executemany("INSERT INTO lines (line, section, device) VALUES (?, ?, ?)", rows)
+            self.db.execute("INSERT OR REPLACE INTO devices (device, sha) VALUES (?, ?)", (device, sha))
+        return True
+
+    def remove(self, device):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM lines WHERE device = ?", (device,))
+            self.db.execute("DELETE FROM devices WHERE device = ?", (device,))
+
+    def rebuild(self, store):
+        """Brings the index in line with the latest version of every device in a BackupStore."""
+        updated = 0
+        for device in list(store.index):
+            entry = store.latest(device)
+            if self.indexed_sha(device) != entry["sha"]:
+                self.update(device, store.read(entry["sha"]), entry["sha"])
+                updated += 1
+        return updated
+
+    def search(self, line=None, prefix=False, section=None, section_prefix=False):
+        """
+        Returns sorted (device, section, line) hits. line matches exactly, or
+        as a prefix with prefix=True; section ('' for global lines) limits
+        the hits to one section header, or to all headers starting with it
+        with section_prefix=True. At least one of line and section is needed.
+        """
+        where, args = [], []
+        for column, value, is_prefix in (("line", line, prefix), ("section", section, section_prefix)):
+            if value is None:
+                continue
+            value = normalize(value)
+            if is_prefix:
+                where.append(f"{column} >= ? AND {column} < ?")
+                args += [value, value + _PREFIX_END]
+            else:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if not where:
+            raise ValueError("search needs a line or a section")
+        query = f"SELECT device, section, line FROM lines WHERE {' AND '.join(where)} ORDER BY device, section, line"
+        with self.lock:
+            return self.db.execute(query, args).fetchall()
+
+    def devices_with(self, line, prefix=False, section=None, section_prefix=False):
+        return sorted({hit[0] for hit in self.search(line, prefix, section, section_prefix)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the config lines of all backed up devices.")
+    parser.add_argument("line", nargs="?", help="config line to look for")
+    parser.add_argument("--prefix", action="store_true", help="match lines starting with LINE")
+    parser.add_argument("--section", help="only lines under this section header ('' for global lines)")
+    parser.add_argument("--section-prefix", action="store_true", help="match section headers starting with SECTION")
+    parser.add_argument("--index", default="backups/config_index.sqlite")
+    parser.add_argument("--rebuild", metavar="STORE", help="index the latest configs in this BackupStore first")
+    args = parser.parse_args()
+
+    index = ConfigIndex(args.index)
+    if args.rebuild:
+        from store import BackupStore
+        print(f"Indexed {index.rebuild(BackupStore(args.rebuild))} changed configs")
+    if args.line is None and args.section is None:
+        return
+    for device, section, line in index.search(args.line, args.prefix, args.section, args.section_prefix):
+        print(f"{device:<24} {section or '(global)':<32} {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+from collections import OrderedDict
+import hashlib
+import re
+import threading
+
+
+class ConfigLine:
+    """One line of a running-config and the lines indented under it."""
+
+    def __init__(self, text, parent=None):
+        self.text = text
+        self.parent = parent
+        self.children = []
+        self._by_text = None
+
+    def child(self, text):
+        if self._by_text is None:
+            self._by_text = {c.text: c for c in self.children}
+        return self._by_text.get(text)
+
+    def add(self, text):
+        node = ConfigLine(text, self)
+        self.children.append(node)
+        if self._by_text is not None:
+            self._by_text.setdefault(text, node)
+        return node
+
+    def remove(self, node):
+        self.children.remove(node)
+        self._by_text = None
+
+    def replace(self, node, text):
+        node.text = text
+        self._by_text = None
+
+    def walk(self):
+        for node in self.children:
+            yield node
+            yield from node.walk()
+
+    def __repr__(self):
+        return f"ConfigLine({self.text!r}, {len(self.children)} children)"
+
+
+_SKIP = re.compile(r"^(!|:|Building configuration|Current configuration|end$)")
+
+
+def parse_config(text):
+    """
+    Parses IOS/ASA running-config text into a tree of ConfigLine nodes by
+    indentation, returning the root (whose text is None). Comment, banner
+    header and 'end' lines are dropped.
+    """
+    root = ConfigLine(None)
+    stack = [(-1, root)]
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        stripped = line.lstrip()
+        if not stripped or _SKIP.match(stripped):
+            continue
+        indent = len(line) - len(stripped)
+        while stack[-1][0] >= indent:
+            stack.pop()
+        node = stack[-1][1].add(stripped)
+        stack.append((indent, node))
+    return root
+
+
+SECTION_STARTS = (
+    "interface ", "router ", "ip access-list ", "ipv6 access-list ", "line ",
+    "object network ", "object service ", "object-group ", "class-map ",
+    "policy-map ", "route-map ", "ip dhcp pool ", "key chain ", "vlan ",
+    "crypto map ", "tunnel-group ", "group-policy ",
+)
+
+GLOBAL_COMMANDS = (
+    "hostname ", "ip route ", "no ip route ", "ipv6 route ", "route ",
+    "access-list ", "no access-list ", "access-group ", "ip nat inside source ",
+    "ip nat outside source ", "no router ", "no interface ", "no ip access-list ",
+    "ssh ", "username ", "enable ", "aaa ", "ip domain", "domain-name ",
+    "logging ", "ntp ", "snmp-server ", "banner ", "crypto key ", "ip ssh ",
+)
+
+
+def section_kind(text):
+    """
+    Splits a section header into (kind, name): 'interface Gi0/1' gives
+    ('interface', 'Gi0/1'), 'router ospf 1' gives ('router ospf', '1').
+    Returns None for lines that do not open a section.
+    """
+    for start in SECTION_STARTS:
+        if text.startswith(start):
+            kind, name = start.strip(), text[len(start):].strip()
+            if kind == "router":
+                protocol, _, name = name.partition(" ")
+                kind = f"router {protocol}"
+            return kind, name
+    return None
+
+
+class ParsedConfig:
+    """
+    A running-config tree (parse_config) plus an index over it:
+    sections[kind][name] is the section's node and lines[(kind, child)]
+    lists the names of the sections of that kind containing child, so
+    "interfaces with ip nat inside" is one dict lookup.
+    """
+
+    def __init__(self, text):
+        self.root = parse_config(text)
+        self.sections = {}
+        self.lines = {}
+        for node in self.root.children:
+            section = section_kind(node.text)
+            if section is None:
+                continue
+            kind, name = section
+            self.sections.setdefault(kind, {}).setdefault(name, node)
+            for child in node.children:
+                self.lines.setdefault((kind, child.text), []).append(name)
+
+    def section(self, kind, name):
+        return self.sections.get(kind, {}).get(name)
+
+    def sections_of(self, kind):
+        """{name: node} for every section of kind ('interface', 'router ospf', ...)."""
+        return self.sections.get(kind, {})
+
+    def with_line(self, kind, line):
+        """Names of the kind sections that contain line directly under their header."""
+        return self.lines.get((kind, line), [])
+
+
+_CACHE_SIZE = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_config(text):
+    """
+    ParsedConfig for text, shared between callers that pass the same
+    content (keyed by its sha256, last 256 kept). The returned tree must
+    be treated as read-only; use parse_config for a private copy.
+    """
+    key = hashlib.sha256(text.encode()).digest()
+    with _cache_lock:
+        parsed = _cache.get(key)
+        if parsed is not None:
+            _cache.move_to_end(key)
+            return parsed
+    parsed = ParsedConfig(text)
+    with _cache_lock:
+        _cache[key] = parsed
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def load_config_file(path):
+    """load_config for a saved *_running_config.txt file."""
+    with open(path, 'r') as f:
+        return load_config(f.read())
+
+
+def is_section_start(command):
+    return command.startswith(SECTION_STARTS)
+
+
+def is_global(command):
+    if command.startswith("nat (") and " source " in command:
+        return True
+    return command.startswith(GLOBAL_COMMANDS) or is_section_start(command)
+
+
+# Config lines that replace an existing line with the same keyword instead of adding one.
+REPLACED_KEYS = ("hostname ", "description ", "ip address ", "nameif ", "security-level ",
+                 "duplex ", "speed ", "version ")
+
+# Negated commands that IOS keeps in the running-config in their 'no' form.
+SHOWN_NEGATIONS = ("no auto-summary", "no ip address", "no ip domain lookup", "no ip http server",
+                   "no ip http secure-server", "no cdp run", "no service pad")
+
+
+# Interface defaults IOS may leave out of the running-config once set, so
+# their absence does not mean the command was lost.
+DEFAULTS_NOT_SHOWN = ("duplex auto", "speed auto")
+
+_STANDARD_HOST = re.compile(r"^((?:\d+ )?(?:permit|deny)) host (\S+)(.*)$")
+_NUMBERED_HOST = re.compile(r"^(access-list (\d+) (?:permit|deny)) host (\S+)(.*)$")
+_ASA_ROUTE = re.compile(r"^route \S+ \S+ \S+ \S+$")
+
+
+def shown_form(command, parent=None):
+    """
+    command as IOS writes it into the running-config. Standard ACL entries
+    lose their 'host' keyword: 'permit host 10.0.0.1' under 'ip access-list
+    standard X' (or in access-list 1-99/1300-1999) is shown as 'permit
+    10.0.0.1'. An ASA 'route IF NETWORK MASK GATEWAY' is shown with its
+    default distance of 1. parent is the text of the section command is
+    entered under.
+    """
+    if parent is not None and parent.startswith("ip access-list standard "):
+        match = _STANDARD_HOST.match(command)
+        if match:
+            return f"{match.group(1)} {match.group(2)}{match.group(3)}"
+        return command
+    match = _NUMBERED_HOST.match(command)
+    if match and (1 <= int(match.group(2)) <= 99 or 1300 <= int(match.group(2)) <= 1999):
+        return f"{match.group(1)} {match.group(3)}{match.group(4)}"
+    if parent is None and _ASA_ROUTE.match(command):
+        return command + " 1"
+    return command
+
+
+def _negates(node, positive):
+    return node.text == positive or node.text.startswith(positive + " ")
+
+
+def _secondary(text):
+    return text.endswith(" secondary")
+
+
+def apply_command(root, context, command):
+    """
+    Applies one configuration-mode command to the tree under root, the way
+    the CLI would: section starts enter (or create) their sub-mode, global
+    commands leave it, 'no X' removes X (a whole section for 'no router
+    ospf 1') and keyed lines such as ip address replace their old value.
+    context is the sub-mode the previous command left the CLI in; the one
+    this command leaves it in is returned.
+    """
+    command = command.strip()
+    if not command or command in ("exit", "end") or command.startswith("!"):
+        return root if command in ("exit", "end") else context
+    if is_global(command):
+        context = root
+    command = shown_form(command, context.text)
+    if command.startswith("no "):
+        positive = command[3:]
+        for node in list(context.children):
+            if _negates(node, positive):
+                context.remove(node)
+        if command in SHOWN_NEGATIONS and context.child(command) is None:
+            context.add(command)
+        return context
+    if is_section_start(command):
+        return root.child(command) or root.add(command)
+    stale = {f"no {command}"}
+    for key in REPLACED_KEYS:
+        if command.startswith(key) and not _secondary(command):
+            stale.add(f"no {key.strip()}")
+            # Secondary addresses sit next to the primary one, which only replaces the primary.
+            old = [node for node in context.children if node.text.startswith(key) and not _secondary(node.text)]
+            if old:
+                # Keep the line where it was, as the device would show it.
+                context.replace(old[0], command)
+                stale.update(node.text for node in old[1:] if node.text != command)
+    for node in list(context.children):
+        if node.text in stale:
+            context.remove(node)
+    if context.child(command) is None:
+        context.add(command)
+    return context
+
+
+def render_config(root):
+    """Running-config body text for a tree, one space of indent per level and '!' after each section."""
+    lines = []
+
+    def emit(node, depth):
+        lines.append(" " * depth + node.text)
+        for child in node.children:
+            emit(child, depth + 1)
+
+    for node in root.children:
+        emit(node, 0)
+        if node.children:
+            lines.append("!")
+    return "\n".join(lines)
+
+
+def group_commands(commands):
+    """
+    Splits a flat send_config_set-style command list into blocks of
+    (parent, [child commands]). Global commands form blocks with parent None
+    and a single child, mirroring how the CLI drops out of a sub-mode when a
+    global command follows. 'exit' and 'end' only close the current block
+    and '!' comments are dropped: none of them is configuration.
+    """
+    blocks = []
+    current = None
+    for command in commands:
+        command = command.strip()
+        if not command or command.startswith("!"):
+            continue
+        if command in ("exit", "end"):
+            current = None
+            continue
+        if is_section_start(command):
+            current = (command, [])
+            blocks.append(current)
+        elif current is not None and not is_global(command):
+            current[1].append(command)
+        else:
+            current = None
+            blocks.append((None, [command]))
+    return blocks
+
+
+def _present(parent, command):
+    """Whether command is already in effect under parent, allowing for how IOS displays it."""
+    command = shown_form(command, parent.text)
+    if command in DEFAULTS_NOT_SHOWN:
+        key = command.split()[0] + " "
+        if not any(c.text.startswith(key) for c in parent.children):
+            return True
+    if command.startswith("no "):
+        positive = command[3:]
+        return not any(c.text == positive or c.text.startswith(positive + " ")
+                       for c in parent.children)
+    return parent.child(command) is not None
+
+
+def missing_commands(running, commands):
+    """
+    Returns the part of commands that is not already in the running config
+    (a ConfigLine tree, ParsedConfig or raw text), with each sub-mode line preceded by its
+    parent. 'no X' lines are kept only where X is actually configured;
+    a section missing from the device is pushed whole.
+    """
+    if isinstance(running, str):
+        running = load_config(running).root
+    elif isinstance(running, ParsedConfig):
+        running = running.root
+    needed = []
+    for parent, children in group_commands(commands):
+        if parent is None:
+            needed.extend(c for c in children if not _present(running, c))
+            continue
+        section = running.child(parent)
+        if section is None:
+            needed.append(parent)
+            needed.extend(children)
+            continue
+        changed = [c for c in children if not _present(section, c)]
+        if changed:
+            needed.append(parent)
+            needed.extend(changed)
+    return needed
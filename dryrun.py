@@ -0,0 +1,123 @@
+import difflib
+import os
+
+from acl import print_fleet_report
+from confparse import apply_command, parse_config, render_config
+from ipam import print_conflicts
+from routing import build_network, print_problems
+
+
+class NoBackup(Exception):
+    """There is no backed up running-config to simulate a device's change against."""
+
+
+def simulate(running, commands):
+    """
+    Applies a send_config_set-style command list to a copy of the running
+    config (text or ConfigLine tree, left untouched) and returns the
+    predicted tree.
+    """
+    if not isinstance(running, str):
+        running = render_config(running)
+    root = parse_config(running)
+    context = root
+    for command in commands:
+        context = apply_command(root, context, command)
+    return root
+
+
+def predict(running, commands, hostname="device"):
+    """(predicted config text, unified diff against the backup) for one device."""
+    before = render_config(parse_config(running) if isinstance(running, str) else running) + "\n"
+    after = render_config(simulate(running, commands)) + "\n"
+    diff = difflib.unified_diff(before.splitlines(keepends=True), after.splitlines(keepends=True),
+                                f"{hostname} (backup)", f"{hostname} (predicted)")
+    return after, "".join(diff)
+
+
+def last_backup(hostname, store=None):
+    """The newest running-config of hostname from store, else from {hostname}_running_config.txt."""
+    if store is not None:
+        text = store.get(hostname)
+        if text is not None:
+            return text
+    try:
+        with open(f"{hostname}_running_config.txt", 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise NoBackup(f"no backup of {hostname} to simulate against") from None
+
+
+def inventory_hostnames(path="devices.yaml"):
+    """{host: hostname} from the inventory, the names backups are saved under; {} without an inventory."""
+    from inventory import load_devices
+    if not os.path.exists(path):
+        return {}
+    return {d["host"]: d["hostname"] for d in load_devices(path) if d.get("host") and d.get("hostname")}
+
+
+def backup_name(device, hostnames):
+    """
+    The name device's backups are stored under. Migration entries may spell
+    a hostname differently from the inventory (R8-PRD vs R8_PRD), so the
+    inventory entry with the same address wins.
+    """
+    return hostnames.get(device.get("ip") or device.get("host"), device["hostname"])
+
+
+def simulate_fleet(devices, store=None, hostnames=None):
+    """
+    Yields (device, predicted, diff, error) for every device dict with
+    'hostname' and 'commands', without opening any session. hostnames
+    ({address: inventory hostname}, see inventory_hostnames) maps each
+    device to the name its backups are under.
+    """
+    hostnames = inventory_hostnames() if hostnames is None else hostnames
+    for device in devices:
+        try:
+            running = last_backup(backup_name(device, hostnames), store)
+            predicted, diff = predict(running, device["commands"], device["hostname"])
+        except NoBackup as e:
+            yield device, None, None, e
+            continue
+        yield device, predicted, diff, None
+
+
+def print_dry_run(devices, store=None, inventory="devices.yaml"):
+    """
+    Prints each device's predicted diff and writes the predicted config to
+    {hostname}_predicted_config.txt, then traces the predicted routing
+    tables for loops and blackholes and the ACLs for rules that can never
+    match. Interface addresses are checked for conflicts against the rest
+    of the backed up fleet. Backups are looked up through the inventory by
+    address (see backup_name). Returns the number of devices that would change.
+    """
+    hostnames = inventory_hostnames(inventory)
+    changing = 0
+    predictions = {}
+    replaced = {}
+    for device, predicted, diff, error in simulate_fleet(devices, store, hostnames):
+        hostname = device["hostname"]
+        if error is not None:
+            print(f"Skipped {hostname}: {error}")
+            continue
+        predictions[hostname] = predicted
+        replaced[backup_name(device, hostnames)] = predicted
+        with open(f"{hostname}_predicted_config.txt", 'w') as f:
+            f.write(predicted)
+        if diff:
+            changing += 1
+            print(diff)
+        else:
+            print(f"--- {hostname}: no change ---")
+    print(f"{changing} of {len(devices)} devices would change.")
+    if predictions:
+        print("--- Forwarding check of the predicted configs ---")
+        print_problems(build_network(predictions))
+        print("--- ACL check of the predicted configs ---")
+        print_fleet_report(predictions)
+        print("--- Address check of the predicted configs and the other backups ---")
+        fleet = {d: store.get(d) for d in store.index} if store is not None else {}
+        fleet.update(replaced)
+        print_conflicts(fleet)
+    return changing
@@ -0,0 +1,365 @@
+import argparse
+import random
+import re
+import socket
+import threading
+import time
+
+import paramiko
+
+from confparse import apply_command, is_global, is_section_start, parse_config, render_config
+
+SUBMODE_PROMPTS = (
+    ("interface ", "config-if"),
+    ("router ", "config-router"),
+    ("line ", "config-line"),
+    ("ip access-list standard ", "config-std-nacl"),
+    ("ip access-list extended ", "config-ext-nacl"),
+    ("object network ", "config-network-object"),
+)
+
+FAILURES = ("auth", "drop", "hang")
+
+# ASA spellings of the show commands the fake answers with IOS output.
+ASA_SHOWS = {"show route": "show ip route", "show ospf neighbor": "show ip ospf neighbor"}
+
+
+def generate_config(hostname, lines, device_type="cisco_ios"):
+    """A plausible running-config of roughly `lines` lines."""
+    out = ["Building configuration...", "", f"Current configuration : {lines * 32} bytes", "!",
+           "! Last configuration change at 09:14:02 UTC Mon Oct 12 2026 by manager", "!",
+           f"hostname {hostname}", "!"]
+    i = 0
+    while len(out) < lines:
+        if device_type == "cisco_asa":
+            out += [f"interface GigabitEthernet0/{i}", f" nameif if{i}", " security-level 50",
+                    f" ip address 10.{i // 250}.{i % 250}.1 255.255.255.0", "!"]
+        else:
+            out += [f"interface Ethernet{i // 4}/{i % 4}", f" description auto-generated {i}",
+                    f" ip address 10.{i // 250}.{i % 250}.1 255.255.255.252", " duplex auto", "!"]
+        i += 1
+    out += ["router ospf 1", " network 10.0.0.0 0.255.255.255 area 0", "!", "end"]
+    return "\n".join(out)
+
+
+def apply_pipe(output, pipe):
+    """Applies an IOS '| include/exclude/begin/section' filter to output."""
+    kind, _, pattern = pipe.strip().partition(" ")
+    regex = re.compile(pattern.strip())
+    lines = output.splitlines()
+    if kind.startswith("i"):
+        return "\n".join(line for line in lines if regex.search(line))
+    if kind.startswith("e"):
+        return "\n".join(line for line in lines if not regex.search(line))
+    if kind.startswith("b"):
+        for index, line in enumerate(lines):
+            if regex.search(line):
+                return "\n".join(lines[index:])
+        return ""
+    if kind.startswith("s"):
+        picked, inside = [], False
+        for line in lines:
+            if not line.startswith(" "):
+                inside = bool(regex.search(line))
+            if inside:
+                picked.append(line)
+        return "\n".join(picked)
+    return output
+
+
+class FakeDevice:
+    """
+    State and CLI behaviour of one emulated IOS or ASA box. latency is
+    added before every response, failure is None or one of FAILURES.
+    OSPF/RIP show commands only report full adjacencies and the default
+    route converge_seconds after the last config change.
+    """
+
+    def __init__(self, hostname, device_type="cisco_ios", config_lines=200, latency=0.0,
+                 password="test123", secret="cisco", failure=None):
+        self.hostname = hostname
+        self.device_type = device_type
+        self.latency = latency
+        self.password = password
+        self.secret = secret
+        self.failure = failure
+        self.config = parse_config(generate_config(hostname, config_lines, device_type))
+        self.context = self.config
+        self.changed_at = time.gmtime()
+        self.changed_monotonic = 0.0
+        self.converge_seconds = 2.0
+        self.pushed = []
+        self.saves = 0
+        self.lock = threading.Lock()
+
+    def respond(self, line, mode):
+        """Returns (output, new_mode) for one command typed in mode."""
+        command = line.strip()
+        if mode == "password":
+            return ("", "enable") if command == self.secret else ("% Access denied", "exec")
+        if not command:
+            return "", mode
+        if command in ("end", "\x1a") and mode.startswith("config"):
+            return "", "enable"
+        if command == "exit":
+            if mode.startswith("config-"):
+                return "", "config"
+            return ("", "enable") if mode == "config" else ("", "closed")
+
+        if mode.startswith("config"):
+            return self.configure(command, mode)
+        if command in ("enable", "en"):
+            return ("Password: ", "password") if mode == "exec" else ("", mode)
+        if mode == "enable" and command in ("configure terminal", "conf t", "config term"):
+            return "Enter configuration commands, one per line.  End with CNTL/Z.", "config"
+        if command.startswith(("terminal ", "term ")):
+            return "", mode
+        if command.startswith(("write mem", "wr mem", "copy running-config startup-config")):
+            self.saves += 1
+            if self.device_type == "cisco_asa":
+                return "Building configuration...\nCryptochecksum: 1a2b3c4d 5e6f7a8b\n[OK]", mode
+            return "Building configuration...\n[OK]", mode
+        if command.startswith("show"):
+            return self.show(command), mode
+        return f"% Invalid input detected at '^' marker.\n{command}", mode
+
+    def configure(self, command, mode):
+        if command.startswith("hostname "):
+            self.hostname = command.split(None, 1)[1]
+        if command.startswith(("terminal ", "!")):
+            return "", mode
+        with self.lock:
+            self.pushed.append(command)
+        if command.startswith("do "):
+            return self.show(command[3:]), mode
+        if command.startswith("invalid"):
+            return "% Invalid input detected at '^' marker.", mode
+        self.apply(command, mode)
+        if is_section_start(command):
+            for prefix, submode in SUBMODE_PROMPTS:
+                if command.startswith(prefix):
+                    return "", submode
+            return "", "config-sub"
+        if is_global(command):
+            return "", "config"
+        return "", mode
+
+    def apply(self, command, mode):
+        """Applies one accepted config command to the running-config tree."""
+        if mode == "config":
+            self.context = self.config
+        self.changed_at = time.gmtime()
+        self.changed_monotonic = time.monotonic()
+        self.context = apply_command(self.config, self.context, command)
+
+    @property
+    def running_config(self):
+        body = render_config(self.config)
+        stamp = time.strftime("%H:%M:%S UTC %a %b %d %Y", self.changed_at)
+        return (f"Building configuration...\n\nCurrent configuration : {len(body)} bytes\n!\n"
+                f"! Last configuration change at {stamp} by manager\n!\n{body}\nend")
+
+    def show(self, command):
+        command, _, pipe = command.partition("|")
+        command = command.strip()
+        if self.device_type == "cisco_asa":
+            command = ASA_SHOWS.get(command, command)
+        if command.startswith(("show running-config", "show run")):
+            output = self.running_config
+        elif command.startswith("show version") and self.device_type == "cisco_asa":
+            stamp = time.strftime("%H:%M:%S.000 UTC %a %b %d %Y", self.changed_at)
+            output = (f"Cisco Adaptive Security Appliance Software Version 9.8(4)\n"
+                      f"{self.hostname} up 3 days 1 hour\n"
+                      f"Configuration last modified by manager at {stamp}")
+        elif command.startswith("show version"):
+            output = (f"Cisco IOS Software, Linux Software (I86BI_LINUX-ADVENTERPRISEK9-M), Version 15.4(2)T4\n"
+                      f"{self.hostname} uptime is 3 weeks, 2 days, 1 hour, 5 minutes\n"
+                      f"Configuration register is 0x2102")
+        elif command.startswith("show ip route"):
+            output = ("Codes: L - local, C - connected, S - static, R - RIP, O - OSPF\n\n"
+                      "Gateway of last resort is 10.1.8.2 to network 0.0.0.0\n\n")
+            if self.converged("router rip"):
+                output += "R*    0.0.0.0/0 [120/1] via 10.1.8.2, 00:00:11, Ethernet0/1\n"
+            elif self.converged("router ospf"):
+                output += "O*E2  0.0.0.0/0 [110/1] via 10.1.8.2, 00:10:11, Ethernet0/1\n"
+            output += ("      10.0.0.0/8 is variably subnetted, 2 subnets, 2 masks\n"
+                       "C        10.1.8.0/30 is directly connected, Ethernet0/1\n"
+                       "L        10.1.8.1/32 is directly connected, Ethernet0/1")
+        elif command.startswith("show ip ospf neighbor"):
+            output = "Neighbor ID     Pri   State           Dead Time   Address         Interface"
+            if self.routing("router ospf"):
+                state = "FULL/DR " if self.converged("router ospf") else "INIT/DROTHER"
+                output += f"\n10.1.12.1         1   {state}    00:00:35    10.1.8.2        Ethernet0/1"
+        elif command.startswith("show ip rip database"):
+            output = ""
+            if self.converged("router rip"):
+                output = ("0.0.0.0/0    auto-summary\n0.0.0.0/0\n"
+                          "    [1] via 10.1.8.2, 00:00:05, Ethernet0/1\n"
+                          "10.1.8.0/30    directly connected, Ethernet0/1")
+        else:
+            # What IOS answers for a command it does not know: a caret under
+            # the first word it could not parse, then the error.
+            words = command.split()
+            column = len(self.prompt("enable")) + len(" ".join(words[:1])) + 1
+            return " " * column + "^\n% Invalid input detected at '^' marker."
+        return apply_pipe(output, pipe) if pipe else output
+
+    def routing(self, protocol):
+        return any(node.text.startswith(protocol) for node in self.config.children)
+
+    def converged(self, protocol):
+        """Whether protocol is configured and converge_seconds have passed since the last change."""
+        return self.routing(protocol) and time.monotonic() - self.changed_monotonic >= self.converge_seconds
+
+    def prompt(self, mode):
+        if mode == "exec":
+            return f"{self.hostname}>"
+        if mode == "enable":
+            return f"{self.hostname}#"
+        if mode == "password":
+            return ""
+        if mode == "config":
+            return f"{self.hostname}(config)#"
+        return f"{self.hostname}({mode})#"
+
+
+class _SSHServer(paramiko.ServerInterface):
+    def __init__(self, device):
+        self.device = device
+        self.shell = threading.Event()
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if self.device.failure == "auth" or password != self.device.password:
+            return paramiko.AUTH_FAILED
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell.set()
+        return True
+
+
+def run_shell(device, channel):
+    mode = "enable" if device.device_type == "cisco_ios" and not device.secret else "exec"
+    channel.send(f"\r\n{device.prompt(mode)}")
+    buffer = ""
+    while True:
+        data = channel.recv(65536)
+        if not data:
+            return
+        buffer += data.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if device.failure == "drop" and line.startswith("show run"):
+                channel.close()
+                return
+            if device.failure == "hang" and line.startswith("show run"):
+                time.sleep(3600)
+            if device.latency:
+                time.sleep(device.latency)
+            echo = "" if mode == "password" else line
+            output, mode = device.respond(line, mode)
+            if mode == "closed":
+                channel.close()
+                return
+            reply = f"{echo}\r\n"
+            if output:
+                reply += output.replace("\n", "\r\n")
+                if not output.endswith(": "):
+                    reply += "\r\n"
+            channel.sendall(reply + device.prompt(mode))
+
+
+def _serve_connection(device, sock, host_key):
+    transport = paramiko.Transport(sock)
+    transport.add_server_key(host_key)
+    server = _SSHServer(device)
+    try:
+        transport.start_server(server=server)
+        channel = transport.accept(20)
+        if channel is None or not server.shell.wait(10):
+            return
+        run_shell(device, channel)
+    except (EOFError, OSError, paramiko.SSHException):
+        pass
+    finally:
+        transport.close()
+
+
+def serve_device(device, listener, host_key):
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            return
+        threading.Thread(target=_serve_connection, args=(device, sock, host_key), daemon=True).start()
+
+
+def start_fleet(count, config_lines=200, latency=0.0, fail_rate=0.0, asa_ratio=0.0,
+                host="127.0.0.1", seed=None):
+    """
+    Starts count fake devices, each listening on its own port, and returns
+    (inventory, devices, stop). inventory holds Netmiko-ready dicts (with
+    hostname) for the benchmark to connect with.
+    """
+    rng = random.Random(seed)
+    host_key = paramiko.RSAKey.generate(2048)
+    inventory, devices, listeners = [], [], []
+    for i in range(count):
+        device_type = "cisco_asa" if rng.random() < asa_ratio else "cisco_ios"
+        failure = rng.choice(FAILURES) if rng.random() < fail_rate else None
+        hostname = f"FAKE{i:05d}" + ("-ASA" if device_type == "cisco_asa" else "")
+        device = FakeDevice(hostname, device_type, config_lines, latency, failure=failure)
+        listener = socket.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((host, 0))
+        listener.listen(128)
+        threading.Thread(target=serve_device, args=(device, listener, host_key), daemon=True).start()
+        devices.append(device)
+        listeners.append(listener)
+        inventory.append({"device_type": device_type, "host": host, "port": listener.getsockname()[1],
+                          "username": "manager", "password": device.password,
+                          "secret": device.secret, "hostname": hostname})
+
+    def stop():
+        for listener in listeners:
+            listener.close()
+
+    return inventory, devices, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run emulated Cisco IOS/ASA SSH devices.")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--config-lines", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--asa-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    inventory, _, stop = start_fleet(args.count, args.config_lines, args.latency,
+                                     args.fail_rate, args.asa_ratio)
+    print("devices:")
+    for device in inventory:
+        print(f"  - device_type: {device['device_type']}\n    host: {device['host']}\n"
+              f"    port: {device['port']}\n    username: {device['username']}\n"
+              f"    hostname: {device['hostname']}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
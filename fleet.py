@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class DeviceDeadlineExceeded(Exception):
+    pass
+
+
+def run_fleet(devices, job, workers=16, deadline=None, wait_abandoned=False):
+    """
+    Runs job(device, deadline) for every device on a bounded pool of threads
+    and yields (device, result, error) as each one finishes.
+
+    deadline is the per-device budget in seconds, counted from the moment a
+    worker picks the device up. The job gets the absolute time.monotonic()
+    value it must finish by (or None) so it can size its own timeouts. A device
+    still running past its deadline is reported with DeviceDeadlineExceeded
+    and the run carries on without waiting for it. Its thread cannot be
+    stopped, though; with wait_abandoned the generator does not finish
+    until those threads have, so nothing started afterwards overlaps them.
+    """
+    started = {}
+
+    def timed(index, device):
+        started[index] = time.monotonic()
+        device_deadline = started[index] + deadline if deadline else None
+        return job(device, device_deadline)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        pending = {}
+        for index, device in enumerate(devices):
+            pending[executor.submit(timed, index, device)] = (index, device)
+
+        while pending:
+            timeout = None
+            if deadline:
+                now = time.monotonic()
+                running = [started[i] for i, _ in pending.values() if i in started]
+                if running:
+                    timeout = max(0, min(running) + deadline - now)
+                else:
+                    timeout = deadline
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, device = pending.pop(future)
+                try:
+                    yield device, future.result(), None
+                except Exception as e:
+                    yield device, None, e
+
+            if deadline:
+                now = time.monotonic()
+                for future, (index, device) in list(pending.items()):
+                    if index in started and now - started[index] >= deadline:
+                        del pending[future]
+                        yield device, None, DeviceDeadlineExceeded(
+                            f"no result after {deadline}s")
+    finally:
+        executor.shutdown(wait=wait_abandoned, cancel_futures=True)
+
+
+def remaining(deadline, cap=None, floor=1):
+    """Seconds left until deadline, clamped to [floor, cap]."""
+    if deadline is None:
+        return cap
+    left = max(floor, deadline - time.monotonic())
+    return min(left, cap) if cap else left
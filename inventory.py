@@ -0,0 +1,248 @@
+from array import array
+from bisect import bisect_right
+import hashlib
+import os
+import pickle
+import re
+
+CACHE_DIR = ".inventory_cache"
+CACHE_VERSION = 2
+
+# Inventory fields that describe a device but are not Netmiko connection arguments.
+INVENTORY_FIELDS = ("hostname", "site", "tags")
+
+
+def _scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _value(value):
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        return [_scalar(v) for v in value[1:-1].split(',') if v.strip()]
+    return _scalar(value)
+
+
+def parse_devices(text):
+    """
+    Parses the devices.yaml layout: a 'devices:' list of flat key/value
+    mappings. Values may be quoted, inline lists ([a, b]) or block lists
+    of '- item' lines under an empty key.
+    """
+    devices = []
+    current = None
+    list_key = None
+    list_indent = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#') or stripped == 'devices:':
+            continue
+        indent = len(line) - len(line.lstrip())
+
+        if stripped.startswith('-') and list_key is not None and indent > list_indent:
+            current[list_key].append(_scalar(stripped[1:]))
+            continue
+        list_key = None
+
+        if stripped.startswith('-'):
+            current = {}
+            devices.append(current)
+            stripped = stripped[1:].strip()
+            indent += 2
+            if not stripped:
+                continue
+        if current is None or ':' not in stripped:
+            continue
+        key, value = stripped.split(':', 1)
+        key = key.strip()
+        if value.strip():
+            current[key] = _value(value)
+        else:
+            current[key] = []
+            list_key, list_indent = key, indent
+    return devices
+
+
+MISSING = "\x00"
+LIST_SEP = "\x1f"
+
+
+class Inventory:
+    """
+    Compiled device list. Every field is kept as one newline-joined string
+    plus an array of row offsets, so loading the cache is a handful of
+    memcpys rather than one object per value; device dicts are only built
+    for the rows a caller asks for. device_type, site and tag have row
+    indexes, and hostname regexes run over the joined hostname column in
+    a single pass.
+    """
+
+    def __init__(self, devices):
+        self.count = len(devices)
+        self.columns = {}
+        self.list_fields = set()
+        keys = []
+        for device in devices:
+            keys.extend(k for k in device if k not in keys)
+        for key in keys:
+            values = []
+            for device in devices:
+                value = device.get(key, MISSING)
+                if isinstance(value, list):
+                    self.list_fields.add(key)
+                    value = LIST_SEP.join(value)
+                values.append(value)
+            offsets = array('L', [0])
+            for value in values:
+                offsets.append(offsets[-1] + len(value) + 1)
+            self.columns[key] = ("\n".join(values) + "\n", offsets)
+
+        self.indexes = {}
+        for key in ("device_type", "site", "tags"):
+            rows = {}
+            for i in range(self.count):
+                for value in self._values(key, i):
+                    rows.setdefault(value, array('L')).append(i)
+            self.indexes[key] = rows
+        self._by_hostname = None
+
+    def __len__(self):
+        return self.count
+
+    def _raw(self, key, i):
+        text, offsets = self.columns[key]
+        return text[offsets[i]:offsets[i + 1] - 1]
+
+    def _values(self, key, i):
+        if key not in self.columns:
+            return []
+        value = self._raw(key, i)
+        if value == MISSING:
+            return []
+        return value.split(LIST_SEP) if key in self.list_fields else [value]
+
+    def row(self, i):
+        device = {}
+        for key, (text, offsets) in self.columns.items():
+            value = text[offsets[i]:offsets[i + 1] - 1]
+            if value != MISSING:
+                device[key] = value.split(LIST_SEP) if key in self.list_fields else value
+        return device
+
+    def get(self, hostname):
+        if self._by_hostname is None:
+            self._by_hostname = {}
+            if "hostname" in self.columns:
+                for i in range(self.count):
+                    self._by_hostname.setdefault(self._raw("hostname", i), i)
+        i = self._by_hostname.get(hostname)
+        return self.row(i) if i is not None else None
+
+    def _matching_hostnames(self, pattern):
+        if "hostname" not in self.columns:
+            return []
+        text, offsets = self.columns["hostname"]
+        regex = re.compile(f"^[^\n]*?(?:{pattern})", re.MULTILINE)
+        rows = []
+        for match in regex.finditer(text):
+            row = bisect_right(offsets, match.start()) - 1
+            if not rows or rows[-1] != row:
+                rows.append(row)
+        return rows
+
+    def select(self, device_type=None, site=None, tag=None, hostname=None):
+        """
+        Returns the devices matching every given filter as dicts.
+        hostname is a regular expression searched in the hostname.
+        """
+        candidates = None
+        for key, value in (("device_type", device_type), ("site", site), ("tags", tag)):
+            if value is None:
+                continue
+            hits = self.indexes[key].get(value, ())
+            candidates = hits if candidates is None else sorted(set(candidates).intersection(hits))
+        if hostname is not None:
+            hits = self._matching_hostnames(hostname)
+            candidates = hits if candidates is None else sorted(set(candidates).intersection(hits))
+        if candidates is None:
+            candidates = range(self.count)
+        return [self.row(i) for i in candidates]
+
+
+def _cache_path(filepath):
+    absolute = os.path.abspath(filepath)
+    name = hashlib.sha1(absolute.encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(absolute), CACHE_DIR, f"{name}.pickle")
+
+
+def load_inventory(filepath="devices.yaml"):
+    """
+    Loads filepath through a compiled cache next to it. The cache is used as
+    is while the file's mtime and size are unchanged, revalidated by content
+    hash when they are not, and rebuilt when the content differs.
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        print(f"Error no devices file at {filepath}")
+        return Inventory([])
+
+    cache_path = _cache_path(filepath)
+    cached = None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get("version") != CACHE_VERSION:
+            cached = None
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        cached = None
+
+    if cached and (cached["mtime"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+        return cached["inventory"]
+
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached["sha"] == digest:
+        inventory = cached["inventory"]
+    else:
+        inventory = Inventory(parse_devices(raw.decode()))
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({"version": CACHE_VERSION, "mtime": stat.st_mtime_ns, "size": stat.st_size,
+                         "sha": digest, "inventory": inventory}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Could not write inventory cache {cache_path}: {e}")
+    return inventory
+
+
+def parse_filter(text):
+    """
+    Turns "device_type=cisco_asa,hostname~PRD" into select() keyword
+    arguments. '=' is an exact match, 'hostname~' takes a regex.
+    """
+    filters = {}
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if part.startswith('hostname~'):
+            filters['hostname'] = part.split('~', 1)[1].strip()
+        elif '=' in part:
+            key, value = part.split('=', 1)
+            filters[key.strip()] = value.strip()
+        else:
+            raise ValueError(f"bad inventory filter {part!r}")
+    return filters
+
+
+def load_devices(filepath="devices.yaml", filter=""):
+    """The devices in filepath matching filter (see parse_filter), as dicts."""
+    return load_inventory(filepath).select(**parse_filter(filter))
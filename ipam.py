@@ -0,0 +1,129 @@
+import argparse
+import ipaddress
+
+from confparse import load_config
+
+DUPLICATE = "duplicate address"
+OVERLAP = "overlapping subnets"
+MASK_MISMATCH = "mask mismatch"
+LINK = "bad point-to-point link"
+
+
+class Interface:
+    def __init__(self, device, name, address, length, shutdown=False):
+        self.device = device
+        self.name = name
+        self.address = address
+        self.length = length
+        self.shutdown = shutdown
+        self.network = address & (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+        self.last = self.network | (0xFFFFFFFF >> length) if length < 32 else self.network
+
+    def contains(self, address):
+        return self.network <= address <= self.last
+
+    def __str__(self):
+        return f"{self.device} {self.name} {ipaddress.IPv4Address(self.address)}/{self.length}"
+
+    def __repr__(self):
+        return f"Interface({self})"
+
+
+def interfaces_from_config(device, config):
+    """Every IPv4 address (primary and secondary) configured on the interfaces of a running-config."""
+    parsed = load_config(config) if isinstance(config, str) else config
+    found = []
+    for name, node in parsed.sections_of("interface").items():
+        children = [child.text for child in node.children]
+        shutdown = "shutdown" in children
+        for text in children:
+            words = text.split()
+            if words[:2] != ["ip", "address"] or len(words) < 4:
+                continue
+            try:
+                address = ipaddress.IPv4Address(words[2])
+                length = ipaddress.IPv4Network(f"0.0.0.0/{words[3]}").prefixlen
+            except ValueError:
+                continue  # dhcp, negotiated, ...
+            found.append(Interface(device, name, int(address), length, shutdown))
+    return found
+
+
+def find_conflicts(interfaces):
+    """
+    Returns [(kind, [Interface, ...])] for duplicate addresses, overlapping
+    subnets, mask mismatches between the two ends of a link and /30 or /31
+    subnets that do not hold exactly two hosts on two devices. Only two
+    sorts and linear sweeps, so it stays O(n log n) in the interface count.
+    """
+    conflicts = []
+
+    by_address = sorted(interfaces, key=lambda i: i.address)
+    start = 0
+    for i in range(1, len(by_address) + 1):
+        if i == len(by_address) or by_address[i].address != by_address[start].address:
+            if i - start > 1:
+                conflicts.append((DUPLICATE, by_address[start:i]))
+            start = i
+
+    # Sorted by start, widest first: every subnet is checked against the
+    # subnet reaching furthest among those before it.
+    by_range = sorted(interfaces, key=lambda i: (i.network, -i.last, i.device, i.name))
+    subnets = []
+    cover = None
+    for interface in by_range:
+        if subnets and (subnets[-1][0].network, subnets[-1][0].length) == (interface.network, interface.length):
+            subnets[-1].append(interface)
+        else:
+            subnets.append([interface])
+        if cover is not None and interface.network <= cover.last:
+            same_subnet = (cover.network, cover.length) == (interface.network, interface.length)
+            if not same_subnet:
+                kind = MASK_MISMATCH if cover.contains(interface.address) and interface.contains(cover.address) \
+                    else OVERLAP
+                conflicts.append((kind, [cover, interface]))
+            elif cover.device == interface.device and cover.name != interface.name:
+                conflicts.append((OVERLAP, [cover, interface]))
+        if cover is None or interface.last > cover.last:
+            cover = interface
+
+    for members in subnets:
+        if members[0].length not in (30, 31):
+            continue
+        hosts = [m for m in members if members[0].length == 31 or m.network < m.address < m.last]
+        devices = {m.device for m in members}
+        if len(members) != 2 or len(hosts) != 2 or len(devices) != 2:
+            conflicts.append((LINK, members))
+    return conflicts
+
+
+def fleet_interfaces(configs):
+    interfaces = []
+    for device, config in configs.items():
+        interfaces.extend(interfaces_from_config(device, config))
+    return interfaces
+
+
+def print_conflicts(configs):
+    """Checks {hostname: config} and prints every conflict; returns how many were found."""
+    interfaces = fleet_interfaces(configs)
+    conflicts = find_conflicts(interfaces)
+    for kind, members in conflicts:
+        print(f"{kind.upper()}: {', '.join(str(m) for m in members)}")
+    if not conflicts:
+        print(f"No address conflicts among {len(interfaces)} interfaces on {len(configs)} devices.")
+    return len(conflicts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and overlapping interface addresses in the backups.")
+    parser.add_argument("--store", default="backups", help="BackupStore to read the configs from")
+    args = parser.parse_args()
+
+    from store import BackupStore
+    store = BackupStore(args.store)
+    print_conflicts({device: store.get(device) for device in store.index})
+
+
+if __name__ == "__main__":
+    main()
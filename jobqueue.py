@@ -0,0 +1,348 @@
+import argparse
+import fcntl
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from netops import load_env_vars
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    devices TEXT NOT NULL,
+    options TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    results TEXT
+);
+CREATE INDEX IF NOT EXISTS shards_by_state ON shards (state, lease_until);
+"""
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Connection arguments that are never written to the queue; workers take them from their environment.
+SECRET_FIELDS = ("password", "secret")
+
+
+class JobQueue:
+    """
+    Backup and push work split into shards of devices in one SQLite file,
+    shared by the worker processes on this box. The file must be on a local
+    disk: WAL mode relies on shared memory that network filesystems do not
+    provide, so workers on other boxes cannot share it. A worker claims a
+    shard with a lease and keeps extending it while it runs; a shard whose
+    lease runs out (worker killed or stuck) is handed to the next worker
+    that asks, up to max_attempts times.
+    """
+
+    def __init__(self, path="jobqueue.sqlite", max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def enqueue(self, kind, devices, options=None, shard_size=100, run=None):
+        """Queues devices as shards of shard_size for job kind ('backup' or 'push'); returns the run id."""
+        run = run or time.strftime("%Y%m%dT%H%M%S")
+        options = json.dumps(options or {})
+        rows = []
+        for start in range(0, len(devices), shard_size):
+            shard = [{k: v for k, v in d.items() if k not in SECRET_FIELDS}
+                     for d in devices[start:start + shard_size]]
+            rows.append((run, kind, json.dumps(shard), options))
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany("INSERT INTO shards (run, kind, devices, options) VALUES (?, ?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+        return run
+
+    def claim(self, worker, lease=60):
+        """
+        Leases the oldest queued shard, or one whose lease has expired, to
+        worker. Returns (id, kind, devices, options) or None when there is
+        nothing to take right now.
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute("UPDATE shards SET state = ?, worker = NULL WHERE state = ? AND lease_until < ? "
+                                "AND attempts >= ?", (FAILED, LEASED, now, self.max_attempts))
+                row = self.db.execute(
+                    "SELECT id, kind, devices, options FROM shards WHERE state = ? "
+                    "OR (state = ? AND lease_until < ?) ORDER BY id LIMIT 1", (QUEUED, LEASED, now)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE shards SET state = ?, worker = ?, lease_until = ?, "
+                                    "attempts = attempts + 1 WHERE id = ?", (LEASED, worker, now + lease, row[0]))
+            finally:
+                self.db.execute("COMMIT")
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]), json.loads(row[3])
+
+    def heartbeat(self, shard, worker, lease=60):
+        """Extends worker's lease on shard; False if the shard has been taken over meanwhile."""
+        with self.lock:
+            cursor = self.db.execute("UPDATE shards SET lease_until = ? WHERE id = ? AND worker = ? AND state = ?",
+                                     (time.time() + lease, shard, worker, LEASED))
+        return cursor.rowcount == 1
+
+    def complete(self, shard, worker, results):
+        """Stores the shard's per-device results; False if worker no longer held the lease."""
+        with self.lock:
+            cursor = self.db.execute("UPDATE shards SET state = ?, results = ?, lease_until = NULL "
+                                     "WHERE id = ? AND worker = ? AND state = ?",
+                                     (DONE, json.dumps(results), shard, worker, LEASED))
+        return cursor.rowcount == 1
+
+    def pending(self, run=None):
+        """Shards not yet done or failed."""
+        query = "SELECT COUNT(*) FROM shards WHERE state IN (?, ?)"
+        args = [QUEUED, LEASED]
+        if run:
+            query += " AND run = ?"
+            args.append(run)
+        with self.lock:
+            return self.db.execute(query, args).fetchone()[0]
+
+    def status(self, run=None):
+        """{state: shard count}, for one run or all of them."""
+        query = "SELECT state, COUNT(*) FROM shards"
+        args = []
+        if run:
+            query += " WHERE run = ?"
+            args.append(run)
+        with self.lock:
+            return dict(self.db.execute(query + " GROUP BY state", args).fetchall())
+
+    def results(self, run):
+        """[(hostname, error or None, message)] of every finished shard of run."""
+        with self.lock:
+            rows = self.db.execute("SELECT results FROM shards WHERE run = ? AND state = ?", (run, DONE)).fetchall()
+        return [tuple(r) for (results,) in rows for r in json.loads(results)]
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def _make_job(kind, options, profile=None):
+    """
+    The device job for a shard and the journal.Journal it records to (or
+    None), built in the worker so nothing but JSON crosses the queue.
+    """
+    cache = None
+    if options.get("cache"):
+        from showcache import ShowCache
+        cache = ShowCache(options["cache"])
+    if kind == "backup":
+        from backup import backup_device
+        from configindex import ConfigIndex
+        from journal import Journal
+        from store import BackupStore
+        store = BackupStore(options.get("store", "backups"))
+        index = ConfigIndex(os.path.join(store.root, "config_index.sqlite"))
+        # enqueue-backup wrote the run's start marker; the workers only add to it.
+        journal = Journal(options["journal"], resume=True) if options.get("journal") else None
+        return partial(backup_device, store=store, profile=profile, show_commands=options.get("show_commands", ()),
+                       index=index, journal=journal, conditional=options.get("conditional", False),
+                       cache=cache), journal
+    if kind == "push":
+        from push import push_device
+        return partial(push_device, delta=options.get("delta", False), profile=profile,
+                       bulk=options.get("bulk", False), cache=cache), None
+    raise ValueError(f"unknown job kind {kind!r}")
+
+
+def _credentials(kind, devices):
+    password, secret = os.getenv("MANAGER_PASSWORD"), os.getenv("ENABLE_SECRET")
+    username = os.getenv("MANAGER_USERNAME", "manager")
+    for device in devices:
+        device['password'] = password
+        device['secret'] = secret
+        if kind == "push":
+            device.setdefault('username', username)
+    return devices
+
+
+def work(path="jobqueue.sqlite", worker=None, threads=16, deadline=120, lease=60, wait=False):
+    """
+    Claims and runs shards until the queue is drained (or forever with
+    wait). Each shard's devices go through fleet.run_fleet on `threads`
+    threads while a background thread keeps the lease alive. Once the lease
+    is lost no further device of the shard is started and the results are
+    reported as discarded: the worker that took the shard over redoes it.
+    """
+    from fleet import run_fleet
+    from journal import FAILED
+    from latency import LatencyProfile
+    from timing import recorder
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(path)
+    profile = LatencyProfile(os.getenv("LATENCY_PROFILE", "latency_profile.json"))
+    jobs = {}
+    done = 0
+    while True:
+        claimed = queue.claim(worker, lease)
+        if claimed is None:
+            # Shards leased by others may still come back if their worker dies.
+            if not wait and not queue.pending():
+                break
+            time.sleep(min(5, lease / 4))
+            continue
+        shard, kind, devices, options = claimed
+        key = (kind, json.dumps(options, sort_keys=True))
+        if key not in jobs:
+            jobs[key] = _make_job(kind, options, profile)
+        job, journal = jobs[key]
+
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(lease / 3):
+                if not queue.heartbeat(shard, worker, lease):
+                    lost.set()
+                    return
+
+        def leased(device, deadline, job=job, shard=shard):
+            if lost.is_set():
+                raise LeaseLost(f"lease on shard {shard} lost before the device was started")
+            return job(device, deadline)
+
+        beat = threading.Thread(target=keep_alive, daemon=True)
+        beat.start()
+        results = []
+        try:
+            for device, result, error in run_fleet(_credentials(kind, devices), leased,
+                                                   workers=threads, deadline=deadline, wait_abandoned=True):
+                hostname = device.get('hostname') or device.get('host') or device.get('ip')
+                if error is None:
+                    results.append((hostname, None, str(result)[-200:]))
+                else:
+                    results.append((hostname, type(error).__name__, str(error)))
+                    if journal is not None and not isinstance(error, LeaseLost):
+                        journal.record(hostname, FAILED, f"{type(error).__name__}: {error}")
+        finally:
+            stop.set()
+            beat.join()
+        failed = sum(1 for r in results if r[1])
+        if not lost.is_set() and queue.complete(shard, worker, results):
+            done += 1
+            print(f"{worker}: shard {shard} done, {len(results) - failed} ok, {failed} failed")
+            continue
+        skipped = sum(1 for r in results if r[1] == LeaseLost.__name__)
+        finished = [r[0] for r in results if r[1] != LeaseLost.__name__]
+        print(f"{worker}: lost the lease on shard {shard}; discarded the results of {len(finished)} devices "
+              f"({len(results) - failed} ok, {failed - skipped} failed), {skipped} not started: "
+              f"{', '.join(finished) or '-'}")
+
+    with open(f"{profile.path}.lock", 'a') as f:
+        # Every worker saves to the same profile: reload it under the lock so no one's samples are lost.
+        fcntl.flock(f, fcntl.LOCK_EX)
+        profile = LatencyProfile(profile.path)
+        profile.update_from(recorder.records)
+        profile.save()
+    recorder.export(os.getenv("TIMING_DIR", "timings"), worker=worker)
+    return done
+
+
+def _work_process(path, threads, deadline, lease, wait):
+    work(path, threads=threads, deadline=deadline, lease=lease, wait=wait)
+
+
+def spawn(path="jobqueue.sqlite", processes=4, threads=16, deadline=120, lease=60, wait=False):
+    """Runs `processes` worker processes on this box and waits for them."""
+    children = [multiprocessing.Process(target=_work_process, args=(path, threads, deadline, lease, wait))
+                for _ in range(processes)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard backup/push runs over worker processes through a shared queue.")
+    parser.add_argument("--queue", default="jobqueue.sqlite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backup = sub.add_parser("enqueue-backup", help="queue a backup of the inventory")
+    backup.add_argument("--inventory", default="devices.yaml")
+    backup.add_argument("--filter", default="", help="inventory filter, e.g. device_type=cisco_asa")
+    backup.add_argument("--store", default="backups")
+    backup.add_argument("--conditional", action="store_true")
+    backup.add_argument("--shard-size", type=int, default=100)
+    backup.add_argument("--journal", default=os.getenv("BACKUP_JOURNAL", "backup_journal.jsonl"))
+    backup.add_argument("--resume", action="store_true", help="skip the devices the interrupted run already saved")
+    backup.add_argument("--cache", default=os.getenv("SHOW_CACHE", ""), help="shared show-output cache to read through")
+
+    push = sub.add_parser("enqueue-push", help="queue the commands of a JSON list of device configs")
+    push.add_argument("configs", help="JSON file: [{ip, hostname, commands, device_type?}, ...]")
+    push.add_argument("--delta", action="store_true")
+    push.add_argument("--bulk", action="store_true")
+    push.add_argument("--shard-size", type=int, default=50)
+    push.add_argument("--cache", default=os.getenv("SHOW_CACHE", ""), help="show-output cache to invalidate")
+
+    run = sub.add_parser("work", help="claim and run shards until the queue is empty")
+    run.add_argument("--processes", type=int, default=1)
+    run.add_argument("--threads", type=int, default=16)
+    run.add_argument("--deadline", type=float, default=120)
+    run.add_argument("--lease", type=float, default=60)
+    run.add_argument("--wait", action="store_true", help="keep waiting for new shards")
+
+    status = sub.add_parser("status", help="shard counts per state")
+    status.add_argument("--run")
+    status.add_argument("--failures", action="store_true", help="list the devices that failed")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue-backup":
+        from inventory import load_devices
+        from journal import Journal
+        devices = Journal(args.journal, resume=args.resume).remaining(load_devices(args.inventory, args.filter))
+        for device in devices:
+            device['ssh_config_file'] = './ssh_config'
+        run_id = queue.enqueue("backup", devices, {"store": args.store, "conditional": args.conditional,
+                                                 "cache": args.cache, "journal": args.journal},
+                               shard_size=args.shard_size)
+        print(f"Queued {len(devices)} devices as run {run_id}")
+    elif args.command == "enqueue-push":
+        with open(args.configs, 'r') as f:
+            configs = json.load(f)
+        run_id = queue.enqueue("push", configs, {"delta": args.delta, "bulk": args.bulk, "cache": args.cache},
+                               shard_size=args.shard_size)
+        print(f"Queued {len(configs)} devices as run {run_id}")
+    elif args.command == "work":
+        load_env_vars()
+        if not os.getenv("MANAGER_PASSWORD") or not os.getenv("ENABLE_SECRET"):
+            print("no password/enable defined")
+            return
+        if args.processes > 1:
+            spawn(args.queue, args.processes, args.threads, args.deadline, args.lease, args.wait)
+        else:
+            work(args.queue, threads=args.threads, deadline=args.deadline, lease=args.lease, wait=args.wait)
+    else:
+        print(queue.status(args.run))
+        if args.failures and args.run:
+            for hostname, error, message in queue.results(args.run):
+                if error:
+                    print(f"{hostname}: {error}: {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+
+PENDING = "pending"
+CONNECTED = "connected"
+PUSHED = "pushed"
+SAVED = "saved"
+FAILED = "failed"
+
+START = "start"
+
+
+def device_name(device):
+    """The key a device is journaled under: its hostname, else its address."""
+    return device.get("hostname") or device.get("host") or device.get("ip")
+
+
+class Journal:
+    """
+    Append-only JSON-lines record of a run: one line per device state change
+    (pending, connected, pushed, saved, failed). Every line is flushed as it
+    is written, so whatever the process managed to do survives a crash or
+    Ctrl-C; there is no fsync, so a write costs a few microseconds even with
+    many workers.
+
+    A fresh run appends a start marker and only the lines after the last
+    marker count. With resume=True no marker is written, the previous run's
+    states are loaded and done() tells which devices already reached saved.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.states = {}
+        if resume:
+            self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'a')
+        if not resume:
+            self._write({"event": START, "time": time.time()})
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by the crash being resumed from
+                    if entry.get("event") == START:
+                        self.states = {}
+                    elif "device" in entry:
+                        self.states[entry["device"]] = entry["state"]
+        except FileNotFoundError:
+            pass
+
+    def _write(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def record(self, device, state, detail=None):
+        entry = {"device": device, "state": state, "time": round(time.time(), 3)}
+        if detail:
+            entry["detail"] = str(detail)
+        self.states[device] = state
+        self._write(entry)
+
+    def state(self, device):
+        return self.states.get(device)
+
+    def done(self, device):
+        return self.states.get(device) == SAVED
+
+    def remaining(self, devices):
+        """The devices not yet saved, each recorded as pending; prints how many are skipped."""
+        todo = [d for d in devices if not self.done(device_name(d))]
+        if len(todo) < len(devices):
+            print(f"Resuming: skipping {len(devices) - len(todo)} devices already done in {self.path}")
+        for device in todo:
+            self.record(device_name(device), PENDING)
+        return todo
+
+    def close(self):
+        with self.lock:
+            self.file.close()
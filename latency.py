@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+
+
+def _p95(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class LatencyProfile:
+    """
+    Observed phase times per host and per device_type, kept across runs in
+    a JSON file. Hosts keep their last `window` samples per phase, device
+    types ten times as many, so a host without history borrows the numbers
+    of its platform.
+    """
+
+    def __init__(self, path="latency_profile.json", window=20):
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.device_types = {}
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.hosts = data.get("hosts", {})
+            self.device_types = data.get("device_types", {})
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"Ignoring unreadable latency profile {path}: {e}")
+
+    def observe(self, host, device_type, phase, seconds):
+        with self.lock:
+            for table, key, window in ((self.hosts, host, self.window),
+                                       (self.device_types, device_type, self.window * 10)):
+                samples = table.setdefault(key, {}).setdefault(phase, [])
+                samples.append(round(seconds, 4))
+                del samples[:-window]
+
+    def update_from(self, records):
+        """
+        Feeds the records of a timing.Recorder into the profile. A failed
+        phase counts with the time it ran for: for a timeout that is the
+        timeout itself, so a host whose learned read_timeout was too short
+        gets a longer one next run instead of the same one forever.
+        """
+        for r in records:
+            self.observe(r["device"], r["device_type"], r["phase"], r["seconds"])
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({"hosts": self.hosts, "device_types": self.device_types})
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def _samples(self, host, device_type, phase):
+        with self.lock:
+            samples = self.hosts.get(host, {}).get(phase)
+            if not samples:
+                samples = self.device_types.get(device_type, {}).get(phase)
+            return list(samples or [])
+
+    def read_timeout(self, host, device_type, phase="send_command", default=20,
+                     headroom=3.0, floor=5, cap=300):
+        """
+        A read_timeout for phase on host: the p95 of what it took before
+        times headroom, kept within [floor, cap]; default without history.
+        """
+        samples = self._samples(host, device_type, phase)
+        if not samples:
+            return default
+        return round(min(cap, max(floor, _p95(samples) * headroom)), 1)
+
+    def delay_settings(self, host, device_type):
+        """
+        Netmiko connection arguments for host's pacing. Hosts whose connect
+        (TCP, SSH handshake and authentication, some five round trips) stays
+        under 2.5 s keep Netmiko's defaults; slower ones get a
+        global_delay_factor above 1 that grows with it. Netmiko 4 never
+        delays less than its defaults, so there is no factor below 1 to
+        speed fast hosts up.
+        """
+        samples = self._samples(host, device_type, "connect")
+        if not samples:
+            return {}
+        factor = round(min(4.0, _p95(samples) / 2.5), 2)
+        if factor <= 1:
+            return {}
+        return {"fast_cli": False, "global_delay_factor": factor}
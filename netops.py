@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import sys
+
+# Everything heavier than the standard library is imported inside the
+# subcommand that needs it, and Netmiko (with paramiko) only where a session
+# is opened (sessions.open_session), so `netops.py --help`, an offline
+# dry-run or a backup served from the show cache never load it. Netmiko
+# cannot be loaded per platform: importing any of its modules runs the
+# package __init__, which imports every driver. The older scripts
+# (sh_run_..., the migrations) run through the functions here.
+
+
+def load_env_vars(filepath=".env"):
+    try:
+        with open(filepath, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    os.environ[key.strip()] = value.strip().strip('"\'')
+    except FileNotFoundError:
+        print(f"{filepath}no file found make sure there is .env")
+
+
+def credentials():
+    """(username, password, enable secret) from the environment; exits if either secret is missing."""
+    password, secret = os.getenv("MANAGER_PASSWORD"), os.getenv("ENABLE_SECRET")
+    if not password or not secret:
+        print("no password/enable defined")
+        sys.exit(1)
+    return os.getenv("MANAGER_USERNAME", "manager"), password, secret
+
+
+def inventory_devices(args):
+    """The inventory devices selected by --host (one hostname, looked up directly) or --filter."""
+    from inventory import load_devices, load_inventory
+    if args.host:
+        device = load_inventory(args.inventory).get(args.host)
+        return [device] if device else []
+    return load_devices(args.inventory, args.filter)
+
+
+def load_configs(path, host=None):
+    """Migration-style entries [{ip, hostname, commands, device_type?}] from a JSON file."""
+    with open(path, 'r') as f:
+        configs = json.load(f)
+    return [c for c in configs if host is None or c["hostname"] == host]
+
+
+def probe(devices, mode):
+    """Drops (or with 'defer', moves to the end) the devices whose SSH port does not answer."""
+    if mode == "off":
+        return devices, None
+    from probe import probe_inventory, report, split_reachable
+    reachability = probe_inventory(devices, timeout=float(os.getenv("PROBE_TIMEOUT", "1")))
+    devices, unreachable = split_reachable(devices, reachability, defer=mode == "defer")
+    report(unreachable, reachability)
+    return devices, reachability
+
+
+def connect_failed(error):
+    """Whether error is Netmiko's connect timeout or authentication failure, without importing Netmiko."""
+    exceptions = sys.modules.get("netmiko.exceptions")
+    # Not loaded means no session was opened, so the error cannot be one of them.
+    return exceptions is not None and isinstance(
+        error, (exceptions.NetmikoTimeoutException, exceptions.NetmikoAuthenticationException))
+
+
+def show_cache(path):
+    if not path:
+        return None
+    from showcache import ShowCache
+    return ShowCache(path)
+
+
+def finish(profile):
+    from timing import recorder
+    if profile is not None:
+        profile.update_from(recorder.records)
+        profile.save()
+    recorder.print_summary()
+    recorder.export(os.getenv("TIMING_DIR", "timings"))
+
+
+def cmd_backup(args):
+    _, password, enable_secret = credentials()
+    devices = inventory_devices(args)
+    if not devices:
+        print(" no deivces defined in file")
+        return 1
+    for device in devices:
+        device['password'] = password
+        device['secret'] = enable_secret
+        device['ssh_config_file'] = './ssh_config'
+    devices, _ = probe(devices, args.probe)
+
+    from functools import partial
+
+    from backup import backup_device
+    from configindex import ConfigIndex
+    from fleet import run_fleet
+    from journal import FAILED, Journal, device_name
+    from latency import LatencyProfile
+    from store import BackupStore
+
+    store = BackupStore(args.store)
+    profile = LatencyProfile(os.getenv("LATENCY_PROFILE", "latency_profile.json"))
+    index = ConfigIndex(os.path.join(store.root, "config_index.sqlite"))
+    journal = Journal(args.journal, resume=args.resume)
+    devices = journal.remaining(devices)
+    job = partial(backup_device, store=store, profile=profile, show_commands=args.show, index=index,
+                  journal=journal, conditional=args.conditional, cache=show_cache(args.cache))
+
+    failed = 0
+    for device, filename, error in run_fleet(devices, job, workers=args.workers, deadline=args.deadline):
+        hostname = device.get('hostname', device.get('host'))
+        if error is None:
+            print(f"--- Running config for {device['host']} ({hostname}) saved to {filename} ---")
+            continue
+        failed += 1
+        if connect_failed(error):
+            print(f"failed to connect to {device['host']} ({hostname}): {error}")
+        else:
+            print(f"An error occured at {device['host']} ({hostname}): {error}")
+        journal.record(device_name(device), FAILED, f"{type(error).__name__}: {error}")
+    finish(profile)
+    return 1 if failed else 0
+
+
+def push_configs(devices, waves, username, password, enable_secret, profile, workers=8, deadline=None,
+                 probe_mode="skip", delta=False, bulk=False, journal=None, cache=None, pushed_at=None):
+    """
+    Pushes migration-style entries wave by wave (push.push_waves), printing
+    each result; returns how many failed. pushed_at is filled in with when
+    each device was pushed, for verify.print_convergence.
+    """
+    from push import push_waves
+
+    reachability = None
+    if probe_mode != "off":
+        # push_waves skips and reports the devices that are down.
+        from probe import probe_inventory
+        reachability = probe_inventory(devices, timeout=float(os.getenv("PROBE_TIMEOUT", "1")))
+    failed = 0
+    for wave, device_config, output, error in push_waves(devices, waves, username, password, enable_secret,
+                                                         workers=workers, deadline=deadline,
+                                                         reachability=reachability, delta=delta,
+                                                         profile=profile, bulk=bulk, journal=journal, cache=cache,
+                                                         pushed_at=pushed_at):
+        if error is None:
+            print(f"[wave {wave}] Configuration applied to {device_config['hostname']} successfully.")
+            print(output)
+            print(f"Configuration saved on {device_config['hostname']}.")
+        else:
+            failed += 1
+            print(f"[wave {wave}] Failed to connect or configure {device_config['hostname']}: {error}")
+    return failed
+
+
+def cmd_push(args):
+    username, password, enable_secret = credentials()
+    devices = load_configs(args.configs, args.host)
+    if not devices:
+        print(f"no devices to push in {args.configs}")
+        return 1
+
+    from latency import LatencyProfile
+    from store import BackupStore
+
+    if args.dry_run:
+        from dryrun import print_dry_run
+        print_dry_run(devices, BackupStore(args.store))
+        return 0
+
+    from journal import Journal
+
+    profile = LatencyProfile(os.getenv("LATENCY_PROFILE", "latency_profile.json"))
+    failed = push_configs(devices, [wave.split(",") for wave in args.wave], username, password, enable_secret,
+                          profile, workers=args.workers, deadline=args.deadline, probe_mode=args.probe,
+                          delta=args.delta, bulk=args.bulk, journal=Journal(args.journal, resume=args.resume),
+                          cache=show_cache(args.cache))
+    finish(profile)
+    return 1 if failed else 0
+
+
+def cmd_verify(args):
+    username, password, enable_secret = credentials()
+    with open(args.expect, 'r') as f:
+        expected = json.load(f)
+    if args.host:
+        expected = {args.host: expected[args.host]} if args.host in expected else {}
+    if args.configs:
+        devices = load_configs(args.configs)
+    else:
+        from inventory import load_inventory
+        inventory = load_inventory(args.inventory)
+        devices = []
+        for hostname in expected:
+            device = inventory.get(hostname)
+            if device is None:
+                print(f"{hostname} is not in {args.inventory}")
+                continue
+            devices.append({"ip": device["host"], "hostname": hostname,
+                            "device_type": device.get("device_type", "cisco_ios"),
+                            "port": device.get("port", 22)})
+
+    from verify import print_convergence
+    converged = print_convergence(devices, expected, username, password, enable_secret,
+                                  interval=args.interval, timeout=args.timeout, workers=args.workers)
+    return 0 if converged else 1
+
+
+def main(argv=None):
+    # Before the parser: its defaults come from the environment.
+    load_env_vars()
+    parser = argparse.ArgumentParser(description="Back up, push to and verify the network devices.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command, workers):
+        command.add_argument("--host", help="only this hostname")
+        command.add_argument("--workers", type=int, default=workers)
+
+    backup = sub.add_parser("backup", help="save the running-config of the inventory devices")
+    add_common(backup, int(os.getenv("BACKUP_WORKERS", "16")))
+    backup.add_argument("--inventory", default="devices.yaml")
+    backup.add_argument("--filter", default=os.getenv("INVENTORY_FILTER", ""),
+                        help="inventory filter, e.g. device_type=cisco_asa,hostname~PRD")
+    backup.add_argument("--store", default=os.getenv("BACKUP_STORE", "backups"))
+    backup.add_argument("--show", action="append",
+                        default=[c.strip() for c in os.getenv("BACKUP_SHOW_COMMANDS", "").split(",") if c.strip()],
+                        help="extra show command to save, repeatable")
+    backup.add_argument("--conditional", action="store_true", default=os.getenv("CONDITIONAL_BACKUP", "") == "1",
+                        help="skip configs whose last-change marker is unchanged")
+    backup.add_argument("--journal", default=os.getenv("BACKUP_JOURNAL", "backup_journal.jsonl"))
+    backup.add_argument("--resume", action="store_true", default=os.getenv("RESUME", "") == "1",
+                        help="skip the devices the interrupted run already saved")
+    backup.add_argument("--probe", choices=("skip", "defer", "off"), default=os.getenv("PROBE_MODE", "skip"))
+    backup.add_argument("--deadline", type=float, default=float(os.getenv("DEVICE_DEADLINE", "120")))
+    backup.add_argument("--cache", default=os.getenv("SHOW_CACHE", ""),
+                        help="shared show-output cache; devices with fresh output there are not contacted")
+    backup.set_defaults(run=cmd_backup)
+
+    push = sub.add_parser("push", help="push the commands of a JSON list of device configs")
+    add_common(push, 8)
+    push.add_argument("configs", help="JSON file: [{ip, hostname, commands, device_type?}, ...]")
+    push.add_argument("--wave", action="append", default=[],
+                      help="comma-separated hostnames/device_types pushed before the next wave, repeatable")
+    push.add_argument("--delta", action="store_true", help="send only the commands a device does not have yet")
+    push.add_argument("--bulk", action="store_true", help="send in large chunks and verify afterwards")
+    push.add_argument("--dry-run", action="store_true", help="only simulate the push on the last backups")
+    push.add_argument("--store", default=os.getenv("BACKUP_STORE", "backups"))
+    push.add_argument("--journal", default="push_journal.jsonl")
+    push.add_argument("--resume", action="store_true", help="skip the devices the interrupted run already saved")
+    push.add_argument("--probe", choices=("skip", "off"), default="skip")
+    push.add_argument("--deadline", type=float, default=None)
+    push.add_argument("--cache", default=os.getenv("SHOW_CACHE", ""),
+                      help="shared show-output cache to drop the pushed devices from")
+    push.set_defaults(run=cmd_push)
+
+    verify = sub.add_parser("verify", help="wait for the routing domain to converge")
+    add_common(verify, 16)
+    verify.add_argument("expect", help="JSON file: {hostname: {ospf_neighbors, routes, rip_routes}}")
+    verify.add_argument("--configs", help="take the device addresses from this push file instead of the inventory")
+    verify.add_argument("--inventory", default="devices.yaml")
+    verify.add_argument("--interval", type=float, default=5)
+    verify.add_argument("--timeout", type=float, default=300)
+    verify.set_defaults(run=cmd_verify)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,10 @@
-from netmiko import ConnectHandler
+import netops
+from dryrun import print_dry_run
+from journal import Journal
+from latency import LatencyProfile
+from showcache import shared_cache
+from store import BackupStore
+from verify import print_convergence
 
 # Define the credentials
 username = "manager"
@@ -158,29 +164,59 @@ devices = [
     }
 ]
 
-# Loop through each device and apply the configuration
-for device_config in devices:
-    print(f"Connecting to {device_config['hostname']} ({device_config['ip']})...")
-    device = {
-        "device_type": device_config["device_type"],
-        "host": device_config["ip"],
-        "username": username,
-        "password": password,
-        "secret": enable_secret,
-    }
+# Push order: core routers first, then the internet edge, then the ASA.
+# Every wave has to finish before the next one starts.
+waves = [
+    ["R8-PRD", "R1-PRD", "R2-PRD"],
+    ["R7-PRD-inet"],
+    ["cisco_asa"],
+]
+
+# Set to True to send only the commands each device does not already have
+delta_only = False
+
+# Set to True to send each device's commands in large chunks and verify them afterwards
+bulk_push = False
+
+# Set to True to only print the config each device would end up with, simulated on its last backup
+dry_run = False
+
+if dry_run:
+    print_dry_run(devices, BackupStore())
+    exit()
+
+# Set to True after an interrupted run to skip the devices it already configured and saved
+resume = False
 
-    try:
-        with ConnectHandler(**device) as net_connect:
-            net_connect.enable()
-            output = net_connect.send_config_set(device_config["commands"])
-            print(f"Configuration applied to {device_config['hostname']} successfully.")
-            print(output)
-            if device_config["device_type"] == "cisco_asa":
-                net_connect.send_command('write memory')
-            else:
-                net_connect.save_config()
-            print(f"Configuration saved on {device_config['hostname']}.")
-    except Exception as e:
-        print(f"Failed to connect or configure {device_config['hostname']}: {e}")
+# Every device's progress is written to this journal as the run goes
+journal = Journal("ospf_asa_acl_journal.jsonl", resume=resume)
+
+# Show output cached for these devices (in SHOW_CACHE, if set) is dropped as each one is pushed
+cache = shared_cache()
+
+# What every router has to show once the routing domain has converged
+expected = {
+    "R8-PRD": {"ospf_neighbors": 1, "routes": ["O 0.0.0.0/0"]},
+    "R1-PRD": {"ospf_neighbors": 2, "routes": ["O 0.0.0.0/0", "O 10.10.10.0/24"]},
+    "R2-PRD": {"ospf_neighbors": 2, "routes": ["O 0.0.0.0/0", "O 10.10.10.0/24"]},
+    "R7-PRD-inet": {"ospf_neighbors": 1, "routes": ["O 10.10.10.0/24"]},
+}
+
+# Timeouts and pacing learned from earlier runs
+profile = LatencyProfile()
+
+# Push each wave's devices in parallel and report them as they finish; devices
+# that do not answer on SSH are reported and left out. pushed_at records when
+# each one was done, so its convergence is timed from its own push.
+pushed_at = {}
+netops.push_configs(devices, waves, username, password, enable_secret, profile,
+                    delta=delta_only, bulk=bulk_push, journal=journal, cache=cache, pushed_at=pushed_at)
 
 print("\nAll devices have been configured.")
+
+# Poll the routers until the adjacencies and routes above show up, and time it
+print_convergence(devices, expected, username, password, enable_secret, pushed_at=pushed_at)
+
+# Remember this run's latencies for the next one and print the per-phase
+# timings, also written to timings/
+netops.finish(profile)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+
+class HostUnreachable(Exception):
+    pass
+
+
+def device_address(device):
+    return device.get("host") or device["ip"], int(device.get("port", 22))
+
+
+async def _probe(host, port, timeout, limit):
+    async with limit:
+        start = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except ConnectionRefusedError:
+            status = "refused"
+        except asyncio.TimeoutError:
+            status = "filtered"
+        except OSError:
+            status = "unreachable"
+        else:
+            status = "up"
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        return (host, port), status, time.monotonic() - start
+
+
+async def _probe_all(addresses, timeout, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(_probe(host, port, timeout, limit) for host, port in addresses))
+
+
+def probe_inventory(devices, timeout=1.0, concurrency=1000):
+    """
+    Opens a TCP connection to the SSH port of every device at once and
+    returns {(host, port): (status, seconds)}, keyed like device_address
+    since several devices may share an address on different ports. status is "up", "refused" (host
+    answered with RST), "filtered" (no answer within timeout) or
+    "unreachable" (no route / DNS failure).
+    """
+    addresses = {device_address(device) for device in devices}
+    results = asyncio.run(_probe_all(sorted(addresses), timeout, concurrency))
+    return {address: (status, seconds) for address, status, seconds in results}
+
+
+def split_reachable(devices, results, defer=False):
+    """
+    Splits devices into (to_run, skipped) by probe result. With defer the
+    filtered hosts (possibly just slow) are not skipped but moved to the end
+    of to_run, so they get their chance after every reachable device.
+    """
+    alive, deferred, skipped = [], [], []
+    for device in devices:
+        status, _ = results.get(device_address(device), ("up", 0))
+        if status == "up":
+            alive.append(device)
+        elif defer and status == "filtered":
+            deferred.append(device)
+        else:
+            skipped.append(device)
+    return alive + deferred, skipped
+
+
+def report(devices, results):
+    for device in devices:
+        host, port = address = device_address(device)
+        status, seconds = results[address]
+        where = host if port == 22 else f"{host}:{port}"
+        print(f"Skipping {where} ({device.get('hostname', host)}): SSH port {status} after {seconds:.2f}s")
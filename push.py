@@ -0,0 +1,231 @@
+import re
+import time
+import uuid
+from functools import partial
+
+from confparse import is_section_start, missing_commands, parse_config
+from fleet import run_fleet, remaining
+from journal import CONNECTED, FAILED, PUSHED, SAVED, device_name
+from probe import HostUnreachable, device_address, split_reachable
+from sessions import connect
+from showcache import invalidating
+from timing import phase
+
+
+ERROR_MARKERS = ("% Invalid", "% Incomplete", "% Ambiguous", "% Unknown", "ERROR:")
+
+# Prompts matched by shape, not by the hostname read before the push: the
+# pushed commands may include a new 'hostname'.
+ENABLE_PROMPT = r"^[\w.-]+#"
+CONFIG_PROMPT = r"[\w.-]+\([^)]*\)#"
+
+
+class PushVerificationError(Exception):
+    pass
+
+
+def bulk_send(net_connect, commands, chunk_size=50, read_timeout=30):
+    """
+    Sends commands in config mode chunk_size lines at a time without
+    waiting for each line's echo; each chunk costs one wait. Every chunk is
+    followed by a '!' comment line carrying a unique sentinel, and the wait
+    is for that sentinel's echo: chunks often end in lines that also occur
+    earlier ('no shutdown', 'duplex auto'), whose echo would come too soon.
+    The pushed commands may rename the device, so prompts are recognised
+    by their shape rather than by the hostname.
+    Returns (output, rejected) where rejected lists (command, error) for
+    every line the device answered with an error.
+    """
+    net_connect.config_mode()
+    output = ""
+    run = uuid.uuid4().hex[:12]
+    for number, start in enumerate(range(0, len(commands), chunk_size)):
+        chunk = commands[start:start + chunk_size]
+        sentinel = f"! bulk {run} chunk {number}"
+        net_connect.write_channel("\n".join([*chunk, sentinel]) + "\n")
+        output += net_connect.read_until_pattern(re.escape(sentinel), read_timeout=read_timeout)
+    net_connect.write_channel("end\n")
+    output += net_connect.read_until_pattern(ENABLE_PROMPT, re_flags=re.M, read_timeout=read_timeout)
+    # Later send_command calls wait for the base prompt; pick up a new hostname.
+    net_connect.set_base_prompt()
+
+    rejected = []
+    for segment in re.split(CONFIG_PROMPT, output)[1:]:
+        command, _, reply = segment.partition("\n")
+        for line in reply.splitlines():
+            if line.strip().startswith(ERROR_MARKERS):
+                rejected.append((command.strip(), line.strip()))
+                break
+    return output, rejected
+
+
+def connection_params(device_config, deadline=None):
+    """Netmiko arguments for a migration-script entry with username/password/secret merged in."""
+    return {
+        "device_type": device_config.get("device_type", "cisco_ios"),
+        "host": device_config["ip"],
+        "username": device_config["username"],
+        "password": device_config["password"],
+        "secret": device_config["secret"],
+        "port": int(device_config.get("port", 22)),
+        "conn_timeout": remaining(deadline, cap=10),
+        "auth_timeout": remaining(deadline, cap=10),
+    }
+
+
+def push_device(device_config, deadline=None, delta=False, profile=None, bulk=False, journal=None, cache=None):
+    """
+    Applies device_config["commands"] to one device and saves the config.
+    device_config is a migration-script entry (ip, hostname, commands and
+    optionally device_type) with username/password/secret merged in.
+
+    With delta the running-config is fetched first and only the commands
+    it does not already contain are sent; nothing is sent or saved when the
+    device is already in the intended state. A latency.LatencyProfile sets
+    the pacing and read timeouts from the device's history.
+
+    With bulk the commands go out through bulk_send instead of
+    send_config_set, and the running-config is then read once to check that
+    every line took effect. Rejected or missing lines raise
+    PushVerificationError and the config is not saved.
+
+    A journal.Journal gets the device's connected, pushed and saved states
+    as it reaches them.
+
+    With a showcache.ShowCache, the device's cached show output is dropped
+    once the session ends, pushed or not, since any command may have
+    landed.
+    """
+    device = connection_params(device_config, deadline)
+    device_type = device["device_type"]
+    host = device["host"]
+    show_timeout, config_timeout = 20, 30
+    if profile is not None:
+        device.update(profile.delay_settings(host, device_type))
+        show_timeout = profile.read_timeout(host, device_type, "send_command")
+        config_timeout = profile.read_timeout(host, device_type, "send_config_set", default=30)
+    with connect(device) as net_connect, invalidating(cache, device):
+        if journal is not None:
+            journal.record(device_config["hostname"], CONNECTED)
+        commands = device_config["commands"]
+        if delta:
+            with phase(host, device_type, "send_command"):
+                running = net_connect.send_command('show running-config',
+                                                   read_timeout=remaining(deadline, cap=show_timeout))
+            commands = missing_commands(running, commands)
+            if not commands:
+                if journal is not None:
+                    journal.record(device_config["hostname"], SAVED, "already up to date")
+                return "Already up to date, nothing pushed."
+        if bulk:
+            with phase(host, device_type, "send_config_set"):
+                output, rejected = bulk_send(net_connect, commands,
+                                             read_timeout=remaining(deadline, cap=config_timeout))
+            with phase(host, device_type, "verify"):
+                running = net_connect.send_command('show running-config',
+                                                   read_timeout=remaining(deadline, cap=show_timeout))
+            running = parse_config(running)
+            rejected_commands = {command for command, _ in rejected}
+            missing = [c for c in missing_commands(running, commands)
+                       if c not in rejected_commands
+                       and not (is_section_start(c) and running.child(c) is not None)]
+            if rejected or missing:
+                problems = [f"rejected: {c} ({e})" for c, e in rejected]
+                problems += [f"not in running-config: {c}" for c in missing]
+                raise PushVerificationError("; ".join(problems))
+        else:
+            with phase(host, device_type, "send_config_set"):
+                output = net_connect.send_config_set(commands,
+                                                     read_timeout=remaining(deadline, cap=config_timeout))
+        if journal is not None:
+            journal.record(device_config["hostname"], PUSHED)
+        with phase(host, device_type, "save_config"):
+            if device_type == "cisco_asa":
+                net_connect.send_command('write memory')
+            else:
+                net_connect.save_config()
+        if journal is not None:
+            journal.record(device_config["hostname"], SAVED)
+    return output
+
+
+def split_waves(devices, waves):
+    """
+    Groups devices into waves. Each wave is a list of hostnames and/or
+    device_types; a device goes into the first wave that names it. Devices
+    no wave names are pushed in a final wave of their own.
+    """
+    grouped = [[] for _ in waves]
+    leftover = []
+    for device in devices:
+        device_type = device.get("device_type", "cisco_ios")
+        for index, wave in enumerate(waves):
+            if device["hostname"] in wave or device_type in wave:
+                grouped[index].append(device)
+                break
+        else:
+            leftover.append(device)
+    if leftover:
+        grouped.append(leftover)
+    return [wave for wave in grouped if wave]
+
+
+def push_waves(devices, waves, username, password, secret, workers=8,
+               deadline=None, stop_on_failure=False, job=push_device,
+               reachability=None, journal=None, pushed_at=None, **options):
+    """
+    Pushes every device's commands wave by wave. Devices within a wave are
+    configured concurrently (at most `workers` at a time); the next wave only
+    starts once every device of the current one has finished. With
+    stop_on_failure a failed device keeps the later waves from starting.
+    A device past its deadline is reported as failed right away, but the
+    next wave only starts once its push has actually stopped.
+    Devices that reachability (from probe.probe_inventory) shows as down are
+    failed with HostUnreachable without opening a session. Any other
+    keyword options (delta, profile, bulk, cache) are passed on to the job.
+
+    With a journal.Journal, devices it already has as saved are skipped
+    (see Journal resume), the rest are recorded as pending, the job is
+    given the journal and failures are recorded too.
+
+    With pushed_at (a dict), every device pushed successfully is mapped from
+    its hostname to the time.monotonic() its push finished, the moment its
+    routing protocol started to converge (see verify.verify_convergence).
+
+    Yields (wave_number, device_config, output, error) as devices finish.
+    """
+    if journal is not None:
+        devices = journal.remaining(devices)
+        options["journal"] = journal
+    if options:
+        job = partial(job, **options)
+    if pushed_at is not None:
+        push = job
+
+        def job(device_config, deadline):
+            output = push(device_config, deadline)
+            pushed_at[device_config["hostname"]] = time.monotonic()
+            return output
+
+    for number, wave in enumerate(split_waves(devices, waves), start=1):
+        wave = [dict(device, username=username, password=password, secret=secret)
+                for device in wave]
+        failed = False
+        if reachability is not None:
+            wave, down = split_reachable(wave, reachability)
+            for device in down:
+                failed = True
+                status, _ = reachability[device_address(device)]
+                error = HostUnreachable(f"SSH port {status}")
+                if journal is not None:
+                    journal.record(device_name(device), FAILED, error)
+                yield number, device, None, error
+        for device, output, error in run_fleet(wave, job, workers=workers, deadline=deadline,
+                                               wait_abandoned=True):
+            failed = failed or error is not None
+            if error is not None and journal is not None:
+                journal.record(device_name(device), FAILED, f"{type(error).__name__}: {error}")
+            yield number, device, output, error
+        if failed and stop_on_failure:
+            print(f"Wave {number} had failures, not starting the remaining waves.")
+            return
@@ -3,10 +3,20 @@ print(f"--- Running script: {sys.argv[0]} ---", flush=True)
 
 # Import the 'os' library to interact with the operating system, for reading environment variables.
 import os
-# Import the main connection handler from the Netmiko library.
-from netmiko import ConnectHandler
+# Import the helper that hands out enabled SSH sessions, fresh or from the session broker.
+from sessions import connect
 # Import specific Netmiko exceptions to handle them gracefully.
 from netmiko.exceptions import NetmikoTimeoutException, NetmikoAuthenticationException
+# Import the inventory loader that reads devices.yaml.
+from inventory import load_devices, INVENTORY_FIELDS
+# Import the helpers that run one job per device on a pool of worker threads.
+from fleet import run_fleet, remaining
+# Import the quick TCP/22 check that runs before any SSH connection is attempted.
+from probe import probe_inventory, split_reachable, report
+# Import the helpers that write command output straight to a file and show a short preview of it.
+from capture import stream_to_file, preview
+# Import the recorder that times each phase of every device's session.
+from timing import recorder
 
 # Defines a function named load_env_vars that accepts a file path, defaulting to ".env".
 def load_env_vars(filepath=".env"):
@@ -29,7 +39,7 @@ def load_env_vars(filepath=".env"):
                     # Clean up the key by removing any extra whitespace around it.
                     key = key.strip()
                     # Clean up the value by first removing whitespace, then removing any surrounding quotes.
-                    value = value.strip().strip('"\'")
+                    value = value.strip().strip('"\'')
                     # Add the cleaned key and value to the script's environment variables.
                     os.environ[key] = value
     # If the file was not found in the 'try' block, this code will run.
@@ -37,62 +47,6 @@ def load_env_vars(filepath=".env"):
         # Print a warning message instead of crashing the script.
         print(f"Warning: {filepath} not found. Cannot load environment variables.")
 
-# Defines a function named load_devices_from_yaml that accepts a file path, defaulting to "devices.yaml".
-def load_devices_from_yaml(filepath="devices.yaml"):
-    """
-    Manually parses a simple YAML file for a list of devices.
-    This is a very basic parser and is not robust.
-    It expects a specific format as created in the previous step.
-    """
-    # Initialize an empty list to store the device dictionaries we find.
-    devices = []
-    # Start a 'try' block to handle a missing file.
-    try:
-        # Open the file and read all lines into a list of strings.
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-    # If the file doesn't exist, print an error and return the empty list.
-    except FileNotFoundError:
-        print(f"Error: {filepath} not found.")
-        return devices
-
-    # Initialize a state variable to hold the device dictionary currently being built.
-    current_device = None
-    # Loop through each line that was read from the file.
-    for line in lines:
-        # Get a clean version of the line with no leading/trailing whitespace.
-        stripped = line.strip()
-        # If the line is empty, a comment, or the 'devices:' header, skip to the next line.
-        if not stripped or stripped.startswith('#') or stripped == 'devices:':
-            continue
-
-        # Check if the line marks the beginning of a new device (starts with '-').
-        if stripped.startswith('-'):
-            # If we were already building a device, add the completed device to our list first.
-            if current_device:
-                devices.append(current_device)
-            # Reset current_device to a new empty dictionary for the new device.
-            current_device = {}
-            # Get the part of the string after the '-' to handle same-line key-value pairs.
-            rest_of_line = stripped[1:].strip()
-            # If a ':' exists on the same line, parse it as the first key-value pair.
-            if ':' in rest_of_line:
-                key, value = rest_of_line.split(':', 1)
-                current_device[key.strip()] = value.strip()
-        # If this is a normal indented line (not starting with '-'), process it.
-        elif current_device is not None and ':' in stripped:
-            # Split the line at the colon to get the key and value.
-            key, value = stripped.split(':', 1)
-            # Add the cleaned key-value pair to the device dictionary we are currently building.
-            current_device[key.strip()] = value.strip()
-    
-    # After the loop finishes, append the very last device to the list.
-    if current_device:
-        devices.append(current_device)
-    
-    # Return the final list of device dictionaries.
-    return devices
-
 # --- Main Script ---
 
 # Load the credentials from the .env file into the script's environment.
@@ -107,8 +61,10 @@ if not password or not enable_secret:
     print("Error: MANAGER_PASSWORD and ENABLE_SECRET must be set in the .env file.")
     exit()
 
-# Load the device inventory from the devices.yaml file.
-devices = load_devices_from_yaml()
+# Load the device inventory from the devices.yaml file. The parsed inventory is cached
+# next to the file, so this only re-reads devices.yaml after it has been edited.
+# INVENTORY_FILTER narrows the run down, e.g. "device_type=cisco_asa" or "hostname~PRD".
+devices = load_devices(filter=os.getenv("INVENTORY_FILTER", ""))
 
 # If no devices were loaded, print an error and exit the script.
 if not devices:
@@ -125,42 +81,72 @@ for device in devices:
     # Add the path to the SSH config file to handle legacy algorithms.
     device['ssh_config_file'] = './ssh_config'
 
-# Main loop to connect to each device and retrieve its configuration.
-for device in devices:
+# Defines the job that runs for a single device on one of the worker threads.
+# It receives the device dictionary and the time by which it has to be finished.
+def backup_with_debug(device, deadline):
+    # Work on a copy so the inventory entry keeps its hostname for reporting.
+    device = dict(device)
     # Get the hostname for display purposes, falling back to the host IP if not present.
     hostname = device.pop('hostname', device.get('host'))
-    # Start a 'try' block to handle any network or authentication errors gracefully.
-    try:
-        # Print a status message to the screen.
-        print(f"Connecting to {device['host']} ({hostname})...")
-        # Establish the SSH connection using all parameters in the 'device' dictionary.
-        # The 'with' statement ensures the connection is automatically closed.
-        with ConnectHandler(**device) as net_connect:
-            # Enter privileged (enable) mode on the device.
-            net_connect.enable()
-            # Send the 'show running-config' command and store the output.
-            output = net_connect.send_command('show running-config', read_timeout=20)
-            
-            # Display the device config on screen.
-            print("--- DEBUGGING INFO ---", flush=True)
-            print(f"Type of output: {type(output)}", flush=True)
-            print(f"Repr of output: {repr(output)}", flush=True)
-            print("--- DEVICE CONFIGURATION ---", flush=True)
-            print(output, flush=True)
-            print("--- END OF CONFIGURATION ---", flush=True)
-            
-            # Define a filename for the output based on the device's hostname.
-            filename = f"{hostname}_running_config.txt"
-            # Open the new file in write mode ('w').
-            with open(filename, 'w') as f:
-                # Write the captured configuration output to the file.
-                f.write(output)
-            # Print a success message indicating the file has been saved.
-            print(f"--- Running config for {device['host']} ({hostname}) saved to {filename} ---")
-
-    # If a timeout or authentication error occurs, catch it and print a specific message.
-    except (NetmikoTimeoutException, NetmikoAuthenticationException) as e:
-        print(f"Failed to connect to {device['host']} ({hostname}): {e}")
-    # Catch any other general errors that might occur.
-    except Exception as e:
-        print(f"An error occurred with {device['host']} ({hostname}): {e}")
+    # Drop inventory-only fields such as site and tags, which Netmiko does not accept.
+    for field in INVENTORY_FIELDS:
+        device.pop(field, None)
+    # Size Netmiko's connection timeouts from the time this device has left.
+    device['conn_timeout'] = remaining(deadline, cap=10)
+    device['auth_timeout'] = remaining(deadline, cap=10)
+    # Print a status message to the screen.
+    print(f"Connecting to {device['host']} ({hostname})...", flush=True)
+    # Define a filename for the output based on the device's hostname.
+    filename = f"{hostname}_running_config.txt"
+    # Get an SSH session that is already in privileged (enable) mode. If a session
+    # broker is running (SESSION_BROKER in .env) a warm session is borrowed from it,
+    # otherwise a new connection is made and closed when the 'with' block ends.
+    with connect(device) as net_connect:
+        # Send 'show running-config' and write the output to the file piece by piece
+        # as it arrives, instead of holding the whole configuration in memory.
+        size = stream_to_file(net_connect, 'show running-config', filename, read_timeout=remaining(deadline, cap=20))
+
+    # Display the start of the device config on screen. Only the first DEBUG_PREVIEW
+    # characters are shown; the complete configuration is in the file.
+    # Everything is printed in one call so devices finishing together do not interleave.
+    print(f"--- DEBUGGING INFO ({hostname}) ---\n"
+          f"Captured {size} characters to {filename}\n"
+          f"--- DEVICE CONFIGURATION (preview) ---\n"
+          f"{preview(filename, limit=int(os.getenv('DEBUG_PREVIEW', '2000')))}\n"
+          f"--- END OF CONFIGURATION ---", flush=True)
+
+    # Hand the filename back to the main loop.
+    return filename
+
+# Before any SSH session, check in one quick parallel pass which devices answer on port 22.
+# PROBE_MODE=skip (default) drops dead hosts, defer tries silent ones last, off disables the check.
+probe_mode = os.getenv("PROBE_MODE", "skip")
+if probe_mode != "off":
+    # Probe every device at once; this takes about as long as the probe timeout, not per device.
+    reachability = probe_inventory(devices, timeout=float(os.getenv("PROBE_TIMEOUT", "1")))
+    # Keep only the devices worth connecting to and print why the others were dropped.
+    devices, unreachable = split_reachable(devices, reachability, defer=probe_mode == "defer")
+    report(unreachable, reachability)
+
+# Read how many devices to work on at once and how long each one may take.
+workers = int(os.getenv("BACKUP_WORKERS", "16"))
+deadline = float(os.getenv("DEVICE_DEADLINE", "120"))
+
+# Main loop: run the job on all devices in parallel and report each one as soon as it finishes.
+for device, filename, error in run_fleet(devices, backup_with_debug, workers=workers, deadline=deadline):
+    # Get the hostname for display purposes, falling back to the host IP if not present.
+    hostname = device.get('hostname', device.get('host'))
+    # If no error came back, print a success message indicating the file has been saved.
+    if error is None:
+        print(f"--- Running config for {device['host']} ({hostname}) saved to {filename} ---")
+    # If a timeout or authentication error occurred, print a specific message.
+    elif isinstance(error, (NetmikoTimeoutException, NetmikoAuthenticationException)):
+        print(f"Failed to connect to {device['host']} ({hostname}): {error}")
+    # Any other general error, including running past the per-device deadline.
+    else:
+        print(f"An error occurred with {device['host']} ({hostname}): {error}")
+
+# Show which phase (connect, handshake, enable, show command, ...) took the most time,
+# then save the per-device timings as JSON lines and in Prometheus text format.
+recorder.print_summary()
+recorder.export(os.getenv("TIMING_DIR", "timings"))
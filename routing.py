@@ -0,0 +1,385 @@
+import argparse
+from bisect import bisect_right
+import ipaddress
+
+from confparse import load_config
+
+DELIVERED = "delivered"
+EXIT = "exit"
+BLACKHOLE = "blackhole"
+LOOP = "loop"
+UNKNOWN = "unknown"
+
+MAX_HOPS = 64
+
+
+def _addr(text):
+    return int(ipaddress.IPv4Address(text))
+
+
+def _mask_len(mask):
+    return ipaddress.IPv4Network(f"0.0.0.0/{mask}").prefixlen
+
+
+def _network(address, length):
+    return address & (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+
+
+def _is_address(text):
+    try:
+        ipaddress.IPv4Address(text)
+        return True
+    except ValueError:
+        return False
+
+
+class Route:
+    def __init__(self, network, length, kind, next_hop=None, interface=None, distance=1):
+        self.network = network
+        self.length = length
+        self.kind = kind
+        self.next_hop = next_hop
+        self.interface = interface
+        self.distance = distance
+
+    @property
+    def last(self):
+        return self.network | (0xFFFFFFFF >> self.length) if self.length < 32 else self.network
+
+    def __repr__(self):
+        via = ipaddress.IPv4Address(self.next_hop) if self.next_hop is not None else self.interface
+        return f"Route({ipaddress.IPv4Address(self.network)}/{self.length} {self.kind} via {via})"
+
+
+class PrefixTrie:
+    """Binary radix trie over IPv4 prefixes with longest-prefix-match lookup."""
+
+    def __init__(self):
+        # A node is [zero child, one child, value].
+        self.root = [None, None, None]
+
+    def insert(self, network, length, value):
+        node = self.root
+        for i in range(length):
+            bit = (network >> (31 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = value
+
+    def get(self, network, length):
+        node = self.root
+        for i in range(length):
+            node = node[(network >> (31 - i)) & 1]
+            if node is None:
+                return None
+        return node[2]
+
+    def lookup(self, address):
+        node = self.root
+        best = node[2]
+        for i in range(32):
+            node = node[(address >> (31 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                best = node[2]
+        return best
+
+
+class Router:
+    """
+    The RIB of one device: connected subnets of its up interfaces plus its
+    static routes. OSPF and RIP are not run; only which protocols the
+    router speaks and which prefixes it advertises into them (connected
+    subnets its network statements cover, or everything once it
+    redistributes or originates a default) are kept, so Network can tell
+    a destination that may be learned dynamically from a blackhole.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.trie = PrefixTrie()
+        self.routes = []
+        self.addresses = {}  # interface address -> interface name
+        self.nameifs = {}  # ASA nameif -> interface name
+        self.protocols = set()  # 'ospf', 'rip'
+        self.advertised = []  # (protocol, network, length)
+
+    def add_route(self, route):
+        current = self.trie.get(route.network, route.length)
+        if current is None or route.distance < current.distance:
+            self.trie.insert(route.network, route.length, route)
+        self.routes.append(route)
+
+    def lookup(self, address):
+        return self.trie.lookup(address)
+
+    def resolve(self, address, depth=0):
+        """The connected route through which address is reached, following recursive statics."""
+        route = self.lookup(address)
+        if route is None or depth > 8:
+            return None
+        if route.kind == "connected" or route.next_hop is None:
+            return route
+        return self.resolve(route.next_hop, depth + 1)
+
+
+def router_from_config(name, config):
+    """Builds a Router from running-config text (IOS or ASA) or a confparse.ParsedConfig."""
+    parsed = load_config(config) if isinstance(config, str) else config
+    router = Router(name)
+    subnets = []  # (interface address, network, length)
+    for ifname, node in parsed.sections_of("interface").items():
+        children = [child.text for child in node.children]
+        if "shutdown" in children:
+            continue
+        for text in children:
+            words = text.split()
+            if words[:1] == ["nameif"] and len(words) > 1:
+                router.nameifs[words[1]] = ifname
+            elif words[:2] == ["ip", "address"] and len(words) >= 4 and _is_address(words[2]):
+                address, length = _addr(words[2]), _mask_len(words[3])
+                router.addresses[address] = ifname
+                subnets.append((address, _network(address, length), length))
+                router.add_route(Route(_network(address, length), length, "connected",
+                                       interface=ifname, distance=0))
+            elif words[:3] == ["ip", "address", "dhcp"]:
+                # The DHCP server hands out the default route.
+                router.add_route(Route(0, 0, "dhcp", interface=ifname, distance=254))
+
+    for node in parsed.root.children:
+        words = node.text.split()
+        if words[:2] == ["ip", "route"] and len(words) >= 5 and _is_address(words[2]):
+            network, mask, rest = words[2], words[3], words[4:]
+            interface = None
+        elif words[:1] == ["route"] and len(words) >= 5 and _is_address(words[2]):
+            interface = router.nameifs.get(words[1], words[1])
+            network, mask, rest = words[2], words[3], words[4:]
+        else:
+            continue
+        next_hop = None
+        if _is_address(rest[0]):
+            next_hop = _addr(rest[0])
+            rest = rest[1:]
+        elif interface is None:
+            interface = rest[0]
+            rest = rest[1:]
+            if rest and _is_address(rest[0]):
+                next_hop = _addr(rest[0])
+                rest = rest[1:]
+        distance = int(rest[0]) if rest and rest[0].isdigit() else 1
+        length = _mask_len(mask)
+        router.add_route(Route(_network(_addr(network), length), length, "static",
+                               next_hop=next_hop, interface=interface, distance=distance))
+
+    for protocol in ("ospf", "rip"):
+        for node in parsed.sections_of(f"router {protocol}").values():
+            router.protocols.add(protocol)
+            for child in node.children:
+                words = child.text.split()
+                if words[:1] == ["redistribute"] or words[:2] == ["default-information", "originate"]:
+                    router.advertised.append((protocol, 0, 0))
+                elif words[:1] == ["network"] and len(words) >= 2 and _is_address(words[1]):
+                    covers = _network_statement(protocol, words)
+                    router.advertised += [(protocol, network, length) for address, network, length in subnets
+                                          if covers(address)]
+    return router
+
+
+def _network_statement(protocol, words):
+    """Whether an interface address is covered by a 'network' line of router ospf/rip."""
+    address = _addr(words[1])
+    if protocol == "rip":
+        # RIP network statements are classful.
+        length = 8 if address >> 31 == 0 else 16 if address >> 30 == 2 else 24
+        return lambda candidate: _network(candidate, length) == _network(address, length)
+    if len(words) < 3 or not _is_address(words[2]):
+        return lambda candidate: candidate == address
+    # IOS writes a wildcard (0.0.0.255), the ASA a mask (255.255.255.0).
+    mask = _addr(words[2])
+    if not mask & 0x80000000:
+        mask = ~mask & 0xFFFFFFFF
+    return lambda candidate: candidate & mask == address & mask
+
+
+class Network:
+    """
+    A set of routers, linked through the interface addresses they own.
+    trace() follows one destination hop by hop. For batches, every
+    destination is first mapped to an atomic interval: a range of addresses
+    that no route or interface address boundary crosses, so every router
+    forwards all of it the same way. Each (source, interval) is traced once
+    and every other pair in it is a bisect plus a dict lookup.
+    """
+
+    def __init__(self, routers):
+        self.routers = {router.name: router for router in routers}
+        self.owners = {}
+        for router in routers:
+            for address in router.addresses:
+                self.owners[address] = router.name
+        bounds = {0}
+        for router in routers:
+            for route in router.routes:
+                bounds.add(route.network)
+                if route.last < 0xFFFFFFFF:
+                    bounds.add(route.last + 1)
+            for address in router.addresses:
+                bounds.add(address)
+                if address < 0xFFFFFFFF:
+                    bounds.add(address + 1)
+        self.bounds = sorted(bounds)
+        self.advertised = []  # (protocol, first address, last address, advertising router)
+        for router in routers:
+            for protocol, network, length in router.advertised:
+                self.advertised.append((protocol, network, Route(network, length, protocol).last, router.name))
+        self._outcomes = {}
+
+    def learnable(self, name, destination):
+        """Whether router name could learn a route to destination over OSPF or RIP from another router."""
+        protocols = self.routers[name].protocols
+        return any(protocol in protocols and first <= destination <= last and source != name
+                   for protocol, first, last, source in self.advertised)
+
+    def trace(self, source, destination):
+        """
+        Follows destination from router source. Returns (outcome, hops) with
+        hops a list of (router, route) and outcome one of delivered (an
+        address of, or a host on a subnet of, the last router), exit (handed
+        to a next hop outside the network), blackhole, loop, or unknown
+        (the router has no route, but could learn one over OSPF or RIP).
+        """
+        if isinstance(destination, str):
+            destination = _addr(destination)
+        hops = []
+        seen = set()
+        current = source
+        while len(hops) < MAX_HOPS:
+            if current in seen:
+                return LOOP, hops
+            seen.add(current)
+            router = self.routers[current]
+            if destination in router.addresses:
+                hops.append((current, None))
+                return DELIVERED, hops
+            route = router.lookup(destination)
+            hops.append((current, route))
+            if route is None:
+                return (UNKNOWN if self.learnable(current, destination) else BLACKHOLE), hops
+            if route.kind == "connected":
+                owner = self.owners.get(destination)
+                if owner is None or owner == current:
+                    return DELIVERED, hops
+                current = owner
+                continue
+            if route.next_hop is None:
+                if route.interface and route.interface.lower().startswith("null"):
+                    return BLACKHOLE, hops
+                return EXIT, hops
+            if router.resolve(route.next_hop) is None:
+                return (UNKNOWN if self.learnable(current, route.next_hop) else BLACKHOLE), hops
+            owner = self.owners.get(route.next_hop)
+            if owner is None:
+                return EXIT, hops
+            current = owner
+        return LOOP, hops
+
+    def interval(self, address):
+        return bisect_right(self.bounds, address) - 1
+
+    def outcome(self, source, interval):
+        key = (source, interval)
+        result = self._outcomes.get(key)
+        if result is None:
+            outcome, hops = self.trace(source, self.bounds[interval])
+            result = self._outcomes[key] = (outcome, tuple(name for name, _ in hops))
+        return result
+
+    def evaluate(self, pairs):
+        """[(outcome, path)] for an iterable of (source router, destination address) pairs."""
+        results = []
+        for source, destination in pairs:
+            if isinstance(destination, str):
+                destination = _addr(destination)
+            results.append(self.outcome(source, self.interval(destination)))
+        return results
+
+    def internal_ranges(self):
+        """Atomic intervals inside some router's connected subnet: the destinations the network should reach."""
+        ranges = []
+        for router in self.routers.values():
+            for route in router.routes:
+                if route.kind == "connected":
+                    first = self.interval(route.network)
+                    last = self.interval(route.last)
+                    ranges.append((first, last))
+        return ranges
+
+    def problems(self):
+        """
+        Every loop, and every blackhole towards an internal destination, as
+        (source, outcome, first address, last address, path), adjacent
+        intervals merged. Destinations only OSPF or RIP could route
+        (unknown) are not problems: their routes are not modelled.
+        """
+        wanted = set()
+        for first, last in self.internal_ranges():
+            wanted.update(range(first, last + 1))
+        found = []
+        for source in sorted(self.routers):
+            for i in range(len(self.bounds)):
+                outcome, path = self.outcome(source, i)
+                if outcome == LOOP or (outcome == BLACKHOLE and i in wanted):
+                    end = self.bounds[i + 1] - 1 if i + 1 < len(self.bounds) else 0xFFFFFFFF
+                    if (found and found[-1][0] == source and found[-1][1] == outcome
+                            and found[-1][4] == path and found[-1][3] + 1 == self.bounds[i]):
+                        found[-1] = found[-1][:3] + (end, path)
+                    else:
+                        found.append((source, outcome, self.bounds[i], end, path))
+        return found
+
+
+def build_network(configs):
+    """Network from {hostname: running-config text or ParsedConfig}."""
+    return Network([router_from_config(name, config) for name, config in configs.items()])
+
+
+def format_range(first, last):
+    networks = list(ipaddress.summarize_address_range(ipaddress.IPv4Address(first), ipaddress.IPv4Address(last)))
+    if len(networks) == 1:
+        return str(networks[0])
+    return f"{ipaddress.IPv4Address(first)} - {ipaddress.IPv4Address(last)}"
+
+
+def print_problems(network):
+    """Prints loops and internal blackholes; returns how many were found."""
+    problems = network.problems()
+    for source, outcome, first, last, path in problems:
+        print(f"{outcome.upper()}: from {source} to {format_range(first, last)} via {' -> '.join(path)}")
+    if not problems:
+        print(f"No loops or blackholes between {len(network.routers)} routers.")
+    return len(problems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace forwarding paths through the backed up configs.")
+    parser.add_argument("source", nargs="?", help="hostname of the router the trace starts at")
+    parser.add_argument("destination", nargs="?", help="destination IPv4 address")
+    parser.add_argument("--store", default="backups", help="BackupStore to read the configs from")
+    args = parser.parse_args()
+
+    from store import BackupStore
+    store = BackupStore(args.store)
+    network = build_network({device: store.get(device) for device in store.index})
+    if args.source is None:
+        print_problems(network)
+        return
+    outcome, hops = network.trace(args.source, args.destination)
+    for name, route in hops:
+        print(f"{name:<24} {route if route is not None else 'local'}")
+    print(outcome)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+
+from timing import phase
+
+BROKER_ADDRESS = ("127.0.0.1", 50022)
+
+# The only session methods a broker client may call. The channel reads and
+# writes are what capture.send_batch/stream_command and push.bulk_send run on.
+BROKER_METHODS = frozenset((
+    "send_command", "send_config_set", "save_config", "find_prompt",
+    "write_channel", "read_channel", "read_until_pattern", "config_mode", "exit_config_mode",
+    "set_base_prompt",
+))
+
+# Per-process key for the credential digest in session_key; never leaves the process.
+_CREDENTIAL_KEY = os.urandom(32)
+
+
+def credential_digest(device):
+    """HMAC of the device's password and enable secret, so pooled sessions are only reused with the same credentials."""
+    material = f"{device.get('password') or ''}\0{device.get('secret') or ''}".encode()
+    return hmac.new(_CREDENTIAL_KEY, material, hashlib.sha256).hexdigest()
+
+
+def session_key(device):
+    return (device.get("device_type"), device["host"], device.get("port", 22),
+            device.get("username"), credential_digest(device))
+
+
+def open_session(device):
+    """
+    Opens a new Netmiko session and enters enable mode, timing the connect
+    (TCP, SSH handshake and authentication, through whatever ssh_config
+    proxy the device uses), session preparation and enable separately.
+    """
+    from netmiko import ConnectHandler
+
+    host, device_type = device["host"], device.get("device_type")
+    net_connect = ConnectHandler(**device, auto_connect=False)
+    try:
+        with phase(host, device_type, "connect"):
+            net_connect.establish_connection()
+        with phase(host, device_type, "session_prep"):
+            # session_preparation() needs something on the channel to find the prompt in.
+            net_connect.write_channel(net_connect.RETURN)
+            net_connect.session_preparation()
+        with phase(host, device_type, "enable"):
+            net_connect.enable()
+    except Exception:
+        _disconnect(net_connect)
+        raise
+    return net_connect
+
+
+class SessionPool:
+    """
+    Keeps authenticated, enabled Netmiko sessions warm per host.
+
+    acquire() hands out an idle session for the device if one is alive and
+    opens a new one otherwise. At most max_sessions exist at once; when the
+    cap is hit the least recently used idle session is closed to make room,
+    or the caller waits for one to be released. Sessions idle for longer
+    than idle_timeout are closed by a background reaper.
+    """
+
+    def __init__(self, max_sessions=64, idle_timeout=300, opener=open_session):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.opener = opener
+        self.idle = {}
+        self.busy = 0
+        self.lock = threading.Condition()
+        self.closed = False
+        reaper = threading.Thread(target=self._reap, daemon=True)
+        reaper.start()
+
+    def _count(self):
+        return self.busy + sum(len(sessions) for sessions in self.idle.values())
+
+    def _pop_lru_idle(self):
+        oldest_key, oldest_at = None, None
+        for key, sessions in self.idle.items():
+            if sessions and (oldest_at is None or sessions[0][1] < oldest_at):
+                oldest_key, oldest_at = key, sessions[0][1]
+        if oldest_key is None:
+            return None
+        net_connect, _ = self.idle[oldest_key].pop(0)
+        return net_connect
+
+    def acquire(self, device):
+        key = session_key(device)
+        while True:
+            stale = []
+            with self.lock:
+                while True:
+                    sessions = self.idle.get(key)
+                    if sessions:
+                        net_connect, _ = sessions.pop()
+                        self.busy += 1
+                        break
+                    if self._count() < self.max_sessions:
+                        net_connect = None
+                        self.busy += 1
+                        break
+                    victim = self._pop_lru_idle()
+                    if victim is not None:
+                        stale.append(victim)
+                        continue
+                    self.lock.wait()
+            for victim in stale:
+                _disconnect(victim)
+
+            if net_connect is None:
+                try:
+                    return self.opener(device)
+                except Exception:
+                    self._forget()
+                    raise
+            if net_connect.is_alive():
+                return net_connect
+            self._forget()
+            _disconnect(net_connect)
+
+    def release(self, device, net_connect, broken=False):
+        if broken or self.closed:
+            self._forget()
+            _disconnect(net_connect)
+            return
+        with self.lock:
+            self.busy -= 1
+            self.idle.setdefault(session_key(device), []).append((net_connect, time.monotonic()))
+            self.lock.notify()
+
+    def _forget(self):
+        with self.lock:
+            self.busy -= 1
+            self.lock.notify()
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self.lock:
+            for key, sessions in self.idle.items():
+                expired.extend(s for s, at in sessions if at < cutoff)
+                sessions[:] = [(s, at) for s, at in sessions if at >= cutoff]
+            if expired:
+                self.lock.notify_all()
+        for net_connect in expired:
+            _disconnect(net_connect)
+        return len(expired)
+
+    def _reap(self):
+        while not self.closed:
+            time.sleep(min(30, self.idle_timeout))
+            self.evict_idle()
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            sessions = [s for idle in self.idle.values() for s, _ in idle]
+            self.idle.clear()
+        for net_connect in sessions:
+            _disconnect(net_connect)
+
+    @contextmanager
+    def session(self, device):
+        net_connect = self.acquire(device)
+        try:
+            yield net_connect
+        except Exception:
+            self.release(device, net_connect, broken=True)
+            raise
+        self.release(device, net_connect)
+
+
+def _disconnect(net_connect):
+    try:
+        net_connect.disconnect()
+    except Exception:
+        pass
+
+
+class Broker:
+    """
+    Runs Netmiko calls on pooled sessions on behalf of other processes.
+    A client leases a session, calls methods on it by name and releases it.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.leases = {}
+        self.lock = threading.Lock()
+
+    def lease(self, device):
+        net_connect = self.pool.acquire(device)
+        lease_id = uuid.uuid4().hex
+        with self.lock:
+            self.leases[lease_id] = (device, net_connect)
+        return lease_id
+
+    def call(self, lease_id, method, args=(), kwargs=None):
+        if method not in BROKER_METHODS:
+            raise AttributeError(f"{method} is not allowed through the session broker")
+        _, net_connect = self.leases[lease_id]
+        return getattr(net_connect, method)(*args, **(kwargs or {}))
+
+    def release(self, lease_id, broken=False):
+        with self.lock:
+            device, net_connect = self.leases.pop(lease_id)
+        self.pool.release(device, net_connect, broken=broken)
+
+    def stats(self):
+        with self.pool.lock:
+            return {"busy": self.pool.busy,
+                    "idle": {f"{key[1]}:{key[2]}": len(s) for key, s in self.pool.idle.items() if s}}
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+class BrokerClient(BaseManager):
+    pass
+
+
+BrokerClient.register("broker")
+
+
+class RemoteSession:
+    """Netmiko-like handle whose method calls run on a broker-held session."""
+
+    def __init__(self, broker, lease_id):
+        self._broker = broker
+        self._lease_id = lease_id
+
+    def __getattr__(self, method):
+        if method not in BROKER_METHODS:
+            raise AttributeError(method)
+
+        def remote_call(*args, **kwargs):
+            return self._broker.call(self._lease_id, method, args, kwargs)
+        return remote_call
+
+    def enable(self, *args, **kwargs):
+        # Broker sessions are already in enable mode.
+        return ""
+
+
+def broker_address():
+    address = os.getenv("SESSION_BROKER", "")
+    if not address:
+        return None
+    host, _, port = address.rpartition(":")
+    return (host or BROKER_ADDRESS[0], int(port))
+
+
+class BrokerKeyMissing(Exception):
+    pass
+
+
+def broker_authkey():
+    """SESSION_BROKER_KEY; there is no default, the broker hands out privileged sessions."""
+    key = os.getenv("SESSION_BROKER_KEY", "")
+    if not key:
+        raise BrokerKeyMissing("SESSION_BROKER_KEY must be set to serve or use the session broker")
+    return key.encode()
+
+
+_client = threading.local()
+
+
+def _remote_broker(address):
+    broker = getattr(_client, "broker", None)
+    if broker is None:
+        manager = BrokerClient(address=address, authkey=broker_authkey())
+        manager.connect()
+        broker = _client.broker = manager.broker()
+    return broker
+
+
+@contextmanager
+def connect(device):
+    """
+    Yields an enabled session for device. If SESSION_BROKER is set the session
+    is borrowed from the broker running there and stays warm afterwards;
+    otherwise a fresh connection is opened and closed as before.
+    """
+    address = broker_address()
+    if address is None:
+        net_connect = open_session(device)
+        try:
+            yield net_connect
+        finally:
+            _disconnect(net_connect)
+        return
+
+    broker = _remote_broker(address)
+    lease_id = broker.lease(device)
+    try:
+        yield RemoteSession(broker, lease_id)
+    except Exception:
+        broker.release(lease_id, True)
+        raise
+    broker.release(lease_id)
+
+
+def serve(address=BROKER_ADDRESS, max_sessions=64, idle_timeout=300):
+    authkey = broker_authkey()
+    broker = Broker(SessionPool(max_sessions=max_sessions, idle_timeout=idle_timeout))
+    BrokerManager.register("broker", callable=lambda: broker)
+    manager = BrokerManager(address=address, authkey=authkey)
+    server = manager.get_server()
+    print(f"Session broker listening on {address[0]}:{address[1]} "
+          f"(max {max_sessions} sessions, {idle_timeout}s idle timeout)")
+    try:
+        server.serve_forever()
+    finally:
+        broker.pool.close()
+
+
+if __name__ == "__main__":
+    if not os.getenv("SESSION_BROKER_KEY"):
+        print("SESSION_BROKER_KEY is not set; refusing to start the session broker")
+        raise SystemExit(1)
+    serve(address=broker_address() or BROKER_ADDRESS,
+          max_sessions=int(os.getenv("BROKER_MAX_SESSIONS", "64")),
+          idle_timeout=float(os.getenv("BROKER_IDLE_TIMEOUT", "300")))
@@ -0,0 +1,207 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    host TEXT NOT NULL,
+    command TEXT NOT NULL,
+    output TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (host, command)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outputs_by_access ON outputs (accessed);
+CREATE TABLE IF NOT EXISTS invalidations (
+    host TEXT PRIMARY KEY,
+    at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Seconds a show command's output stays fresh, by longest matching command
+# prefix. 0 means never cached: change markers and neighbor state have to
+# come from the device every time.
+COMMAND_TTLS = {
+    "show running-config": 300,
+    "show running-config | include": 0,
+    "show configuration id": 0,
+    "show startup-config": 3600,
+    "show version": 3600,
+    "show version | include": 0,
+    "show inventory": 86400,
+    "show ip interface brief": 60,
+    "show interfaces": 60,
+    "show ip route": 30,
+    "show route": 30,
+    "show ip ospf neighbor": 0,
+    "show ospf neighbor": 0,
+    "show ip rip database": 0,
+}
+DEFAULT_TTL = 60
+
+
+def normalize(command):
+    return " ".join(command.split())
+
+
+def cache_host(device):
+    """The host part of a cache key: the address, with the port when it is not 22."""
+    host = device.get("host") or device.get("ip")
+    port = int(device.get("port", 22))
+    return host if port == 22 else f"{host}:{port}"
+
+
+def shared_cache():
+    """The ShowCache SHOW_CACHE points to, or None when it is not set (no caching)."""
+    path = os.getenv("SHOW_CACHE", "")
+    return ShowCache(path) if path else None
+
+
+@contextmanager
+def invalidating(cache, device):
+    """Drops everything cached for device when the block ends, however it ends; for pushes."""
+    try:
+        yield
+    finally:
+        if cache is not None:
+            cache.invalidate(cache_host(device))
+
+
+class ShowCache:
+    """
+    Read-through cache of show command output keyed by (host, command), in
+    one SQLite file so every job and process on the box shares it. An entry
+    is fresh for the TTL of its command (COMMAND_TTLS, overridable per
+    instance); reads of stale or missing entries return None and the caller
+    fetches from the device and put()s the result. When the outputs add up
+    to more than max_bytes the least recently read ones are evicted. A push
+    must invalidate() the host it changed; output fetched before that
+    (a read that started before the push and ended after it) is refused.
+    """
+
+    def __init__(self, path="show_cache.sqlite", max_bytes=256 << 20, ttls=None, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {normalize(c): ttl for c, ttl in dict(COMMAND_TTLS, **(ttls or {})).items()}
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def ttl(self, command):
+        command = normalize(command)
+        best = None
+        for prefix in self.ttls:
+            if command.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.ttls[best] if best is not None else self.default_ttl
+
+    def get_many(self, host, commands):
+        """{command: output} for those of commands with a fresh entry for host; marks them as read."""
+        now = time.time()
+        wanted = {normalize(c): c for c in commands if self.ttl(c) > 0}
+        if not wanted:
+            return {}
+        marks = ",".join("?" * len(wanted))
+        with self.lock, self.db:
+            rows = self.db.execute("SELECT command, output, fetched FROM outputs "
+                                   f"WHERE host = ? AND command IN ({marks})", (host, *wanted)).fetchall()
+            fresh = {command: output for command, output, fetched in rows if now - fetched < self.ttl(command)}
+            self.db.executemany("UPDATE outputs SET accessed = ? WHERE host = ? AND command = ?",
+                                [(now, host, command) for command in fresh])
+        return {wanted[command]: output for command, output in fresh.items()}
+
+    def get(self, host, command):
+        return self.get_many(host, [command]).get(command)
+
+    def put(self, host, command, output, fetched=None):
+        """
+        Stores output as fetched from host at fetched (the time the read
+        started; now if not given) unless command is never cached or host
+        was invalidated since, then evicts down to max_bytes. Returns
+        whether the output was stored.
+        """
+        if self.ttl(command) <= 0:
+            return False
+        now = time.time()
+        fetched = fetched or now
+        size = len(output.encode())
+        with self.lock, self.db:
+            row = self.db.execute("SELECT at FROM invalidations WHERE host = ?", (host,)).fetchone()
+            if row is not None and fetched <= row[0]:
+                return False
+            self.db.execute("INSERT OR REPLACE INTO outputs (host, command, output, size, fetched, accessed) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", (host, normalize(command), output, size, fetched, now))
+            self._evict()
+        return True
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM outputs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Newest reads first; everything past the point where the sizes add up to max_bytes goes.
+        self.db.execute("DELETE FROM outputs WHERE (host, command) IN ("
+                        "SELECT host, command FROM (SELECT host, command, "
+                        "SUM(size) OVER (ORDER BY accessed DESC, host, command) AS kept FROM outputs) "
+                        "WHERE kept > ?)", (self.max_bytes,))
+
+    def invalidate(self, host, command=None):
+        """
+        Drops host's entries (only command's with one given); returns how
+        many were dropped. Dropping the whole host also refuses later put()s
+        of output fetched before now.
+        """
+        with self.lock, self.db:
+            if command is None:
+                self.db.execute("INSERT OR REPLACE INTO invalidations (host, at) VALUES (?, ?)", (host, time.time()))
+                cursor = self.db.execute("DELETE FROM outputs WHERE host = ?", (host,))
+            else:
+                cursor = self.db.execute("DELETE FROM outputs WHERE host = ? AND command = ?",
+                                         (host, normalize(command)))
+        return cursor.rowcount
+
+    def purge_expired(self):
+        now = time.time()
+        with self.lock:
+            rows = self.db.execute("SELECT host, command, fetched FROM outputs").fetchall()
+        expired = [(host, command) for host, command, fetched in rows if now - fetched >= self.ttl(command)]
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM outputs WHERE host = ? AND command = ?", expired)
+        return len(expired)
+
+    def stats(self):
+        """(entries, bytes) currently held."""
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs").fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the shared show-output cache.")
+    parser.add_argument("--cache", default="show_cache.sqlite")
+    parser.add_argument("--invalidate", metavar="HOST", action="append", default=[],
+                        help="drop everything cached for HOST (host or host:port), repeatable")
+    parser.add_argument("--command", help="with --invalidate, drop only this command's output")
+    parser.add_argument("--purge", action="store_true", help="drop the entries that are past their TTL")
+    args = parser.parse_args()
+
+    cache = ShowCache(args.cache)
+    for host in args.invalidate:
+        print(f"{host}: dropped {cache.invalidate(host, args.command)} entries")
+    if args.purge:
+        print(f"Purged {cache.purge_expired()} expired entries")
+    entries, size = cache.stats()
+    print(f"{entries} entries, {size / 1024:.1f} KiB in {args.cache}")
+
+
+if __name__ == "__main__":
+    main()
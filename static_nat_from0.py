@@ -1,4 +1,9 @@
-from netmiko import ConnectHandler
+import netops
+from dryrun import print_dry_run
+from journal import Journal
+from latency import LatencyProfile
+from showcache import shared_cache
+from store import BackupStore
 
 # Define the credentials
 username = "manager"
@@ -104,26 +109,45 @@ routers = [
     }
 ]
 
-# Loop through each router and apply the configuration
-for router in routers:
-    print(f"Connecting to {router['hostname']} ({router['ip']})...")
-    device = {
-        "device_type": "cisco_ios",
-        "host": router["ip"],
-        "username": username,
-        "password": password,
-        "secret": enable_secret,
-    }
+# Push order: the inside routers first, then the internet edge.
+# Every wave has to finish before the next one starts.
+waves = [
+    ["R8-PRD", "R1-PRD", "R2-PRD"],
+    ["R7-PRD-inet"],
+]
+
+# Set to True to send only the commands each device does not already have
+delta_only = False
+
+# Set to True to send each device's commands in large chunks and verify them afterwards
+bulk_push = False
+
+# Set to True to only print the config each device would end up with, simulated on its last backup
+dry_run = False
+
+if dry_run:
+    print_dry_run(routers, BackupStore())
+    exit()
 
-    try:
-        with ConnectHandler(**device) as net_connect:
-            net_connect.enable()
-            output = net_connect.send_config_set(router["commands"])
-            print(f"Configuration applied to {router['hostname']} successfully.")
-            print(output)
-            net_connect.save_config()
-            print(f"Configuration saved on {router['hostname']}.")
-    except Exception as e:
-        print(f"Failed to connect or configure {router['hostname']}: {e}")
+# Set to True after an interrupted run to skip the devices it already configured and saved
+resume = False
+
+# Every device's progress is written to this journal as the run goes
+journal = Journal("static_nat_from0_journal.jsonl", resume=resume)
+
+# Show output cached for these devices (in SHOW_CACHE, if set) is dropped as each one is pushed
+cache = shared_cache()
+
+# Timeouts and pacing learned from earlier runs
+profile = LatencyProfile()
+
+# Push each wave's devices in parallel and report them as they finish; devices
+# that do not answer on SSH are reported and left out
+netops.push_configs(routers, waves, username, password, enable_secret, profile,
+                    delta=delta_only, bulk=bulk_push, journal=journal, cache=cache)
 
 print("\nAll routers have been configured.")
+
+# Remember this run's latencies for the next one and print the per-phase
+# timings, also written to timings/
+netops.finish(profile)
@@ -0,0 +1,218 @@
+import difflib
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+
+class BackupStore:
+    """
+    Versioned, content-addressed store for running-configs.
+
+    Every config is kept once under its sha256 in objects/. A new version is
+    stored as a zlib-compressed line delta against the device's previous
+    version (with a full snapshot every snapshot_every versions so chains stay
+    short); an unchanged config costs only one line appended to index.jsonl.
+    The index maps device -> version -> (sha, timestamp) and is all that is
+    read to answer "what changed since" questions. Outputs of other show
+    commands live in a store of their own (show_outputs()), so the index
+    only ever holds configs.
+    """
+
+    def __init__(self, root="backups", snapshot_every=20):
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self.objects = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.jsonl")
+        os.makedirs(self.objects, exist_ok=True)
+        self.lock = threading.Lock()
+        self.index = {}
+        self.depth = {}
+        self._cache = {}
+        self._outputs = None
+        self._offset = 0  # bytes of index.jsonl already in self.index
+        self.refresh()
+
+    def refresh(self):
+        """Loads the index entries other processes (other BackupStores) appended since this one last read it."""
+        with self.lock:
+            try:
+                with open(self.index_path, 'rb') as f:
+                    self._read_entries(f)
+            except FileNotFoundError:
+                pass
+
+    def _read_entries(self, f):
+        f.seek(self._offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # still being written; picked up next time
+            if line.strip():
+                self._add_entry(json.loads(line))
+            self._offset += len(line)
+
+    def show_outputs(self):
+        """The BackupStore under show/ that keeps extra show command outputs as "{hostname}:{command}"."""
+        with self.lock:
+            if self._outputs is None:
+                self._outputs = BackupStore(os.path.join(self.root, "show"), self.snapshot_every)
+            return self._outputs
+
+    def _add_entry(self, entry):
+        self.index.setdefault(entry["device"], []).append(entry)
+
+    def _object_path(self, sha):
+        return os.path.join(self.objects, sha[:2], sha[2:] + ".z")
+
+    def _write_object(self, sha, payload):
+        path = self._object_path(sha)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(zlib.compress(json.dumps(payload).encode(), 9))
+        os.replace(tmp, path)
+
+    def _read_object(self, sha):
+        with open(self._object_path(sha), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def read(self, sha):
+        """Returns the config text stored under sha, replaying its delta chain."""
+        # One lookup: other threads replace the one-entry cache between a check and an index.
+        cached = self._cache.get(sha)
+        if cached is not None:
+            return cached
+        chain = []
+        payload = self._read_object(sha)
+        while "base" in payload:
+            chain.append(payload)
+            payload = self._read_object(payload["base"])
+        lines = payload["text"].splitlines(keepends=True)
+        for delta in reversed(chain):
+            lines = apply_delta(lines, delta["ops"])
+        text = "".join(lines)
+        self._cache = {sha: text}
+        return text
+
+    def save(self, device, text, timestamp=None, marker=None, keep_marker=False):
+        """
+        Records text as the device's current config and returns
+        (version, sha, changed). marker is the device's last-change marker
+        at the time of the fetch, kept for confirm(). With keep_marker and
+        no marker, a config equal to the latest one keeps that entry's
+        marker (for text that did not come with a marker of its own).
+        """
+        timestamp = timestamp or time.time()
+        sha = hashlib.sha256(text.encode()).hexdigest()
+        self.refresh()
+        with self.lock:
+            history = self.index.get(device, [])
+            previous = history[-1] if history else None
+            changed = previous is None or previous["sha"] != sha
+        if keep_marker and marker is None and not changed:
+            marker = previous.get("marker")
+
+        if changed and not os.path.exists(self._object_path(sha)):
+            depth = self._depth(previous["sha"]) + 1 if previous else 0
+            if previous is None or depth >= self.snapshot_every:
+                self._write_object(sha, {"text": text, "depth": 0})
+            else:
+                base_lines = self.read(previous["sha"]).splitlines(keepends=True)
+                ops = make_delta(base_lines, text.splitlines(keepends=True))
+                self._write_object(sha, {"base": previous["sha"], "ops": ops, "depth": depth})
+            self._cache = {sha: text}
+
+        entry = self._append(device, sha, timestamp, changed, marker)
+        return entry["version"], sha, entry["changed"]
+
+    def confirm(self, device, marker, timestamp=None):
+        """
+        Records that device still has its latest config, known from its
+        last-change marker alone. Returns (version, sha) of the new entry.
+        """
+        latest = self.latest(device)
+        entry = self._append(device, latest["sha"], timestamp or time.time(), False, marker)
+        return entry["version"], latest["sha"]
+
+    def _append(self, device, sha, timestamp, changed, marker):
+        with self.lock, open(self.index_path, 'ab+') as f:
+            # Several processes may append to the same store: the version is
+            # numbered from the index as it is on disk under the file lock,
+            # not from what this process happened to load.
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._read_entries(f)
+            history = self.index.get(device, [])
+            entry = {"device": device, "version": len(history) + 1, "sha": sha, "timestamp": timestamp,
+                     "changed": changed and (not history or history[-1]["sha"] != sha)}
+            if marker:
+                entry["marker"] = marker
+            line = (json.dumps(entry) + "\n").encode()
+            f.write(line)
+            f.flush()
+            self._offset += len(line)
+            self._add_entry(entry)
+        return entry
+
+    def _depth(self, sha):
+        if sha not in self.depth:
+            self.depth[sha] = self._read_object(sha).get("depth", 0)
+        return self.depth[sha]
+
+    def versions(self, device):
+        return list(self.index.get(device, []))
+
+    def latest(self, device):
+        history = self.index.get(device)
+        return history[-1] if history else None
+
+    def get(self, device, version=None):
+        history = self.index.get(device)
+        if not history:
+            return None
+        entry = history[-1] if version is None else history[version - 1]
+        return self.read(entry["sha"])
+
+    def changed_since(self, timestamp):
+        """Devices whose config changed after timestamp, from the index alone."""
+        return sorted(device for device, history in self.index.items()
+                      if any(e["changed"] and e["timestamp"] > timestamp for e in history))
+
+    def diff(self, device, old_version, new_version=None):
+        history = self.index[device]
+        new_version = new_version or len(history)
+        old = self.get(device, old_version).splitlines(keepends=True)
+        new = self.get(device, new_version).splitlines(keepends=True)
+        return "".join(difflib.unified_diff(old, new, f"{device} v{old_version}", f"{device} v{new_version}"))
+
+
+def make_delta(base_lines, new_lines):
+    """
+    Encodes new_lines against base_lines as a list of ops: [start, end]
+    copies base_lines[start:end], {"lines": [...]} inserts those lines.
+    """
+    ops = []
+    # autojunk would ignore every line that makes up over 1% of a config of
+    # 200+ lines ("!", " no shutdown", ...); matches then stop at each of
+    # them and a one-line change can store most of the config again.
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append({"lines": new_lines[j1:j2]})
+    return ops
+
+
+def apply_delta(base_lines, ops):
+    lines = []
+    for op in ops:
+        if isinstance(op, dict):
+            lines.extend(op["lines"])
+        else:
+            lines.extend(base_lines[op[0]:op[1]])
+    return lines
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The modules are flat scripts in the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def fake_fleet():
+    """Two emulated IOS devices (fakedevice.start_fleet): (inventory, devices)."""
+    from fakedevice import start_fleet
+    inventory, devices, stop = start_fleet(2, config_lines=60, seed=7)
+    yield inventory, devices
+    stop()
+
+
+@pytest.fixture
+def no_broker(monkeypatch):
+    """Sessions are opened directly, never through a SESSION_BROKER set in the environment."""
+    monkeypatch.delenv("SESSION_BROKER", raising=False)
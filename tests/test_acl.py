@@ -0,0 +1,64 @@
+from acl import IMPLICIT_DENY, compile_acls, flow
+
+IOS = """hostname R1
+ip access-list extended EDGE
+ 10 permit tcp any host 10.0.0.10 eq 443
+ 20 deny tcp any host 10.0.0.10 eq https
+ 30 permit udp 10.1.0.0 0.0.255.255 any eq domain
+ 40 deny ip any any
+ 50 permit tcp any any object-group WEB
+access-list 10 permit 10.0.0.1
+access-list 10 deny 10.0.0.0 0.0.0.255
+access-list 10 permit any
+"""
+
+ASA = """hostname FW
+object network WEB1
+ host 192.0.2.10
+object-group network WEBS
+ network-object object WEB1
+ network-object 192.0.2.128 255.255.255.128
+access-list OUTSIDE extended permit tcp any object-group WEBS eq www
+access-list OUTSIDE extended deny ip any any
+"""
+
+
+def test_extended_first_match():
+    acl = compile_acls(IOS)["EDGE"]
+    flows = [flow("tcp", "1.2.3.4", 40000, "10.0.0.10", 443),
+             flow("udp", "10.1.2.3", 5353, "8.8.8.8", 53),
+             flow("udp", "10.2.2.3", 5353, "8.8.8.8", 53),
+             flow("tcp", "1.2.3.4", 40000, "10.0.0.10", 22)]
+    rules = acl.evaluate(flows)
+    assert [acl.action(rule) for rule in rules] == ["permit", "permit", "deny", "deny"]
+    assert rules[:2] == [0, 2]
+
+
+def test_equivalent_flows_share_one_scan():
+    acl = compile_acls(IOS)["EDGE"]
+    acl.evaluate([flow("tcp", f"1.2.3.{i}", 40000 + i, "10.0.0.10", 443) for i in range(100)])
+    assert len(acl._classes) == 1
+
+
+def test_numbered_standard_list_and_implicit_deny():
+    acl = compile_acls(IOS)["10"]
+    assert [acl.action(r) for r in acl.evaluate([flow("ip", "10.0.0.1", 0, "0.0.0.0", 0),
+                                                 flow("ip", "10.0.0.7", 0, "0.0.0.0", 0),
+                                                 flow("ip", "10.9.0.7", 0, "0.0.0.0", 0)])] \
+        == ["permit", "deny", "permit"]
+    empty = compile_acls("access-list 11 permit 10.0.0.1\n")["11"]
+    assert empty.evaluate([flow("ip", "10.0.0.2", 0, "0.0.0.0", 0)]) == [IMPLICIT_DENY]
+
+
+def test_shadowed_and_skipped_rules():
+    acl = compile_acls(IOS)["EDGE"]
+    assert (1, 0, "shadowed") in acl.shadowed()
+    assert [line for line, _ in acl.skipped] == ["50 permit tcp any any object-group WEB"]
+
+
+def test_asa_objects_and_netmasks():
+    acl = compile_acls(ASA)["OUTSIDE"]
+    assert [acl.action(r) for r in acl.evaluate([flow("tcp", "1.1.1.1", 1234, "192.0.2.10", 80),
+                                                 flow("tcp", "1.1.1.1", 1234, "192.0.2.200", 80),
+                                                 flow("tcp", "1.1.1.1", 1234, "192.0.2.20", 80)])] \
+        == ["permit", "permit", "deny"]
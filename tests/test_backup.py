@@ -0,0 +1,55 @@
+import time
+
+from backup import backup_device
+from configindex import ConfigIndex
+from journal import SAVED, Journal
+from showcache import ShowCache
+from store import BackupStore
+
+
+def test_running_config_and_show_outputs_are_stored_apart(fake_fleet, no_broker, tmp_path):
+    inventory, devices = fake_fleet
+    store = BackupStore(str(tmp_path / "backups"))
+    index = ConfigIndex(str(tmp_path / "index.sqlite"))
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    result = backup_device(inventory[0], deadline=30, store=store, show_commands=["show version"],
+                           index=index, journal=journal)
+    hostname = devices[0].hostname
+    assert "as v1 (new version" in result
+    assert store.get(hostname) == devices[0].running_config + "\n"
+    assert store.show_outputs().get(f"{hostname}:show version").startswith("Cisco IOS Software")
+    assert store.get(f"{hostname}:show version") is None
+    assert journal.state(hostname) == SAVED
+    assert not list((tmp_path / "backups").glob(".*.capture*"))
+
+
+def test_conditional_backup_skips_an_unchanged_config(fake_fleet, no_broker, tmp_path):
+    inventory, devices = fake_fleet
+    store = BackupStore(str(tmp_path / "backups"))
+    assert "v1 (new version" in backup_device(inventory[1], deadline=30, store=store, conditional=True)
+    assert store.latest(devices[1].hostname)["marker"].startswith("! Last configuration change")
+    assert "(marker unchanged" in backup_device(inventory[1], deadline=30, store=store, conditional=True)
+
+
+def test_conditional_backup_falls_back_past_an_unknown_command(fake_fleet, no_broker, tmp_path):
+    # The fake answers 'show configuration id' the way classic IOS does: a caret line, then the error.
+    inventory, devices = fake_fleet
+    assert "% Invalid input" in devices[1].show("show configuration id")
+    store = BackupStore(str(tmp_path / "backups"))
+    backup_device(inventory[1], deadline=30, store=store, conditional=True)
+    time.sleep(1)  # the last-change stamp has one-second resolution
+    devices[1].apply("ip route 10.99.0.0 255.255.0.0 10.1.8.2", "config")
+    result = backup_device(inventory[1], deadline=30, store=store, conditional=True)
+    assert "v2 (new version" in result
+    assert "ip route 10.99.0.0 255.255.0.0 10.1.8.2" in store.get(devices[1].hostname)
+
+
+def test_fresh_show_cache_keeps_the_device_from_being_contacted(fake_fleet, no_broker, tmp_path):
+    inventory, devices = fake_fleet
+    store = BackupStore(str(tmp_path / "backups"))
+    cache = ShowCache(str(tmp_path / "cache.sqlite"))
+    backup_device(inventory[0], deadline=30, store=store, cache=cache)
+    device = dict(inventory[0], port=1)  # nothing listens there
+    cache.put("127.0.0.1:1", "show running-config", devices[0].running_config)
+    result = backup_device(device, deadline=30, store=store, cache=cache)
+    assert "from show cache" in result and "unchanged" in result
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from capture import send_batch
+
+
+class Channel:
+    """Stands in for a Netmiko session: replays reads in the given chunks."""
+
+    def __init__(self, chunks, prompt="R1#"):
+        self.chunks = list(chunks)
+        self.prompt = prompt
+        self.written = ""
+
+    def find_prompt(self):
+        return self.prompt
+
+    def write_channel(self, data):
+        self.written += data
+
+    def read_channel(self):
+        return self.chunks.pop(0) if self.chunks else ""
+
+
+# The prompt of the second command arrives split across two reads.
+CHUNKS = ["\r\nR1#", "show version\r\nIOS 15.4\r\nuptime 3 weeks\r\nR", "1#show clock\r\n12:00:00\r\nR1",
+          "#show users\r\n\r\nR1#"]
+
+
+def test_batch_is_split_at_each_prompt():
+    channel = Channel(CHUNKS)
+    results = send_batch(channel, ["show version", "show clock", "show users"], poll=0)
+    assert channel.written == "show version\nshow clock\nshow users\n"
+    assert results == ["IOS 15.4\nuptime 3 weeks", "12:00:00", ""]
+
+
+def test_results_are_handed_over_as_they_arrive():
+    seen = []
+    assert send_batch(Channel(CHUNKS), ["show version", "show clock", "show users"],
+                      on_result=lambda i, command, text: seen.append((i, command))) == []
+    assert seen == [(0, "show version"), (1, "show clock"), (2, "show users")]
+
+
+def test_first_output_is_streamed_to_the_sink():
+    sink = io.StringIO()
+    results = send_batch(Channel(CHUNKS), ["show version", "show clock", "show users"], poll=0, sink=sink)
+    assert sink.getvalue() == "IOS 15.4\nuptime 3 weeks\n"
+    assert results == [len(sink.getvalue()), "12:00:00", ""]
+
+
+def test_unfinished_batch_times_out():
+    with pytest.raises(TimeoutError):
+        send_batch(Channel(CHUNKS[:2]), ["show version", "show clock"], read_timeout=0.05, poll=0.01)
@@ -0,0 +1,109 @@
+from confparse import (ParsedConfig, apply_command, load_config, missing_commands, parse_config,
+                       render_config, shown_form)
+
+RUNNING = """Building configuration...
+!
+hostname R1
+!
+interface Ethernet0/1
+ description uplink
+ ip address 10.1.8.1 255.255.255.252
+ ip nat inside
+!
+interface Ethernet0/2
+ ip address 10.10.10.1 255.255.255.0
+ ip nat inside
+ duplex half
+!
+ip access-list standard MGMT
+ permit 10.0.0.1
+!
+access-list 10 permit 10.0.0.2
+router ospf 1
+ network 10.1.8.0 0.0.0.3 area 0
+end
+"""
+
+
+def test_parse_config_builds_the_tree():
+    root = parse_config(RUNNING)
+    assert [c.text for c in root.children][:3] == ["hostname R1", "interface Ethernet0/1", "interface Ethernet0/2"]
+    assert root.child("interface Ethernet0/1").child("ip nat inside") is not None
+
+
+def test_parsed_config_indexes_sections_and_lines():
+    parsed = ParsedConfig(RUNNING)
+    assert set(parsed.sections_of("interface")) == {"Ethernet0/1", "Ethernet0/2"}
+    assert parsed.section("router ospf", "1").children[0].text == "network 10.1.8.0 0.0.0.3 area 0"
+    assert parsed.with_line("interface", "ip nat inside") == ["Ethernet0/1", "Ethernet0/2"]
+    assert render_config(parsed.root) == render_config(parse_config(RUNNING))
+
+
+def test_load_config_is_shared_by_content():
+    assert load_config(RUNNING) is load_config(str(RUNNING))
+
+
+def test_mode_navigation_lines_are_not_configuration():
+    commands = ["interface Ethernet0/1", "ip address 10.1.8.1 255.255.255.252", "exit", "! OSPF",
+                "router ospf 1", "network 10.1.8.0 0.0.0.3 area 0", "end"]
+    assert missing_commands(RUNNING, commands) == []
+    # After 'exit' a line is global again, not part of the interface.
+    assert missing_commands(RUNNING, ["interface Ethernet0/1", "exit", "ip nat inside"]) == ["ip nat inside"]
+
+
+def test_shown_form_drops_host_in_standard_acls_only():
+    assert shown_form("permit host 10.0.0.1", "ip access-list standard MGMT") == "permit 10.0.0.1"
+    assert shown_form("access-list 10 deny host 10.0.0.9") == "access-list 10 deny 10.0.0.9"
+    assert shown_form("permit ip host 10.0.0.1 any", "ip access-list extended X") == "permit ip host 10.0.0.1 any"
+    assert shown_form("access-list 110 permit ip host 1.1.1.1 any") == "access-list 110 permit ip host 1.1.1.1 any"
+
+
+def test_asa_routes_are_shown_with_their_distance():
+    command = "route inside 10.0.0.0 255.0.0.0 10.254.254.253"
+    assert shown_form(command) == command + " 1"
+    assert shown_form(command + " 5") == command + " 5"
+    assert missing_commands("route inside 10.0.0.0 255.0.0.0 10.254.254.253 1\n", [command]) == []
+
+
+def test_apply_command_replaces_keyed_lines_and_skips_comments():
+    root = parse_config(RUNNING)
+    context = apply_command(root, root, "interface Ethernet0/1")
+    apply_command(root, context, "description core link")
+    assert apply_command(root, context, "! a comment") is context
+    lines = [c.text for c in root.child("interface Ethernet0/1").children]
+    assert lines.count("description core link") == 1 and "description uplink" not in lines
+
+
+def test_new_primary_address_keeps_the_secondaries():
+    root = parse_config(RUNNING)
+    context = apply_command(root, root, "interface Ethernet0/2")
+    apply_command(root, context, "ip address 10.20.0.1 255.255.255.0 secondary")
+    apply_command(root, context, "ip address 10.10.30.1 255.255.255.0")
+    lines = [c.text for c in root.child("interface Ethernet0/2").children]
+    assert [line for line in lines if line.startswith("ip address")] == \
+        ["ip address 10.10.30.1 255.255.255.0", "ip address 10.20.0.1 255.255.255.0 secondary"]
+
+
+def test_apply_command_negation_removes_the_line():
+    root = parse_config(RUNNING)
+    context = apply_command(root, root, "interface Ethernet0/1")
+    apply_command(root, context, "no ip nat inside")
+    assert root.child("interface Ethernet0/1").child("ip nat inside") is None
+
+
+def test_missing_commands_allows_for_how_ios_shows_them():
+    commands = [
+        "ip access-list standard MGMT", "permit host 10.0.0.1",
+        "access-list 10 permit host 10.0.0.2",
+        "interface Ethernet0/1", "duplex auto", "ip nat inside",
+        "interface Ethernet0/2", "duplex auto",
+    ]
+    # duplex auto is a default IOS leaves out, but Ethernet0/2 has duplex half.
+    assert missing_commands(RUNNING, commands) == ["interface Ethernet0/2", "duplex auto"]
+
+
+def test_missing_commands_negations_and_new_sections():
+    commands = ["no ip route 0.0.0.0 0.0.0.0 10.1.8.2", "router rip", "version 2",
+                "interface Ethernet0/1", "no ip nat inside"]
+    assert missing_commands(RUNNING, commands) == ["router rip", "version 2",
+                                                   "interface Ethernet0/1", "no ip nat inside"]
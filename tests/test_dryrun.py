@@ -0,0 +1,39 @@
+from dryrun import NoBackup, backup_name, predict, simulate_fleet
+from store import BackupStore
+
+RUNNING = """hostname R8
+interface Ethernet0/1
+ ip address 10.1.8.1 255.255.255.252
+ shutdown
+ip route 0.0.0.0 0.0.0.0 10.1.8.2
+"""
+
+
+def test_predicted_config_and_diff():
+    predicted, diff = predict(RUNNING, ["interface Ethernet0/1", " no shutdown",
+                                        "no ip route 0.0.0.0 0.0.0.0 10.1.8.2", "router ospf 1",
+                                        " network 10.1.8.0 0.0.0.3 area 0"], "R8")
+    assert predicted.endswith("\n")
+    assert " shutdown" not in predicted and "ip route" not in predicted
+    assert "router ospf 1\n network 10.1.8.0 0.0.0.3 area 0" in predicted
+    assert "--- R8 (backup)" in diff
+    assert "- shutdown\n" in diff and "+router ospf 1\n" in diff
+
+
+def test_unchanged_config_has_an_empty_diff():
+    predicted, diff = predict(RUNNING, ["interface Ethernet0/1", " shutdown"])
+    assert diff == ""
+
+
+def test_backups_are_found_under_the_inventory_hostname(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = BackupStore(str(tmp_path / "backups"))
+    store.save("R8_PRD", RUNNING)
+    devices = [{"ip": "10.1.8.1", "hostname": "R8-PRD", "commands": ["hostname R8-PRD"]},
+               {"ip": "10.1.9.1", "hostname": "R9", "commands": []}]
+    hostnames = {"10.1.8.1": "R8_PRD"}
+    assert backup_name(devices[0], hostnames) == "R8_PRD"
+    assert backup_name(devices[1], hostnames) == "R9"
+    results = list(simulate_fleet(devices, store, hostnames))
+    assert results[0][1].startswith("hostname R8-PRD") and results[0][3] is None
+    assert isinstance(results[1][3], NoBackup)
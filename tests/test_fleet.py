@@ -0,0 +1,63 @@
+import threading
+import time
+
+from fleet import DeviceDeadlineExceeded, remaining, run_fleet
+
+
+def test_run_fleet_yields_every_result_and_error():
+    def job(device, deadline):
+        if device["name"] == "bad":
+            raise ValueError("boom")
+        return device["name"].upper()
+
+    results = {d["name"]: (r, e) for d, r, e in run_fleet([{"name": "a"}, {"name": "bad"}, {"name": "c"}], job)}
+    assert results["a"] == ("A", None)
+    assert results["c"] == ("C", None)
+    assert isinstance(results["bad"][1], ValueError)
+
+
+def test_job_gets_an_absolute_deadline():
+    seen = []
+
+    def job(device, deadline):
+        seen.append(deadline - time.monotonic())
+
+    list(run_fleet([{}], job, deadline=30))
+    assert 29 < seen[0] <= 30
+
+
+def test_device_past_its_deadline_is_reported_without_waiting():
+    release = threading.Event()
+
+    def job(device, deadline):
+        if device["slow"]:
+            release.wait(5)
+        return "ok"
+
+    started = time.monotonic()
+    results = [(d["slow"], r, e) for d, r, e in run_fleet([{"slow": True}, {"slow": False}], job,
+                                                          workers=2, deadline=0.3)]
+    elapsed = time.monotonic() - started
+    release.set()
+    assert (False, "ok", None) in results
+    slow = [e for s, _, e in results if s]
+    assert isinstance(slow[0], DeviceDeadlineExceeded)
+    assert elapsed < 2
+
+
+def test_wait_abandoned_waits_for_overdue_threads():
+    finished = []
+
+    def job(device, deadline):
+        time.sleep(0.6)
+        finished.append(device)
+
+    results = list(run_fleet([{}], job, deadline=0.1, wait_abandoned=True))
+    assert isinstance(results[0][2], DeviceDeadlineExceeded)
+    assert finished  # the generator only ended once the overdue job had
+
+
+def test_remaining_is_clamped():
+    assert remaining(None, cap=10) == 10
+    assert remaining(time.monotonic() + 100, cap=10) == 10
+    assert remaining(time.monotonic() - 5, cap=10) == 1
@@ -0,0 +1,38 @@
+from ipam import DUPLICATE, LINK, MASK_MISMATCH, OVERLAP, find_conflicts, fleet_interfaces
+
+
+def interfaces(configs):
+    return fleet_interfaces({name: "\n".join(lines) + "\n" for name, lines in configs.items()})
+
+
+def kinds(configs):
+    return sorted(kind for kind, _ in find_conflicts(interfaces(configs)))
+
+
+def test_clean_link_has_no_conflicts():
+    assert kinds({"R1": ["interface E0", " ip address 10.1.8.1 255.255.255.252"],
+                  "R8": ["interface E0", " ip address 10.1.8.2 255.255.255.252"]}) == []
+
+
+def test_duplicate_address():
+    assert DUPLICATE in kinds({"R1": ["interface E0", " ip address 10.0.0.1 255.255.255.0"],
+                               "R2": ["interface E0", " ip address 10.0.0.1 255.255.255.0"]})
+
+
+def test_mask_mismatch_and_overlap():
+    assert kinds({"R1": ["interface E0", " ip address 10.0.0.1 255.255.255.0"],
+                  "R2": ["interface E0", " ip address 10.0.0.2 255.255.0.0"]}) == [MASK_MISMATCH]
+    assert kinds({"R1": ["interface E0", " ip address 10.0.0.1 255.255.255.0",
+                         "interface E1", " ip address 10.0.0.129 255.255.255.128"]}) == [OVERLAP]
+
+
+def test_point_to_point_link_needs_two_hosts_on_two_devices():
+    found = kinds({"R1": ["interface E0", " ip address 10.1.8.1 255.255.255.252"]})
+    assert found == [LINK]
+
+
+def test_dhcp_and_secondary_addresses():
+    found = interfaces({"R1": ["interface E0", " ip address dhcp",
+                               "interface E1", " ip address 10.0.0.1 255.255.255.0",
+                               " ip address 10.0.1.1 255.255.255.0 secondary"]})
+    assert sorted(str(i) for i in found) == ["R1 E1 10.0.0.1/24", "R1 E1 10.0.1.1/24"]
@@ -0,0 +1,49 @@
+import time
+
+from jobqueue import DONE, FAILED, LEASED, QUEUED, JobQueue
+
+
+def devices(count):
+    return [{"hostname": f"R{i}", "host": f"10.0.0.{i}", "password": "pw", "secret": "en"} for i in range(count)]
+
+
+def test_shards_are_claimed_once_and_completed(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    run = queue.enqueue("backup", devices(5), {"store": "backups"}, shard_size=2, run="r1")
+    assert queue.status(run) == {QUEUED: 3}
+
+    shard, kind, shard_devices, options = queue.claim("w1")
+    assert (kind, options) == ("backup", {"store": "backups"})
+    assert [d["hostname"] for d in shard_devices] == ["R0", "R1"]
+    assert not any("password" in d or "secret" in d for d in shard_devices)
+    assert queue.claim("w2")[0] != shard
+
+    assert queue.heartbeat(shard, "w1")
+    assert queue.complete(shard, "w1", [["R0", None, "saved"], ["R1", "timeout", ""]])
+    assert queue.results(run) == [("R0", None, "saved"), ("R1", "timeout", "")]
+    assert queue.status(run) == {DONE: 1, LEASED: 1, QUEUED: 1}
+    assert queue.pending(run) == 2
+
+
+def test_expired_lease_goes_to_the_next_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    queue.enqueue("backup", devices(1))
+    shard = queue.claim("w1", lease=0.05)[0]
+    assert queue.claim("w2") is None
+    time.sleep(0.1)
+    assert queue.claim("w2")[0] == shard
+    # The first worker finds out it lost the shard and its results are refused.
+    assert not queue.heartbeat(shard, "w1")
+    assert not queue.complete(shard, "w1", [])
+    assert queue.complete(shard, "w2", [])
+
+
+def test_shard_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"), max_attempts=2)
+    run = queue.enqueue("push", devices(1))
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker, lease=0.01) is not None
+        time.sleep(0.05)
+    assert queue.claim("w3") is None
+    assert queue.status(run) == {FAILED: 1}
+    assert queue.pending(run) == 0
@@ -0,0 +1,38 @@
+from journal import FAILED, PENDING, SAVED, Journal
+
+
+def devices(*names):
+    return [{"hostname": name, "host": f"10.0.0.{i}"} for i, name in enumerate(names, start=1)]
+
+
+def test_resume_skips_saved_devices(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = Journal(path)
+    assert len(journal.remaining(devices("R1", "R2", "R3"))) == 3
+    journal.record("R1", SAVED)
+    journal.record("R2", FAILED, "timeout")
+    journal.close()
+
+    resumed = Journal(path, resume=True)
+    assert [d["hostname"] for d in resumed.remaining(devices("R1", "R2", "R3"))] == ["R2", "R3"]
+    assert resumed.state("R2") == PENDING
+
+
+def test_a_fresh_run_forgets_the_previous_one(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = Journal(path)
+    journal.record("R1", SAVED)
+    journal.close()
+    Journal(path).close()
+    assert Journal(path, resume=True).state("R1") is None
+
+
+def test_line_cut_short_by_a_crash_is_ignored(tmp_path):
+    path = tmp_path / "run.jsonl"
+    journal = Journal(str(path))
+    journal.record("R1", SAVED)
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"device": "R2", "sta')
+    resumed = Journal(str(path), resume=True)
+    assert resumed.done("R1") and resumed.state("R2") is None
@@ -0,0 +1,32 @@
+from latency import LatencyProfile
+
+
+def record(phase, seconds, status="ok"):
+    return {"device": "10.0.0.1", "device_type": "cisco_ios", "phase": phase, "seconds": seconds, "status": status}
+
+
+def test_failed_phases_lengthen_the_read_timeout(tmp_path):
+    profile = LatencyProfile(str(tmp_path / "p.json"))
+    assert profile.read_timeout("10.0.0.1", "cisco_ios") == 20
+    profile.update_from([record("send_command", 4)])
+    assert profile.read_timeout("10.0.0.1", "cisco_ios") == 12
+    profile.update_from([record("send_command", 12, "error")])
+    assert profile.read_timeout("10.0.0.1", "cisco_ios") == 36
+
+
+def test_hosts_without_history_borrow_their_device_type(tmp_path):
+    path = str(tmp_path / "p.json")
+    profile = LatencyProfile(path)
+    profile.update_from([record("send_command", 10)])
+    profile.save()
+    assert LatencyProfile(path).read_timeout("10.0.0.2", "cisco_ios") == 30
+    assert LatencyProfile(path).read_timeout("10.0.0.2", "cisco_asa") == 20
+
+
+def test_only_slow_connects_get_a_delay_factor(tmp_path):
+    profile = LatencyProfile(str(tmp_path / "p.json"))
+    assert profile.delay_settings("10.0.0.1", "cisco_ios") == {}
+    profile.update_from([record("connect", 0.4)])
+    assert profile.delay_settings("10.0.0.1", "cisco_ios") == {}
+    profile.update_from([record("connect", 5)] * 5)
+    assert profile.delay_settings("10.0.0.1", "cisco_ios") == {"fast_cli": False, "global_delay_factor": 2.0}
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from showcache import ShowCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INVENTORY = """devices:
+  - device_type: cisco_ios
+    host: 10.230.230.18
+    username: manager
+    hostname: R8_PRD
+"""
+
+
+def run(cwd, code):
+    env = dict(os.environ, MANAGER_PASSWORD="pw", ENABLE_SECRET="en", PYTHONPATH=ROOT)
+    env.pop("SESSION_BROKER", None)
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True,
+                          timeout=60)
+
+
+def test_help_and_dry_run_paths_do_not_load_netmiko(tmp_path):
+    result = run(tmp_path, "import sys, netops\n"
+                           "try:\n    netops.main(['--help'])\nexcept SystemExit:\n    pass\n"
+                           "print('netmiko' in sys.modules)")
+    assert result.stdout.strip().endswith("False")
+
+
+def test_backup_served_from_the_show_cache_does_not_load_netmiko(tmp_path):
+    (tmp_path / "devices.yaml").write_text(INVENTORY)
+    cache = ShowCache(str(tmp_path / "cache.sqlite"))
+    cache.put("10.230.230.18", "show running-config", "hostname R8_PRD\nend")
+    cache.close()
+    result = run(tmp_path, "import sys, netops\n"
+                           "code = netops.main(['backup', '--probe', 'off', '--cache', 'cache.sqlite'])\n"
+                           "print(code, 'netmiko' in sys.modules)")
+    assert "from show cache" in result.stdout, result.stdout + result.stderr
+    assert result.stdout.strip().endswith("0 False")
@@ -0,0 +1,42 @@
+import socket
+
+import pytest
+
+from probe import probe_inventory, report, split_reachable
+from push import push_waves
+
+
+@pytest.fixture
+def ports():
+    """(listening port, closed port) on 127.0.0.1."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(8)
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    dead = closed.getsockname()[1]
+    closed.close()
+    yield listener.getsockname()[1], dead
+    listener.close()
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_devices_sharing_an_address_are_probed_by_port(ports, order, capsys):
+    devices = [{"host": "127.0.0.1", "port": ports[i], "hostname": f"R{i}"} for i in order]
+    results = probe_inventory(devices, timeout=1)
+    assert results[("127.0.0.1", ports[0])][0] == "up"
+    assert results[("127.0.0.1", ports[1])][0] == "refused"
+    alive, skipped = split_reachable(devices, results)
+    assert [d["hostname"] for d in alive] == ["R0"]
+    assert [d["hostname"] for d in skipped] == ["R1"]
+    report(skipped, results)
+    assert f"Skipping 127.0.0.1:{ports[1]} (R1): SSH port refused" in capsys.readouterr().out
+
+
+def test_push_waves_fails_only_the_device_whose_port_is_down(ports):
+    devices = [{"ip": "127.0.0.1", "port": port, "hostname": f"R{i}", "commands": []}
+               for i, port in enumerate(ports)]
+    results = list(push_waves(devices, [], "manager", "pw", "en", job=lambda device, deadline: "ok",
+                              reachability=probe_inventory(devices, timeout=1)))
+    outcome = {d["hostname"]: type(error).__name__ if error else output for _, d, output, error in results}
+    assert outcome == {"R0": "ok", "R1": "HostUnreachable"}
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from push import bulk_send, push_device, push_waves, split_waves
+from sessions import connect
+
+
+def entry(hostname, device_type="cisco_ios"):
+    return {"ip": f"10.0.0.{hostname[-1]}", "hostname": hostname, "device_type": device_type, "commands": []}
+
+
+def test_devices_go_into_the_first_wave_naming_them():
+    devices = [entry("R1"), entry("R2"), entry("FW1", "cisco_asa"), entry("R3")]
+    waves = split_waves(devices, [["cisco_asa"], ["R2", "FW1"]])
+    assert [[d["hostname"] for d in wave] for wave in waves] == [["FW1"], ["R2"], ["R1", "R3"]]
+
+
+def test_waves_run_in_order_and_record_push_times():
+    order, pushed_at = [], {}
+    lock = threading.Lock()
+
+    def job(device_config, deadline):
+        assert device_config["password"] == "pw"
+        time.sleep(0.01)
+        with lock:
+            order.append(device_config["hostname"])
+        if device_config["hostname"] == "R3":
+            raise RuntimeError("rejected")
+        return "ok"
+
+    results = list(push_waves([entry("R1"), entry("R2"), entry("R3")], [["R2"]], "manager", "pw", "en",
+                              job=job, pushed_at=pushed_at))
+    assert order[0] == "R2"
+    assert [(wave, d["hostname"]) for wave, d, _, _ in results][0] == (1, "R2")
+    assert sorted(pushed_at) == ["R1", "R2"]
+    assert pushed_at["R2"] < pushed_at["R1"]
+    assert [str(error) for _, d, _, error in results if d["hostname"] == "R3"] == ["rejected"]
+
+
+def test_stop_on_failure_skips_later_waves():
+    def job(device_config, deadline):
+        raise RuntimeError("down")
+
+    results = list(push_waves([entry("R1"), entry("R2")], [["R1"]], "manager", "pw", "en",
+                              job=job, stop_on_failure=True))
+    assert [d["hostname"] for _, d, _, _ in results] == ["R1"]
+
+
+def test_bulk_send_reports_rejected_lines(fake_fleet, no_broker):
+    inventory, devices = fake_fleet
+    device = dict(inventory[1])
+    device.pop("hostname")
+    commands = ["interface Loopback77", " description bulk", " no shutdown", "invalid command here",
+                "ip route 10.77.0.0 255.255.0.0 10.1.8.2"]
+    with connect(device) as net_connect:
+        output, rejected = bulk_send(net_connect, commands, chunk_size=2)
+    assert [command for command, _ in rejected] == ["invalid command here"]
+    assert "ip route 10.77.0.0 255.255.0.0 10.1.8.2" in devices[1].running_config
+    assert " description bulk" in devices[1].running_config
+
+
+def test_bulk_push_renaming_the_device_is_verified_and_saved(fake_fleet, no_broker):
+    inventory, devices = fake_fleet
+    device = inventory[0]
+    config = {"ip": device["host"], "port": device["port"], "hostname": device["hostname"],
+              "username": device["username"], "password": device["password"], "secret": device["secret"],
+              "commands": ["hostname FIREWALL-PRD", "route inside 10.0.0.0 255.0.0.0 10.254.254.253"]}
+    saves = devices[0].saves
+    output = push_device(config, deadline=30, bulk=True)
+    assert output.rstrip().endswith("FIREWALL-PRD#")
+    assert devices[0].hostname == "FIREWALL-PRD"
+    # The device shows the route with its distance; verification allows for that.
+    assert "route inside 10.0.0.0 255.0.0.0 10.254.254.253 1" in devices[0].running_config
+    assert devices[0].saves == saves + 1
@@ -0,0 +1,73 @@
+from routing import BLACKHOLE, DELIVERED, EXIT, LOOP, UNKNOWN, PrefixTrie, build_network
+
+R1 = """hostname R1
+interface Ethernet0/1
+ ip address 10.1.8.2 255.255.255.252
+interface Ethernet0/2
+ ip address 10.1.12.1 255.255.255.252
+ip route 10.10.10.0 255.255.255.0 10.1.8.1
+ip route 0.0.0.0 0.0.0.0 10.1.12.2
+"""
+
+R8 = """hostname R8
+interface Ethernet0/1
+ ip address 10.1.8.1 255.255.255.252
+interface Ethernet0/2
+ ip address 10.10.10.1 255.255.255.0
+ip route 0.0.0.0 0.0.0.0 10.1.8.2
+"""
+
+R2 = """hostname R2
+interface Ethernet0/1
+ ip address 10.1.12.2 255.255.255.252
+interface Ethernet0/2
+ ip address 203.0.113.1 255.255.255.0
+ip route 10.10.10.0 255.255.255.0 10.1.12.1
+ip route 0.0.0.0 0.0.0.0 203.0.113.254
+"""
+
+
+def test_trie_longest_prefix_match():
+    trie = PrefixTrie()
+    trie.insert(0, 0, "default")
+    trie.insert(0x0A000000, 8, "ten")
+    trie.insert(0x0A0A0A00, 24, "lan")
+    assert trie.lookup(0x0A0A0A05) == "lan"
+    assert trie.lookup(0x0A0B0000) == "ten"
+    assert trie.lookup(0x08080808) == "default"
+    assert trie.get(0x0A000000, 8) == "ten"
+
+
+def test_trace_outcomes():
+    network = build_network({"R1": R1, "R8": R8, "R2": R2})
+    assert network.trace("R2", "10.10.10.5")[0] == DELIVERED
+    assert [name for name, _ in network.trace("R2", "10.10.10.5")[1]] == ["R2", "R1", "R8"]
+    assert network.trace("R8", "8.8.8.8")[0] == EXIT
+    assert network.problems() == []
+
+
+def test_loop_and_blackhole_are_reported():
+    r8 = R8 + "ip route 10.1.12.0 255.255.255.252 10.1.8.2\n"
+    r1 = R1.replace("ip route 0.0.0.0 0.0.0.0 10.1.12.2\n", "ip route 172.16.0.0 255.255.0.0 10.1.8.1\n")
+    network = build_network({"R1": r1, "R8": R8.replace("0.0.0.0 0.0.0.0", "172.16.0.0 255.255.0.0")})
+    assert network.trace("R1", "172.16.1.1")[0] == LOOP
+    network = build_network({"R1": r1, "R8": r8.replace("ip route 0.0.0.0 0.0.0.0 10.1.8.2\n", "")})
+    assert network.trace("R8", "203.0.113.9")[0] == BLACKHOLE
+
+
+def test_batch_evaluation_matches_trace():
+    network = build_network({"R1": R1, "R8": R8, "R2": R2})
+    pairs = [("R2", f"10.10.10.{i}") for i in range(1, 50)] + [("R8", "8.8.8.8")]
+    results = network.evaluate(pairs)
+    assert [outcome for outcome, _ in results] == [network.trace(s, d)[0] for s, d in pairs]
+
+
+def test_destinations_ospf_could_route_are_unknown_not_blackholes():
+    r1 = R1.split("ip route")[0] + "router ospf 1\n network 10.1.8.0 0.0.0.3 area 0\n"
+    r8 = R8.split("ip route")[0] + "router ospf 1\n network 10.1.8.0 0.0.0.3 area 0\n network 10.10.10.0 0.0.0.255 area 0\n"
+    network = build_network({"R1": r1, "R8": r8, "R2": R2.split("ip route")[0]})
+    assert network.trace("R1", "10.10.10.5")[0] == UNKNOWN
+    # R2 does not run OSPF, R8 does not advertise 10.1.12.0/30 into it.
+    assert network.trace("R2", "10.10.10.5")[0] == BLACKHOLE
+    assert network.trace("R8", "10.1.12.2")[0] == BLACKHOLE
+    assert all(outcome == BLACKHOLE for _, outcome, *_ in network.problems())
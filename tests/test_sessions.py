@@ -0,0 +1,81 @@
+import pytest
+
+import sessions
+from sessions import Broker, BrokerKeyMissing, RemoteSession, SessionPool, broker_authkey, session_key
+
+
+def device(password="pw", secret="en"):
+    return {"device_type": "cisco_ios", "host": "10.0.0.1", "username": "manager",
+            "password": password, "secret": secret}
+
+
+def test_sessions_are_keyed_by_credentials():
+    assert session_key(device()) == session_key(device())
+    assert session_key(device()) != session_key(device(password="other"))
+    assert session_key(device()) != session_key(device(secret="other"))
+    assert "pw" not in repr(session_key(device()))
+
+
+class Session:
+    def __init__(self):
+        self.closed = False
+
+    def is_alive(self):
+        return not self.closed
+
+    def send_command(self, command):
+        return f"output of {command}"
+
+    def disconnect(self):
+        self.closed = True
+
+
+def test_pool_reuses_idle_sessions_for_the_same_credentials():
+    opened = []
+
+    def opener(d):
+        opened.append(Session())
+        return opened[-1]
+
+    pool = SessionPool(max_sessions=4, opener=opener)
+    with pool.session(device()):
+        pass
+    with pool.session(device()):
+        pass
+    assert len(opened) == 1
+    with pool.session(device(password="other")):
+        pass
+    assert len(opened) == 2
+    pool.close()
+    assert all(s.closed for s in opened)
+
+
+def test_broker_only_runs_allowed_methods():
+    broker = Broker(SessionPool(opener=lambda d: Session()))
+    lease = broker.lease(device())
+    assert broker.call(lease, "send_command", ("show clock",)) == "output of show clock"
+    with pytest.raises(AttributeError):
+        broker.call(lease, "disconnect")
+    remote = RemoteSession(broker, lease)
+    assert remote.send_command("show version") == "output of show version"
+    with pytest.raises(AttributeError):
+        remote.disconnect
+    broker.release(lease)
+    broker.pool.close()
+
+
+def test_broker_needs_a_key(monkeypatch):
+    monkeypatch.delenv("SESSION_BROKER_KEY", raising=False)
+    with pytest.raises(BrokerKeyMissing):
+        broker_authkey()
+    monkeypatch.setenv("SESSION_BROKER_KEY", "k")
+    assert broker_authkey() == b"k"
+
+
+def test_connect_without_broker_opens_and_closes_a_session(fake_fleet, no_broker):
+    inventory, _ = fake_fleet
+    device = dict(inventory[0])
+    device.pop("hostname")
+    with sessions.connect(device) as net_connect:
+        assert net_connect.find_prompt().endswith("#")
+    assert net_connect.remote_conn is None
@@ -0,0 +1,72 @@
+import showcache
+from showcache import ShowCache, cache_host
+
+
+def make_cache(tmp_path, **kwargs):
+    return ShowCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_entries_expire_after_their_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(showcache.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path)
+    assert cache.put("10.0.0.1", "show  ip route", "routes")
+    assert cache.put("10.0.0.1", "show version", "IOS")
+    now[0] += 29
+    assert cache.get_many("10.0.0.1", ["show ip route", "show version"]) == \
+        {"show ip route": "routes", "show version": "IOS"}
+    now[0] += 2
+    assert cache.get("10.0.0.1", "show ip route") is None
+    assert cache.get("10.0.0.1", "show version") == "IOS"
+    assert cache.purge_expired() == 1
+
+
+def test_change_markers_are_never_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.ttl("show running-config | include Last configuration change") == 0
+    assert not cache.put("10.0.0.1", "show configuration id", "42")
+    assert not cache.put("10.0.0.1", "show ip ospf neighbor", "FULL")
+    assert cache.stats() == (0, 0)
+
+
+def test_least_recently_read_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(showcache.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path, max_bytes=250)
+    for i, host in enumerate(("a", "b")):
+        now[0] += 1
+        cache.put(host, "show version", "x" * 100)
+    now[0] += 1
+    assert cache.get("a", "show version")
+    now[0] += 1
+    cache.put("c", "show version", "x" * 100)
+    assert cache.get("b", "show version") is None
+    assert cache.get("a", "show version") and cache.get("c", "show version")
+    assert cache.stats() == (2, 200)
+
+
+def test_invalidated_host_refuses_output_read_before_the_push(tmp_path):
+    cache = make_cache(tmp_path)
+    started = showcache.time.time()
+    cache.put("10.0.0.1", "show version", "old")
+    assert cache.invalidate("10.0.0.1") == 1
+    assert cache.get("10.0.0.1", "show version") is None
+    assert not cache.put("10.0.0.1", "show version", "stale", fetched=started)
+    assert cache.put("10.0.0.1", "show version", "new")
+
+
+def test_invalidating_drops_the_host_even_when_the_push_fails(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("10.0.0.1:2222", "show version", "IOS")
+    try:
+        with showcache.invalidating(cache, {"host": "10.0.0.1", "port": 2222}):
+            raise RuntimeError("push failed")
+    except RuntimeError:
+        pass
+    assert cache.get("10.0.0.1:2222", "show version") is None
+
+
+def test_cache_host_includes_non_default_ports():
+    assert cache_host({"host": "10.0.0.1"}) == "10.0.0.1"
+    assert cache_host({"ip": "10.0.0.1", "port": 22}) == "10.0.0.1"
+    assert cache_host({"host": "10.0.0.1", "port": "2222"}) == "10.0.0.1:2222"
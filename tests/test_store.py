@@ -0,0 +1,97 @@
+from store import BackupStore, apply_delta, make_delta
+
+
+def config(n, changed=None):
+    lines = []
+    for i in range(n):
+        lines += [f"interface Ethernet{i}", " no shutdown", "!"]
+    if changed is not None:
+        lines[changed] = " description changed"
+    return "\n".join(lines) + "\n"
+
+
+def test_versions_and_round_trip(tmp_path):
+    store = BackupStore(str(tmp_path), snapshot_every=3)
+    texts = [config(50, changed=i) for i in range(1, 8)]
+    for text in texts:
+        store.save("R1", text)
+    assert [e["version"] for e in store.versions("R1")] == list(range(1, 8))
+    fresh = BackupStore(str(tmp_path))
+    for version, text in enumerate(texts, start=1):
+        assert fresh.get("R1", version) == text
+
+
+def test_unchanged_config_only_adds_an_index_line(tmp_path):
+    store = BackupStore(str(tmp_path))
+    assert store.save("R1", config(5))[2] is True
+    version, _, changed = store.save("R1", config(5))
+    assert (version, changed) == (2, False)
+
+
+def test_delta_does_not_treat_repeated_lines_as_junk():
+    # Past the change there is no unique line left to anchor a match on.
+    base = ["hostname R1\n"] + [" no shutdown\n", "!\n"] * 150
+    new = list(base)
+    new[10] = " description changed\n"
+    ops = make_delta(base, new)
+    assert apply_delta(base, ops) == new
+    assert sum(len(op["lines"]) for op in ops if isinstance(op, dict)) < 20  # not the whole tail
+
+
+def test_keep_marker_only_for_unchanged_text(tmp_path):
+    store = BackupStore(str(tmp_path))
+    store.save("R1", config(3), marker="m1")
+    store.save("R1", config(3), keep_marker=True)
+    assert store.latest("R1")["marker"] == "m1"
+    store.save("R1", config(4), keep_marker=True)
+    assert "marker" not in store.latest("R1")
+
+
+def test_confirm_records_the_latest_sha(tmp_path):
+    store = BackupStore(str(tmp_path))
+    _, sha, _ = store.save("R1", config(3), marker="m1")
+    assert store.confirm("R1", "m1") == (2, sha)
+
+
+def test_two_stores_on_one_directory_never_reuse_a_version(tmp_path):
+    first, second = BackupStore(str(tmp_path)), BackupStore(str(tmp_path))
+    assert first.save("R1", config(1))[0] == 1
+    assert second.save("R1", config(2))[0] == 2
+    version, _, changed = first.save("R1", config(2))
+    assert (version, changed) == (3, False)
+    assert [e["version"] for e in BackupStore(str(tmp_path)).versions("R1")] == [1, 2, 3]
+
+
+def test_show_outputs_stay_out_of_the_config_index(tmp_path):
+    store = BackupStore(str(tmp_path))
+    store.save("R1", config(1))
+    store.show_outputs().save("R1:show version", "IOS 15.4\n")
+    assert list(store.index) == ["R1"]
+    assert BackupStore(str(tmp_path)).show_outputs().get("R1:show version") == "IOS 15.4\n"
+
+
+def test_changed_since_and_diff(tmp_path):
+    store = BackupStore(str(tmp_path))
+    store.save("R1", config(2), timestamp=100)
+    store.save("R2", config(2), timestamp=100)
+    store.save("R1", config(2, changed=1), timestamp=200)
+    assert store.changed_since(150) == ["R1"]
+    assert "+ description changed" in store.diff("R1", 1)
+
+
+def test_read_survives_the_cache_being_replaced_by_another_thread(tmp_path):
+    store = BackupStore(str(tmp_path))
+    _, sha, _ = store.save("R1", "hostname R1\n")
+
+    class Swapped(dict):
+        # Another thread's save() replaces the cache right after the lookup.
+        def __contains__(self, key):
+            store._cache = {}
+            return True
+
+        def get(self, key, default=None):
+            store._cache = {}
+            return dict.get(self, key, default)
+
+    store._cache = Swapped({sha: "hostname R1\n"})
+    assert store.read(sha) == "hostname R1\n"
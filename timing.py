@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Recorder:
+    """
+    Collects wall time per device and phase (connect, session_prep, enable,
+    send_command, send_config_set, save_config, ...) for one run, and
+    exports it as JSON lines and Prometheus text format.
+    """
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%S")
+        self.started = time.time()
+        self.records = []
+        self.lock = threading.Lock()
+
+    def record(self, device, device_type, phase, seconds, ok=True, start=None):
+        entry = {"run": self.run_id, "device": device, "device_type": device_type or "unknown",
+                 "phase": phase, "start": round((start or time.time() - seconds) - self.started, 6),
+                 "seconds": round(seconds, 6), "ok": ok}
+        with self.lock:
+            self.records.append(entry)
+
+    @contextmanager
+    def phase(self, device, device_type, phase):
+        start = time.time()
+        begin = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(device, device_type, phase, time.perf_counter() - begin, ok, start)
+
+    def summary(self):
+        """{phase: (count, total_seconds, max_seconds)} over the whole run."""
+        totals = {}
+        with self.lock:
+            for r in self.records:
+                count, total, worst = totals.get(r["phase"], (0, 0.0, 0.0))
+                totals[r["phase"]] = (count + 1, total + r["seconds"], max(worst, r["seconds"]))
+        return totals
+
+    def print_summary(self):
+        totals = self.summary()
+        if not totals:
+            return
+        grand = sum(total for _, total, _ in totals.values()) or 1
+        print("--- Time per phase (summed over devices) ---")
+        for phase, (count, total, worst) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"{phase:<16} {total:9.2f}s  {100 * total / grand:5.1f}%  "
+                  f"n={count}  avg {total / count:.3f}s  max {worst:.3f}s")
+
+    def write_jsonl(self, path):
+        with self.lock:
+            lines = [json.dumps(r) + "\n" for r in self.records]
+        with open(path, 'a') as f:
+            f.writelines(lines)
+
+    def write_prometheus(self, path, prefix="netmiko_phase_seconds", worker=None):
+        histograms = {}
+        with self.lock:
+            for r in self.records:
+                key = (r["phase"], r["device_type"])
+                counts, total, n = histograms.get(key, ([0] * len(BUCKETS), 0.0, 0))
+                for i, bound in enumerate(BUCKETS):
+                    if r["seconds"] <= bound:
+                        counts[i] += 1
+                histograms[key] = (counts, total + r["seconds"], n + 1)
+
+        extra = f',worker="{worker}"' if worker else ""
+        out = [f"# HELP {prefix} Wall time of one device phase.", f"# TYPE {prefix} histogram"]
+        for (phase, device_type), (counts, total, n) in sorted(histograms.items()):
+            labels = f'phase="{phase}",device_type="{device_type}"{extra}'
+            for bound, bucket in zip(BUCKETS, counts):
+                out.append(f'{prefix}_bucket{{{labels},le="{bound}"}} {bucket}')
+            out.append(f'{prefix}_bucket{{{labels},le="+Inf"}} {n}')
+            out.append(f"{prefix}_sum{{{labels}}} {total:.6f}")
+            out.append(f"{prefix}_count{{{labels}}} {n}")
+        out.append("# HELP netmiko_run_duration_seconds Wall time of the whole run.")
+        out.append("# TYPE netmiko_run_duration_seconds gauge")
+        out.append(f'netmiko_run_duration_seconds{{run="{self.run_id}"{extra}}} {time.time() - self.started:.3f}')
+
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, path)
+
+    def export(self, directory="timings", worker=None):
+        """
+        Appends to timings.jsonl and rewrites timings.prom in directory. With
+        worker, to timings.{worker}.jsonl and .prom with a worker label, so
+        processes exporting to the same directory do not overwrite each other.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f"timings.{re.sub(r'[^A-Za-z0-9_.-]+', '_', worker)}" if worker else "timings"
+        self.write_jsonl(os.path.join(directory, f"{name}.jsonl"))
+        self.write_prometheus(os.path.join(directory, f"{name}.prom"), worker=worker)
+
+
+recorder = Recorder()
+
+
+def phase(device, device_type, name):
+    """Times a block into the process-wide recorder."""
+    return recorder.phase(device, device_type, name)
@@ -0,0 +1,168 @@
+import ipaddress
+import re
+import time
+
+from capture import send_batch
+from fleet import remaining, run_fleet
+from push import connection_params
+from sessions import connect
+from timing import phase
+
+SHOW_COMMANDS = {
+    "cisco_ios": {"ospf_neighbors": "show ip ospf neighbor", "rip_routes": "show ip rip database",
+                  "routes": "show ip route"},
+    "cisco_asa": {"ospf_neighbors": "show ospf neighbor", "routes": "show route"},
+}
+
+_PREFIX = re.compile(r"^(\d+\.\d+\.\d+\.\d+(?:/\d+)?)\b")
+_ROUTE = re.compile(r"^([A-Za-z][A-Za-z0-9*+%]*(?:\s+[A-Z0-9*]+)?)\s+(\d+\.\d+\.\d+\.\d+(?:/\d+)?)"
+                    r"(?:\s+(\d+\.\d+\.\d+\.\d+))?\s")
+_NEIGHBOR = re.compile(r"^(\d+\.\d+\.\d+\.\d+)\s+\d+\s+([A-Z0-9-]+)(?:/\s*\S+)?\s+\S+\s+"
+                       r"(\d+\.\d+\.\d+\.\d+)\s+(\S+)")
+
+
+class NotConverged(Exception):
+    pass
+
+
+def parse_ospf_neighbors(text):
+    """[{neighbor_id, state, address, interface}] from show (ip) ospf neighbor."""
+    neighbors = []
+    for line in text.splitlines():
+        match = _NEIGHBOR.match(line.strip())
+        if match:
+            neighbor_id, state, address, interface = match.groups()
+            neighbors.append({"neighbor_id": neighbor_id, "state": state,
+                              "address": address, "interface": interface})
+    return neighbors
+
+
+def parse_routes(text):
+    """
+    {prefix: code} from show ip route, or show route on an ASA where the
+    mask is written out, e.g. {'0.0.0.0/0': 'O*E2'}.
+    """
+    routes = {}
+    for line in text.splitlines():
+        match = _ROUTE.match(line.strip())
+        if match and "subnetted" not in line:
+            code, prefix, mask = match.groups()
+            if mask and "/" not in prefix:
+                prefix = str(ipaddress.IPv4Network(f"{prefix}/{mask}", strict=False))
+            routes[prefix] = code.replace(" ", "")
+    return routes
+
+
+def parse_rip_database(text):
+    """The prefixes listed in show ip rip database."""
+    prefixes = set()
+    for line in text.splitlines():
+        match = _PREFIX.match(line)
+        if match:
+            prefixes.add(match.group(1))
+    return prefixes
+
+
+def missing_expectations(expect, outputs):
+    """
+    What of expect is not yet true given the latest show outputs, as a list
+    of descriptions (empty once converged). expect may hold:
+      ospf_neighbors: a count of FULL neighbors, or the neighbor IDs or
+                      addresses that must be FULL
+      routes:         prefixes that must be in the routing table, optionally
+                      led by the route code they must have ('O 0.0.0.0/0')
+      rip_routes:     prefixes that must be in the RIP database
+    """
+    missing = []
+    wanted = expect.get("ospf_neighbors")
+    if wanted is not None:
+        full = [n for n in parse_ospf_neighbors(outputs.get("ospf_neighbors", "")) if n["state"] == "FULL"]
+        if isinstance(wanted, int):
+            if len(full) < wanted:
+                missing.append(f"{len(full)}/{wanted} OSPF neighbors FULL")
+        else:
+            up = {n["neighbor_id"] for n in full} | {n["address"] for n in full}
+            missing += [f"OSPF neighbor {n} not FULL" for n in wanted if n not in up]
+    if expect.get("routes"):
+        routes = parse_routes(outputs.get("routes", ""))
+        for wanted in expect["routes"]:
+            code, _, prefix = wanted.rpartition(" ")
+            if prefix not in routes:
+                missing.append(f"no route to {prefix}")
+            elif code and not routes[prefix].startswith(code):
+                missing.append(f"route to {prefix} is {routes[prefix]}, not {code}")
+    if expect.get("rip_routes"):
+        database = parse_rip_database(outputs.get("rip_routes", ""))
+        missing += [f"{p} not in RIP database" for p in expect["rip_routes"] if p not in database]
+    return missing
+
+
+def converge_device(device_config, deadline, expect, started, interval=5, timeout=300):
+    """
+    Polls one device over a single session until everything in expect
+    holds, all show commands pipelined into one round trip per poll.
+    Returns (seconds from started until converged, polls). Raises
+    NotConverged with what is still missing once timeout has passed.
+    """
+    device = connection_params(device_config, deadline)
+    device_type = device["device_type"]
+    commands = SHOW_COMMANDS.get(device_type, SHOW_COMMANDS["cisco_ios"])
+    checks = [key for key in ("ospf_neighbors", "rip_routes", "routes") if expect.get(key) and key in commands]
+    polls = 0
+    with connect(device) as net_connect:
+        while True:
+            outputs = {}
+            with phase(device["host"], device_type, "verify"):
+                send_batch(net_connect, [commands[key] for key in checks],
+                           on_result=lambda i, command, text: outputs.__setitem__(checks[i], text),
+                           read_timeout=remaining(deadline, cap=30))
+            polls += 1
+            missing = missing_expectations(expect, outputs)
+            if not missing:
+                return time.monotonic() - started, polls
+            if time.monotonic() - started + interval > timeout:
+                raise NotConverged("; ".join(missing))
+            time.sleep(interval)
+
+
+def verify_convergence(devices, expected, username, password, secret, interval=5, timeout=300, workers=16,
+                       pushed_at=None):
+    """
+    Polls every device with an entry in expected ({hostname: expect}, see
+    missing_expectations) concurrently until it converges or timeout runs
+    out. Each device is timed from its own push (pushed_at, {hostname:
+    time.monotonic()} as filled in by push.push_waves) so waiting for a
+    later wave does not count against an earlier one; devices not in it
+    from the start of the verification. Yields (device, seconds, polls, error).
+    """
+    devices = [dict(d, username=username, password=password, secret=secret)
+               for d in devices if d["hostname"] in expected]
+    started = time.monotonic()
+    pushed_at = pushed_at or {}
+
+    def job(device, deadline):
+        return converge_device(device, deadline, expected[device["hostname"]],
+                               pushed_at.get(device["hostname"], started), interval=interval, timeout=timeout)
+
+    for device, result, error in run_fleet(devices, job, workers=workers, deadline=timeout + 60):
+        seconds, polls = result if error is None else (None, None)
+        yield device, seconds, polls, error
+
+
+def print_convergence(devices, expected, username, password, secret, **options):
+    """Runs verify_convergence and prints per-device and fleet-wide time to convergence."""
+    print("--- Waiting for the routing domain to converge ---")
+    slowest, failed = 0.0, 0
+    for device, seconds, polls, error in verify_convergence(devices, expected, username, password, secret,
+                                                            **options):
+        if error is None:
+            slowest = max(slowest, seconds)
+            print(f"{device['hostname']} converged after {seconds:.1f}s ({polls} polls)")
+        else:
+            failed += 1
+            print(f"{device['hostname']} did not converge: {error}")
+    if failed:
+        print(f"{failed} devices did not converge.")
+    else:
+        print(f"Fleet converged after {slowest:.1f}s.")
+    return failed == 0